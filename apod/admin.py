@@ -7,7 +7,7 @@ class APODAdmin(admin.ModelAdmin):
     list_display = ('date', 'title', 'media_type', 'created_at')
     list_filter = ('media_type', 'created_at', 'date')
     search_fields = ('title', 'explanation')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'image_sha256', 'image_width', 'image_height', 'image_widths')
     date_hierarchy = 'date'
     
     fieldsets = (
@@ -17,6 +17,10 @@ class APODAdmin(admin.ModelAdmin):
         ('Media', {
             'fields': ('media_type', 'url', 'hdurl')
         }),
+        ('Local Mirror', {
+            'fields': ('image_sha256', 'image_width', 'image_height', 'image_widths', 'image_error'),
+            'classes': ('collapse',)
+        }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
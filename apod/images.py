@@ -0,0 +1,196 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+from PIL import Image
+from core.http_client import nasa_client
+from core.models import FetchLedger
+from core.versions import bump_data_version
+from .models import APOD, image_path
+
+logger = logging.getLogger(__name__)
+
+# Pillow format of a downloaded original -> file extension it is stored with
+ORIGINAL_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+# Every variant width is written in each of these (extension, format, options)
+VARIANT_FORMATS = [
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+]
+
+# Images mirrored per background run started by page views
+BACKGROUND_BATCH = 40
+
+
+class MirroredImage:
+    """
+    Result of mirroring one image: its content hash, pixel size and the
+    variant widths written
+    """
+
+    def __init__(self, sha256, width, height, widths):
+        self.sha256 = sha256
+        self.width = width
+        self.height = height
+        self.widths = widths
+
+
+def download_image(url):
+    """
+    Download an image through the shared keep-alive session (without an
+    API key) and return its bytes. Raises ValueError for bodies larger than
+    APOD_IMAGE_MAX_BYTES.
+    """
+    response = nasa_client().session.get(url, timeout=30, stream=True)
+    with response:
+        response.raise_for_status()
+        content = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            content += chunk
+            if len(content) > settings.APOD_IMAGE_MAX_BYTES:
+                raise ValueError(f"Image larger than {settings.APOD_IMAGE_MAX_BYTES} bytes: {url}")
+    return bytes(content)
+
+
+def _write(name, save):
+    """
+    Write MEDIA_ROOT/``name`` unless it exists. ``save(file)`` writes the
+    contents to a temporary file that is renamed into place, so readers never
+    see a partial image.
+    """
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, 'wb') as file:
+            save(file)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def variant_widths(width):
+    """APOD_IMAGE_WIDTHS capped at the image's own width: images are never enlarged"""
+    return sorted({min(variant, width) for variant in settings.APOD_IMAGE_WIDTHS})
+
+
+def mirror_content(content):
+    """
+    Store downloaded image bytes under their SHA-256 and write the resized
+    JPEG and WebP variants, skipping files that already exist. Returns a
+    MirroredImage.
+    """
+    sha256 = hashlib.sha256(content).hexdigest()
+    with Image.open(io.BytesIO(content)) as image:
+        extension = ORIGINAL_EXTENSIONS.get(image.format)
+        if extension is None:
+            raise ValueError(f"Unsupported image format {image.format}")
+        width, height = image.size
+        widths = variant_widths(width)
+        _write(image_path(sha256, extension), lambda file: file.write(content))
+
+        # JPEG can decode straight at a fraction of its size, which makes
+        # large originals much cheaper to shrink
+        image.draft('RGB', (widths[-1], max(1, height * widths[-1] // width)))
+        resized = image.convert('RGB')
+        # Largest first, each variant resized from the previous one
+        for variant in reversed(widths):
+            size = (variant, max(1, round(height * variant / width)))
+            if resized.size != size:
+                resized = resized.resize(size, Image.Resampling.LANCZOS)
+            for variant_extension, variant_format, options in VARIANT_FORMATS:
+                _write(
+                    image_path(sha256, variant_extension, variant),
+                    lambda file: resized.save(file, variant_format, **options),
+                )
+    return MirroredImage(sha256, width, height, widths)
+
+
+def mirror_url(url):
+    """Download and mirror the image at ``url``"""
+    return mirror_content(download_image(url))
+
+
+def pending_images():
+    """Image APODs that are not mirrored and have no failed attempt, newest first"""
+    return APOD.objects.filter(media_type='image', image_sha256='', image_error='').exclude(url='')
+
+
+def mirror_images(apods, workers=4, on_done=None):
+    """
+    Mirror the images of ``apods``.
+
+    Each distinct URL is downloaded once, also across runs: an URL some
+    stored APOD already has mirrored is reused. Downloads and resizing run
+    on ``workers`` threads while the calling thread saves the results.
+    Failures are kept in ``image_error`` so they are not tried again by
+    default. ``on_done(apod, error)`` is called for every APOD. Returns the
+    number of images mirrored and failed.
+    """
+    by_url = {}
+    for apod in apods:
+        by_url.setdefault(apod.url, []).append(apod)
+    known = {
+        url: (sha256, width, height, widths)
+        for url, sha256, width, height, widths in APOD.objects.filter(url__in=by_url).exclude(image_sha256='')
+        .values_list('url', 'image_sha256', 'image_width', 'image_height', 'image_widths')
+    }
+    stats = {'mirrored': 0, 'failed': 0}
+
+    def save(url, fields, error):
+        for apod in by_url[url]:
+            APOD.objects.filter(pk=apod.pk).update(**fields)
+            stats['failed' if error else 'mirrored'] += 1
+            if on_done:
+                on_done(apod, error)
+
+    for url, (sha256, width, height, widths) in known.items():
+        save(url, {'image_sha256': sha256, 'image_width': width, 'image_height': height,
+                   'image_widths': widths, 'image_error': ''}, None)
+        del by_url[url]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        queued = iter(list(by_url))
+
+        def submit_next():
+            url = next(queued, None)
+            if url is not None:
+                pending[pool.submit(mirror_url, url)] = url
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = pending.pop(future)
+                try:
+                    image = future.result()
+                except (requests.RequestException, OSError, ValueError, Image.DecompressionBombError) as e:
+                    logger.error(f"Error mirroring image {url}: {e}")
+                    save(url, {'image_error': str(e) or type(e).__name__}, e)
+                else:
+                    save(url, {'image_sha256': image.sha256, 'image_width': image.width,
+                               'image_height': image.height, 'image_widths': image.widths,
+                               'image_error': ''}, None)
+                submit_next()
+
+    if stats['mirrored']:
+        # Pages showing these entries now render the local variants
+        bump_data_version(FetchLedger.SOURCE_APOD)
+    logger.info(f"Mirrored {stats['mirrored']} APOD images, {stats['failed']} failed")
+    return stats
+
+
+def mirror_pending(limit=BACKGROUND_BATCH):
+    """Mirror the newest ``limit`` pending images, e.g. from a background refresh"""
+    return mirror_images(list(pending_images()[:limit]))
@@ -0,0 +1,26 @@
+from core.breaker import source_unavailable
+from core.jobs import job
+from core.models import FetchLedger
+from .services import APODService
+
+
+@job('apod.refresh')
+def refresh(progress):
+    """
+    Fetch NASA's current APOD for the refresh button on the APOD page
+    """
+    progress('Fetching the Astronomy Picture of the Day from NASA')
+    apod = APODService().fetch_apod()
+    if apod is None:
+        raise RuntimeError('Unable to fetch APOD data')
+    
+    return {
+        'apod': {
+            'title': apod.title,
+            'explanation': apod.explanation,
+            'url': apod.url,
+            'media_type': apod.media_type,
+            'date': apod.date.strftime('%Y-%m-%d'),
+        },
+        'stale': source_unavailable(FetchLedger.SOURCE_APOD),
+    }
@@ -0,0 +1,70 @@
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apod.models import APOD
+from apod.search import icontains_search, search_apods
+from core.sample_payloads import make_apod_entries
+
+QUERIES = ['galaxy', 'andromeda spiral', 'supernova remnant', 'black hole jet', 'aurora', 'nebul', 'no such thing']
+
+
+class Command(BaseCommand):
+    help = 'Compare FTS5 APOD search with an icontains scan on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--entries',
+            type=int,
+            default=11000,
+            help='Synthetic APOD entries to load (default: 11000, about the full archive)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Runs per query and method (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            APOD.objects.bulk_create(
+                (
+                    APOD(
+                        date=date.fromisoformat(entry['date']),
+                        title=entry['title'],
+                        explanation=entry['explanation'],
+                        url=entry['url'],
+                        media_type=entry['media_type'],
+                        hdurl=entry['hdurl'],
+                    )
+                    for entry in make_apod_entries(options['entries'])
+                ),
+                batch_size=1000,
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"{options['entries']} entries  {'query':<20} {'fts5 median':>12} {'icontains median':>17}"
+            ))
+            for query in QUERIES:
+                fts = self._time(search_apods, query, options['repeat'])
+                scan = self._time(icontains_search, query, options['repeat'])
+                self.stdout.write(f"{'':<{len(str(options['entries'])) + 10}}{query:<20} {fts * 1000:>10.2f}ms {scan * 1000:>15.2f}ms")
+            self.stdout.write(
+                'icontains scans the table and returns the newest matches unranked, so it only keeps up '
+                'on common words where it can stop early; FTS5 ranks every match with bm25.'
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _time(self, search, query, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            search(query)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
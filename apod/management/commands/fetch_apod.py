@@ -1,5 +1,9 @@
-from django.core.management.base import BaseCommand
-from apod.services import APODService
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apod.models import APOD
+from apod.services import ARCHIVE_START, RANGE_CHUNK_DAYS, APODService
 
 
 class Command(BaseCommand):
@@ -10,22 +14,78 @@ class Command(BaseCommand):
             '--days',
             type=int,
             default=7,
-            help='Number of days to fetch (default: 7)'
+            help='Number of days to fetch (default: 7, ignored when --start or --all is given)'
+        )
+        parser.add_argument(
+            '--start',
+            type=date.fromisoformat,
+            help='First day of the range to backfill (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--end',
+            type=date.fromisoformat,
+            help='Last day of the range to backfill (YYYY-MM-DD, default: today)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help=f'Backfill the whole archive since {ARCHIVE_START}'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of concurrent date-range requests (default: 4)'
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=RANGE_CHUNK_DAYS,
+            help=f'Days per date-range request (default: {RANGE_CHUNK_DAYS})'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Request every day again, even if the fetch ledger has it'
         )
 
     def handle(self, *args, **options):
-        days = options['days']
-        
+        end = options['end'] or timezone.now().date()
+        if options['all']:
+            start = ARCHIVE_START
+        else:
+            start = options['start'] or end - timedelta(days=options['days'] - 1)
+        if end < start:
+            raise CommandError('--end must not be before --start')
+        if options['workers'] < 1 or options['chunk_days'] < 1:
+            raise CommandError('--workers and --chunk-days must be at least 1')
+
         self.stdout.write(
-            self.style.SUCCESS(f'Starting to fetch APOD data for the last {days} days...')
+            self.style.SUCCESS(f'Starting to fetch APOD data from {start} to {end}...')
         )
-        
+
+        def on_span_done(span, created):
+            self.stdout.write(f'  - {span[0]} to {span[1]}: {created} entries created')
+
         service = APODService()
-        apods = service.fetch_recent_apods(days)
-        
+        stats = service.fetch_range(
+            start, end,
+            force=options['force'],
+            workers=options['workers'],
+            chunk_days=options['chunk_days'],
+            on_span_done=on_span_done,
+        )
+
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully fetched {len(apods)} APOD entries')
+            self.style.SUCCESS(
+                f"Successfully fetched {stats['created']} new APOD entries in {stats['spans']} requests; "
+                f"{APOD.objects.filter(date__gte=start, date__lte=end).count()} stored for the range"
+            )
         )
-        
-        for apod in apods:
-            self.stdout.write(f'  - {apod.date}: {apod.title}') 
\ No newline at end of file
+        if stats['failed_spans']:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{len(stats['failed_spans'])} spans failed and will be retried on the next run: "
+                    + ', '.join(f'{span_start} to {span_end}' for span_start, span_end in stats['failed_spans'])
+                )
+            )
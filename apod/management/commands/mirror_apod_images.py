@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from apod.images import mirror_images, pending_images
+from apod.models import APOD
+
+
+class Command(BaseCommand):
+    help = 'Download APOD images into MEDIA_ROOT and generate their responsive variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Mirror at most this many images, newest first (default: all pending)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of concurrent downloads (default: 4)'
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Also retry images whose last mirror attempt failed'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        apods = pending_images()
+        if options['retry_failed']:
+            apods = APOD.objects.filter(media_type='image', image_sha256='').exclude(url='')
+        if options['limit']:
+            apods = apods[:options['limit']]
+        apods = list(apods)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Mirroring {len(apods)} APOD images...')
+        )
+
+        def on_done(apod, error):
+            if error:
+                self.stdout.write(self.style.WARNING(f'  - {apod.date}: {error}'))
+
+        stats = mirror_images(apods, workers=options['workers'], on_done=on_done)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully mirrored {stats['mirrored']} images; {stats['failed']} failed")
+        )
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+# External-content FTS5 index over APOD title and explanation. The triggers
+# keep it in sync with every write to apod_apod, including bulk_create and
+# queryset.update(), which bypass model signals.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE apod_apod_fts USING fts5(
+        title, explanation, content='apod_apod', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER apod_apod_fts_insert AFTER INSERT ON apod_apod BEGIN
+        INSERT INTO apod_apod_fts(rowid, title, explanation) VALUES (new.id, new.title, new.explanation);
+    END
+    """,
+    """
+    CREATE TRIGGER apod_apod_fts_delete AFTER DELETE ON apod_apod BEGIN
+        INSERT INTO apod_apod_fts(apod_apod_fts, rowid, title, explanation)
+        VALUES ('delete', old.id, old.title, old.explanation);
+    END
+    """,
+    """
+    CREATE TRIGGER apod_apod_fts_update AFTER UPDATE OF title, explanation ON apod_apod BEGIN
+        INSERT INTO apod_apod_fts(apod_apod_fts, rowid, title, explanation)
+        VALUES ('delete', old.id, old.title, old.explanation);
+        INSERT INTO apod_apod_fts(rowid, title, explanation) VALUES (new.id, new.title, new.explanation);
+    END
+    """,
+    "INSERT INTO apod_apod_fts(apod_apod_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS apod_apod_fts_update',
+    'DROP TRIGGER IF EXISTS apod_apod_fts_delete',
+    'DROP TRIGGER IF EXISTS apod_apod_fts_insert',
+    'DROP TABLE IF EXISTS apod_apod_fts',
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        # Other backends fall back to icontains search (see apod.search)
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
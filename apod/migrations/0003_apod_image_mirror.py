@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:23
+
+import importlib
+
+from django.db import migrations, models
+
+search_index = importlib.import_module('apod.migrations.0002_apod_search_index')
+
+# SQLite adds these columns by rebuilding apod_apod, which drops its triggers;
+# the search index triggers are dropped first and created again afterwards.
+TRIGGER_SQL = search_index.CREATE_SQL[1:4]
+DROP_TRIGGER_SQL = search_index.DROP_SQL[:3]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0002_apod_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            search_index.run_on_sqlite(DROP_TRIGGER_SQL), search_index.run_on_sqlite(TRIGGER_SQL)
+        ),
+        migrations.AddField(
+            model_name='apod',
+            name='image_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='apod',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='apod',
+            name='image_sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='apod',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='apod',
+            name='image_widths',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(
+            search_index.run_on_sqlite(TRIGGER_SQL), search_index.run_on_sqlite(DROP_TRIGGER_SQL)
+        ),
+    ]
@@ -1,7 +1,18 @@
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
 
+def image_path(sha256, extension, width=None):
+    """
+    Path below MEDIA_ROOT of a mirrored image: the original when ``width``
+    is None, else its variant of that width. Names are content hashes, so
+    a file never changes once written.
+    """
+    name = sha256 if width is None else f"{sha256}-{width}"
+    return f"apod/{sha256[:2]}/{name}.{extension}"
+
+
 class APOD(models.Model):
     """
     Model to store NASA's Astronomy Picture of the Day data
@@ -12,6 +23,12 @@ class APOD(models.Model):
     url = models.URLField()
     media_type = models.CharField(max_length=20)  # 'image' or 'video'
     hdurl = models.URLField(blank=True, null=True)  # High definition URL
+    # Local mirror of the image at `url` (see apod.images); empty until mirrored
+    image_sha256 = models.CharField(max_length=64, blank=True, default='')
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_widths = models.JSONField(default=list, blank=True)  # Variant widths, ascending
+    image_error = models.TextField(blank=True, default='')  # Why the last mirror attempt failed
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -27,3 +44,42 @@ class APOD(models.Model):
     def is_today(self):
         """Check if this APOD is from today"""
         return self.date == timezone.now().date()
+
+    @property
+    def is_mirrored(self):
+        """Check if the image has been mirrored locally"""
+        return bool(self.image_sha256 and self.image_widths)
+
+    @property
+    def image_pending(self):
+        """Check if the image still has to be mirrored"""
+        return self.media_type == 'image' and bool(self.url) and not self.image_sha256 and not self.image_error
+
+    def image_url(self, width, extension='jpg'):
+        """URL of the mirrored variant of ``width`` pixels"""
+        return settings.MEDIA_URL + image_path(self.image_sha256, extension, width)
+
+    def image_srcset(self, extension='jpg'):
+        return ', '.join(f"{self.image_url(width, extension)} {width}w" for width in self.image_widths)
+
+    @property
+    def image_src(self):
+        """Mirrored fallback image for browsers without srcset, or NASA's URL"""
+        if not self.is_mirrored:
+            return self.url
+        return self.image_url(self.image_widths[len(self.image_widths) // 2])
+
+    @property
+    def jpeg_srcset(self):
+        return self.image_srcset('jpg')
+
+    @property
+    def webp_srcset(self):
+        return self.image_srcset('webp')
+
+    @property
+    def display_height(self):
+        """Height of the mirrored image scaled to its widest variant"""
+        if not self.is_mirrored:
+            return None
+        return round(self.image_height * self.image_widths[-1] / self.image_width)
@@ -0,0 +1,94 @@
+import re
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+from .models import APOD
+
+# bm25 column weights: a match in the title counts ten times one in the explanation
+TITLE_WEIGHT = 10.0
+EXPLANATION_WEIGHT = 1.0
+SNIPPET_TOKENS = 32
+
+# Control characters FTS5 wraps around matches; swapped for <mark> after escaping
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+# Ordering by FTS5's own rank column (configured through "rank MATCH") lets
+# the module sort and apply LIMIT itself, so highlight() and snippet() only
+# run for the rows that are returned
+SEARCH_SQL = f"""
+    SELECT apod_apod.*,
+           apod_apod_fts.rank AS rank,
+           highlight(apod_apod_fts, 0, '{_MARK_START}', '{_MARK_END}') AS title_highlight,
+           snippet(apod_apod_fts, 1, '{_MARK_START}', '{_MARK_END}', '…', %s) AS snippet
+    FROM apod_apod_fts
+    JOIN apod_apod ON apod_apod.id = apod_apod_fts.rowid
+    WHERE apod_apod_fts MATCH %s AND apod_apod_fts.rank MATCH %s
+    ORDER BY apod_apod_fts.rank
+    LIMIT %s
+"""
+
+
+def search_terms(text):
+    """Split free text into the words that are searched for"""
+    return re.findall(r'\w+', text)
+
+
+def fts_query(text):
+    """
+    Turn free text into an FTS5 MATCH expression: every word must match and
+    the last one is treated as a prefix, so results appear while typing.
+    Words are quoted so user input can never be parsed as FTS5 syntax.
+    """
+    terms = [f'"{term}"' for term in search_terms(text)]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _highlight(text):
+    return mark_safe(escape(text).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def search_apods(text, limit=20):
+    """
+    Full-text search over APOD titles and explanations.
+
+    Returns up to ``limit`` APOD instances, best match first, each annotated
+    with ``rank`` (bm25, lower is better) and the HTML-safe
+    ``title_highlight`` and ``snippet`` with matches wrapped in ``<mark>``.
+    """
+    query = fts_query(text)
+    if not query:
+        return []
+    if connection.vendor != 'sqlite':
+        return icontains_search(text, limit)
+
+    results = list(APOD.objects.raw(
+        SEARCH_SQL, [SNIPPET_TOKENS, query, f'bm25({TITLE_WEIGHT}, {EXPLANATION_WEIGHT})', limit]
+    ))
+    for apod in results:
+        apod.title_highlight = _highlight(apod.title_highlight)
+        apod.snippet = _highlight(apod.snippet)
+    return results
+
+
+def icontains_search(text, limit=20):
+    """
+    Unindexed substring search with the same result shape as
+    ``search_apods``, used on backends without FTS5 and as the benchmark
+    baseline
+    """
+    terms = search_terms(text)
+    if not terms:
+        return []
+    apods = APOD.objects.all()
+    for term in terms:
+        apods = apods.filter(Q(title__icontains=term) | Q(explanation__icontains=term))
+    results = list(apods.order_by('-date')[:limit])
+    for apod in results:
+        apod.rank = None
+        apod.title_highlight = escape(apod.title)
+        apod.snippet = escape(Truncator(apod.explanation).words(SNIPPET_TOKENS))
+    return results
@@ -1,13 +1,39 @@
 import requests
 import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from django.conf import settings
+from django.db import IntegrityError
 from django.utils import timezone
+import pytz
+from core.breaker import CircuitOpenError, circuit_breaker
+from core.dates import split_windows
+from core.http_client import nasa_client
+from core.ingest import IngestRecorder, count, phase, received, storing
+from core.ledger import plan_windows, recent_failure, record_fetch
+from core.models import FetchLedger
+from core.singleflight import SingleFlightTimeout, single_flight
+from core.versions import bump_data_version
+from .images import mirror_images, pending_images
 from .models import APOD
 
+logger = logging.getLogger(__name__)
 
+# First day of the APOD archive
+ARCHIVE_START = datetime(1995, 6, 16).date()
 
-logger = logging.getLogger(__name__)
+# Days per date-range request; NASA answers a few months of entries well
+# within the request timeout
+RANGE_CHUNK_DAYS = 90
+
+BULK_BATCH_SIZE = 500
+
+
+def archive_today():
+    """
+    Newest date NASA may have published. APOD days follow US Eastern time,
+    so early in the UTC day, today's date does not exist yet.
+    """
+    return datetime.now(pytz.timezone('America/New_York')).date()
 
 
 class APODService:
@@ -17,15 +43,37 @@ class APODService:
     BASE_URL = "https://api.nasa.gov/planetary/apod"
     
     def __init__(self, api_key=None):
-        self.api_key = api_key or getattr(settings, 'NASA_API_KEY', 'DEMO_KEY')
+        # None lets the shared client pick a key from the NASA_API_KEYS pool
+        self.api_key = api_key
     
     def fetch_apod(self, date=None):
         """
-        Fetch APOD data for a specific date or today
+        Fetch APOD data for a specific date or NASA's current date.
+
+        Concurrent requests for the same missing date make a single NASA
+        call: other threads receive its result and other processes find the
+        stored row once it finishes (see core.singleflight). Dates whose
+        fetch failed recently, e.g. today's APOD before NASA publishes it,
+        return None without a request until the negative-cache TTL expires.
         """
         if date is None:
-            date = timezone.now().date()
+            date = archive_today()
+        
+        existing_apod = APOD.objects.filter(date=date).first()
+        if existing_apod:
+            return existing_apod
         
+        if recent_failure(FetchLedger.SOURCE_APOD, date, date):
+            logger.info(f"APOD for {date} failed recently; not asking NASA again yet")
+            return None
+        
+        try:
+            return single_flight(f"{FetchLedger.SOURCE_APOD}:{date}", lambda: self._fetch_apod(date))
+        except SingleFlightTimeout as e:
+            logger.error(f"Gave up waiting for APOD {date}: {e}")
+            return None
+    
+    def _fetch_apod(self, date):
         # Check if we already have this APOD in our database
         try:
             existing_apod = APOD.objects.get(date=date)
@@ -34,59 +82,242 @@ class APODService:
         except APOD.DoesNotExist:
             pass
         
-        # Fetch from NASA API
-        params = {
-            'api_key': self.api_key,
-            'date': date.strftime('%Y-%m-%d')
-        }
-        
         try:
-            response = requests.get(self.BASE_URL, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Create APOD object
-            apod = APOD.objects.create(
-                date=date,
-                title=data.get('title', ''),
-                explanation=data.get('explanation', ''),
-                url=data.get('url', ''),
-                media_type=data.get('media_type', 'image'),
-                hdurl=data.get('hdurl', '')
-            )
-            
+            with IngestRecorder(FetchLedger.SOURCE_APOD, date, date):
+                apod = self.store_apod(date, self.request_apod(date))
             logger.info(f"Successfully fetched and saved APOD for {date}")
             return apod
             
+        except CircuitOpenError as e:
+            logger.warning(f"Skipping APOD for {date}: {e}")
+            return None
         except requests.RequestException as e:
             logger.error(f"Error fetching APOD for {date}: {e}")
+            record_fetch(FetchLedger.SOURCE_APOD, date, date, error=e)
             return None
         except Exception as e:
             logger.error(f"Unexpected error processing APOD for {date}: {e}")
+            record_fetch(FetchLedger.SOURCE_APOD, date, date, error=e)
             return None
     
-    def fetch_recent_apods(self, days=7):
+    def request_apod(self, date):
         """
-        Fetch APOD data for the last N days
+        Request one day's APOD from NASA and return the decoded payload
         """
-        apods = []
-        for i in range(days):
-            date = timezone.now().date() - timedelta(days=i)
-            apod = self.fetch_apod(date)
-            if apod:
-                apods.append(apod)
+        params = {
+            'api_key': self.api_key,
+            'date': date.strftime('%Y-%m-%d')
+        }
         
-        return apods
+        with circuit_breaker(FetchLedger.SOURCE_APOD):
+            response = nasa_client().get(self.BASE_URL, params=params, timeout=10)
+            response.raise_for_status()
+        received(len(response.content))
+        with phase('parse'):
+            return response.json()
     
-    def get_latest_apod(self):
+    def store_apod(self, date, data):
         """
-        Get the most recent APOD from database or fetch new one
+        Store a decoded APOD payload and record it in the fetch ledger
         """
-        try:
-            latest = APOD.objects.latest('date')
-            if latest.is_today:
-                return latest
-        except APOD.DoesNotExist:
-            pass
+        with storing():
+            try:
+                apod = APOD.objects.create(
+                    date=date,
+                    title=data.get('title', ''),
+                    explanation=data.get('explanation', ''),
+                    url=data.get('url', ''),
+                    media_type=data.get('media_type', 'image'),
+                    hdurl=data.get('hdurl', '')
+                )
+            except IntegrityError:
+                # Stored by a process not covered by the fetch lock
+                apod = APOD.objects.get(date=date)
+                count(skipped=1)
+            else:
+                bump_data_version(FetchLedger.SOURCE_APOD)
+                count(inserted=1)
+            
+            record_fetch(FetchLedger.SOURCE_APOD, date, date, records=1)
+        return apod
+    
+    def fetch_recent_apods(self, days=7, force=False):
+        """
+        Fetch APOD data for the last N days.
+
+        Only dates the fetch ledger reports as missing or stale are
+        requested unless ``force`` is set (see ``fetch_range``).
+        """
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=days - 1)
+        
+        self.fetch_range(start_date, end_date, force=force)
+        
+        return list(APOD.objects.filter(date__gte=start_date, date__lte=end_date))
+    
+    def fetch_range(self, start_date, end_date, force=False, workers=1, chunk_days=RANGE_CHUNK_DAYS,
+                    on_span_done=None):
+        """
+        Fetch every missing APOD of an inclusive date range.
+
+        Only the contiguous spans still missing are requested, through the
+        date-range API in calls of up to ``chunk_days`` days. ``workers``
+        spans are downloaded concurrently while the calling thread bulk
+        inserts each one as it arrives. ``on_span_done(span, created)`` is
+        called after each span is stored. The range is clamped to the
+        archive, from 1995-06-16 to NASA's current date.
+        """
+        start_date = max(start_date, ARCHIVE_START)
+        end_date = min(end_date, archive_today())
+        
+        return single_flight(
+            f"{FetchLedger.SOURCE_APOD}:{start_date}:{end_date}:{'force' if force else 'plan'}",
+            lambda: self._fetch_range(start_date, end_date, force, workers, chunk_days, on_span_done),
+        )
+    
+    def _fetch_range(self, start_date, end_date, force, workers, chunk_days, on_span_done):
+        spans = self.missing_spans(start_date, end_date, force=force, chunk_days=chunk_days)
+        created = 0
+        failed = []
+        # One IngestRun per span, timed on the download thread and the writer
+        runs = {}
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+            queued = iter(spans)
+            
+            def submit_next():
+                span = next(queued, None)
+                if span is not None:
+                    run = runs[span] = IngestRecorder(FetchLedger.SOURCE_APOD, *span)
+                    pending[pool.submit(run.call, self.request_range, *span)] = span
+            
+            # At most two responses per worker wait for the writer
+            for _ in range(workers * 2):
+                submit_next()
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    span = pending.pop(future)
+                    try:
+                        with runs.pop(span):
+                            span_created = self.store_range(*span, future.result())
+                    except CircuitOpenError as e:
+                        logger.warning(f"Skipping APOD {span[0]} to {span[1]}: {e}")
+                        failed.append(span)
+                    except requests.RequestException as e:
+                        logger.error(f"Error fetching APOD {span[0]} to {span[1]}: {e}")
+                        record_fetch(FetchLedger.SOURCE_APOD, *span, error=e)
+                        failed.append(span)
+                    except Exception as e:
+                        logger.error(f"Unexpected error processing APOD {span[0]} to {span[1]}: {e}")
+                        record_fetch(FetchLedger.SOURCE_APOD, *span, error=e)
+                        failed.append(span)
+                    else:
+                        created += span_created
+                        if on_span_done:
+                            on_span_done(span, span_created)
+                    submit_next()
+        
+        logger.info(
+            f"Successfully fetched APOD {start_date} to {end_date}: "
+            f"{len(spans) - len(failed)} of {len(spans)} spans, {created} entries created"
+        )
+        return {'spans': len(spans), 'created': created, 'failed_spans': sorted(failed)}
+    
+    def missing_spans(self, start_date, end_date, force=False, chunk_days=RANGE_CHUNK_DAYS):
+        """
+        Return the (start, end) spans of at most ``chunk_days`` days that
+        still have to be requested: the windows the fetch ledger reports as
+        missing or stale (every window with ``force``), trimmed of stored
+        days at both ends and dropped when every day is stored. Stored days
+        inside a span are requested again rather than split into more calls,
+        and skipped on insert.
+        """
+        stored = set(
+            APOD.objects.filter(date__gte=start_date, date__lte=end_date).values_list('date', flat=True)
+        )
+        if force:
+            windows = split_windows(start_date, end_date, chunk_days)
+        else:
+            windows = plan_windows(FetchLedger.SOURCE_APOD, start_date, end_date, chunk_days)
+        
+        spans = []
+        for window_start, window_end in windows:
+            while window_start <= window_end and window_start in stored:
+                window_start += timedelta(days=1)
+            while window_end >= window_start and window_end in stored:
+                window_end -= timedelta(days=1)
+            if window_start <= window_end:
+                spans.append((window_start, window_end))
+        return spans
+    
+    def request_range(self, start_date, end_date):
+        """
+        Request a span of days from the APOD date-range API and return the
+        decoded list of entries
+        """
+        params = {
+            'api_key': self.api_key,
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d')
+        }
         
-        return self.fetch_apod() 
\ No newline at end of file
+        with circuit_breaker(FetchLedger.SOURCE_APOD):
+            response = nasa_client().get(self.BASE_URL, params=params, timeout=30)
+            response.raise_for_status()
+        received(len(response.content))
+        with phase('parse'):
+            data = response.json()
+        return data if isinstance(data, list) else [data]
+    
+    def store_range(self, start_date, end_date, entries):
+        """
+        Bulk insert the entries of one span that are not stored yet, record
+        the span in the fetch ledger and return the number created
+        """
+        with storing():
+            stored = set(
+                APOD.objects.filter(date__gte=start_date, date__lte=end_date).values_list('date', flat=True)
+            )
+            new_apods = []
+            for entry in entries:
+                day = datetime.strptime(entry['date'], '%Y-%m-%d').date()
+                if day in stored or not start_date <= day <= end_date:
+                    continue
+                stored.add(day)
+                new_apods.append(APOD(
+                    date=day,
+                    title=entry.get('title', ''),
+                    explanation=entry.get('explanation', ''),
+                    url=entry.get('url', ''),
+                    media_type=entry.get('media_type', 'image'),
+                    hdurl=entry.get('hdurl', '')
+                ))
+            
+            APOD.objects.bulk_create(new_apods, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+            record_fetch(FetchLedger.SOURCE_APOD, start_date, end_date, records=len(entries))
+            if new_apods:
+                bump_data_version(FetchLedger.SOURCE_APOD)
+        count(inserted=len(new_apods), skipped=len(entries) - len(new_apods))
+        return len(new_apods)
+    
+    def get_latest_apod(self):
+        """
+        Get the most recent stored APOD without calling NASA, or None when
+        nothing is stored yet. Pages pair it with ``refresh_latest`` run in
+        the background, so their latency never depends on NASA.
+        """
+        return APOD.objects.order_by('-date').first()
+    
+    def refresh_latest(self):
+        """
+        Fetch the APODs of yesterday and today (in NASA's time zone) if they
+        are still missing and mirror their images, e.g. from a background
+        thread or a scheduler
+        """
+        today = archive_today()
+        stats = self.fetch_range(today - timedelta(days=1), today)
+        mirror_images(list(pending_images().filter(date__gte=today - timedelta(days=1))))
+        return stats
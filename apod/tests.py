@@ -1,3 +1,322 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from core.models import FetchLedger
+from core.testing import start_stand_in_nasa
+from .images import mirror_images, pending_images
+from .models import APOD
+from .search import fts_query, search_apods
+from .services import ARCHIVE_START, APODService, archive_today
 
-# Create your tests here.
+
+def make_apod(day, title, explanation):
+    return APOD.objects.create(
+        date=day, title=title, explanation=explanation, url='https://apod.nasa.gov/apod/image/x.jpg',
+        media_type='image',
+    )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 search is SQLite specific')
+class SearchTests(TestCase):
+    """
+    The FTS5 index follows every write to APOD and ranks title matches first
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.andromeda = make_apod(date(2024, 1, 1), 'The Andromeda Galaxy', 'Our large spiral neighbour.')
+        cls.mention = make_apod(date(2024, 1, 2), 'Comet Over Mountains', 'Below the andromeda galaxy, a comet <rises>.')
+        make_apod(date(2024, 1, 3), 'Aurora', 'Green curtains of light above Norway.')
+
+    def setUp(self):
+        # Views cache their data per data version, which tests change directly
+        cache.clear()
+
+    def test_title_matches_rank_first(self):
+        results = search_apods('andromeda')
+        self.assertEqual([apod.date for apod in results], [self.andromeda.date, self.mention.date])
+        self.assertLess(results[0].rank, results[1].rank)
+        self.assertEqual(results[0].title_highlight, 'The <mark>Andromeda</mark> Galaxy')
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        result = search_apods('comet rises')[0]
+        self.assertIn('<mark>comet</mark> &lt;<mark>rises</mark>&gt;', result.snippet)
+
+    def test_index_follows_updates_and_deletes(self):
+        self.andromeda.title = 'Messier 31'
+        self.andromeda.save()
+        self.assertEqual([apod.date for apod in search_apods('messier')], [self.andromeda.date])
+        APOD.objects.filter(pk=self.mention.pk).update(explanation='Nothing to see.')
+        self.assertEqual(search_apods('below'), [])
+        self.andromeda.delete()
+        self.assertEqual(search_apods('spiral'), [])
+
+    def test_prefix_and_syntax_safe_query(self):
+        self.assertEqual(fts_query('androm OR "gal'), '"androm" "OR" "gal"*')
+        self.assertEqual(len(search_apods('andro')), 2)
+        self.assertEqual(search_apods('" * ('), [])
+
+    def test_json_endpoint(self):
+        response = self.client.get(reverse('apod:search_api'), {'q': 'aurora'})
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['date'], '2024-01-03')
+        self.assertEqual(data['results'][0]['title_highlight'], '<mark>Aurora</mark>')
+
+    def test_search_page(self):
+        response = self.client.get(reverse('apod:search'), {'q': 'galaxy'})
+        self.assertContains(response, 'The Andromeda <mark>Galaxy</mark>', html=False)
+
+
+def apod_range(query):
+    """Stand-in date-range API: one entry per requested day"""
+    start, end = date.fromisoformat(query['start_date']), date.fromisoformat(query['end_date'])
+    return json.dumps([
+        {'date': str(start + timedelta(days=i)), 'title': f'Day {i}', 'explanation': 'Stars.',
+         'url': 'https://apod.nasa.gov/apod/image/x.jpg', 'media_type': 'image'}
+        for i in range((end - start).days + 1)
+    ]).encode()
+
+
+@override_settings(NASA_API_KEYS=['key'], NASA_RATE_LIMIT_PER_SECOND=1000, NASA_RATE_LIMIT_BURST=100)
+class RangeFetchTests(TestCase):
+    """
+    Missing days are fetched through the date-range API in bulk
+    """
+
+    def setUp(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        override = override_settings(SINGLE_FLIGHT_LOCK_DIR=lock_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.server = start_stand_in_nasa(self)
+        self.server.bodies = {'/planetary/apod': apod_range}
+        patcher = mock.patch.object(
+            APODService, 'BASE_URL', f'http://127.0.0.1:{self.server.server_port}/planetary/apod'
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_backfill_requests_chunks_and_bulk_inserts(self):
+        end = ARCHIVE_START + timedelta(days=999)
+        stats = APODService().fetch_range(ARCHIVE_START - timedelta(days=30), end, workers=4, chunk_days=90)
+
+        self.assertEqual(APOD.objects.count(), 1000)
+        self.assertEqual(stats, {'spans': 12, 'created': 1000, 'failed_spans': []})
+        self.assertEqual(len(self.server.seen), 12)
+        self.assertEqual(APOD.objects.earliest('date').date, ARCHIVE_START)
+
+        # Everything is stored and in the ledger: nothing left to request
+        self.assertEqual(APODService().fetch_range(ARCHIVE_START, end)['spans'], 0)
+        self.assertEqual(len(self.server.seen), 12)
+
+    def test_only_missing_spans_are_requested(self):
+        start = date(2024, 3, 1)
+        for day in (start, start + timedelta(days=1), start + timedelta(days=5), start + timedelta(days=9)):
+            make_apod(day, 'Stored', 'Already here.')
+
+        service = APODService()
+        self.assertEqual(
+            service.missing_spans(start, start + timedelta(days=9), force=True),
+            [(start + timedelta(days=2), start + timedelta(days=8))],
+        )
+        stats = service.fetch_range(start, start + timedelta(days=9))
+        self.assertEqual(stats['created'], 6)
+        self.assertEqual(APOD.objects.get(date=start).title, 'Stored')
+        self.assertTrue(FetchLedger.objects.filter(
+            source=FetchLedger.SOURCE_APOD, start_date=start + timedelta(days=2), end_date=start + timedelta(days=8)
+        ).exists())
+
+    def test_recent_apods_use_one_request(self):
+        apods = APODService().fetch_recent_apods(days=7)
+        self.assertEqual(len(self.server.seen), 1)
+        self.assertGreaterEqual(len(apods), 6)
+
+
+class LandingPageTests(TestCase):
+    """
+    The landing page is served from stored data and never waits on NASA
+    """
+
+    def create_apod(self, day):
+        return APOD.objects.create(date=day, title=f'APOD {day}', explanation='', url='https://example.com/a.jpg')
+
+    def get_home(self):
+        with mock.patch('core.http_client.NasaClient.get') as get, \
+                mock.patch('apod.views.refresh_in_background') as refresh:
+            response = self.client.get(reverse('apod:home'))
+        get.assert_not_called()
+        return response, refresh
+
+    def test_current_apod_is_served_without_refresh(self):
+        self.create_apod(archive_today())
+        response, refresh = self.get_home()
+        self.assertFalse(response.context['is_stale'])
+        refresh.assert_not_called()
+
+    def test_outdated_apod_is_served_stale_and_refreshed_in_background(self):
+        yesterday = self.create_apod(archive_today() - timedelta(days=1))
+        response, refresh = self.get_home()
+        self.assertEqual(response.context['apod'], yesterday)
+        self.assertTrue(response.context['is_stale'])
+        refresh.assert_called_once()
+        self.assertEqual(refresh.call_args.args[0], 'apod:latest')
+
+    def test_empty_database_schedules_first_fetch(self):
+        response, refresh = self.get_home()
+        self.assertIsNone(response.context['apod'])
+        self.assertContains(response, 'being fetched')
+        refresh.assert_called_once()
+
+
+class DetailPageTests(TestCase):
+    """
+    The detail page shows one APOD by date and answers revalidations with 304
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.day = date(2024, 3, 14)
+        make_apod(self.day, 'Pi Day Nebula', 'A nebula for pi day.')
+
+    def test_stored_apod_then_not_modified(self):
+        url = reverse('apod:detail', args=[self.day.isoformat()])
+        with mock.patch('core.http_client.NasaClient.get') as get:
+            response = self.client.get(url)
+            get.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Pi Day Nebula')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalid_dates_are_not_found(self):
+        with mock.patch.object(APODService, 'fetch_apod') as fetch:
+            for value in ('not-a-date', '2024-02-30', '1990-01-01', str(archive_today() + timedelta(days=2))):
+                with self.subTest(value=value):
+                    response = self.client.get(reverse('apod:detail', args=[value]))
+                    self.assertEqual(response.status_code, 404)
+        fetch.assert_not_called()
+
+    def test_missing_apod_is_fetched_or_not_validated(self):
+        day = date(2024, 3, 15)
+        with mock.patch.object(APODService, 'fetch_apod', return_value=None) as fetch:
+            response = self.client.get(reverse('apod:detail', args=[day.isoformat()]))
+        fetch.assert_called_once_with(day)
+        self.assertContains(response, f'No APOD found for {day}')
+        self.assertNotIn('ETag', response)
+        self.assertIn('no-store', response['Cache-Control'])
+
+
+def jpeg_bytes(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (20, 40, 90)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class ImageMirrorTests(TestCase):
+    """
+    APOD images are downloaded once, stored by content hash and served as
+    responsive variants
+    """
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        override = override_settings(MEDIA_ROOT=self.media_root, APOD_IMAGE_WIDTHS=[320, 640, 1280])
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.server = start_stand_in_nasa(self)
+        self.server.bodies = {'/large.jpg': jpeg_bytes(2000, 1000), '/small.jpg': jpeg_bytes(500, 400)}
+        self.server.content_types = {'/large.jpg': 'image/jpeg', '/small.jpg': 'image/jpeg'}
+
+    def create_apod(self, day, path):
+        return APOD.objects.create(
+            date=day, title=f'APOD {day}', explanation='', media_type='image',
+            url=f'http://127.0.0.1:{self.server.server_port}{path}',
+        )
+
+    def test_variants_are_written_by_content_hash(self):
+        apod = self.create_apod(date(2024, 5, 1), '/large.jpg')
+        self.assertEqual(mirror_images([apod]), {'mirrored': 1, 'failed': 0})
+
+        apod.refresh_from_db()
+        self.assertEqual((apod.image_width, apod.image_height), (2000, 1000))
+        self.assertEqual(apod.image_widths, [320, 640, 1280])
+        self.assertEqual(apod.display_height, 640)
+        files = os.listdir(os.path.join(self.media_root, 'apod', apod.image_sha256[:2]))
+        self.assertEqual(len(files), 7)
+        for width in (320, 640, 1280):
+            for extension, image_format in (('jpg', 'JPEG'), ('webp', 'WEBP')):
+                path = os.path.join(self.media_root, 'apod', apod.image_sha256[:2],
+                                    f'{apod.image_sha256}-{width}.{extension}')
+                with Image.open(path) as variant:
+                    self.assertEqual((variant.format, variant.size), (image_format, (width, width // 2)))
+
+        self.assertIn(f'{apod.image_sha256}-320.webp 320w', apod.webp_srcset)
+        self.assertTrue(apod.image_src.endswith(f'{apod.image_sha256}-640.jpg'))
+
+    def test_small_images_are_not_enlarged(self):
+        apod = self.create_apod(date(2024, 5, 1), '/small.jpg')
+        mirror_images([apod])
+        apod.refresh_from_db()
+        self.assertEqual(apod.image_widths, [320, 500])
+
+    def test_each_url_is_downloaded_once(self):
+        first = self.create_apod(date(2024, 5, 1), '/large.jpg')
+        second = self.create_apod(date(2024, 5, 2), '/large.jpg')
+        self.assertEqual(mirror_images([first, second])['mirrored'], 2)
+        self.assertEqual(len(self.server.seen), 1)
+
+        # A later entry reusing the image is mirrored without a download
+        third = self.create_apod(date(2024, 5, 3), '/large.jpg')
+        mirror_images(list(pending_images()))
+        third.refresh_from_db()
+        self.assertEqual(third.image_sha256, APOD.objects.get(pk=first.pk).image_sha256)
+        self.assertEqual(len(self.server.seen), 1)
+
+    def test_failures_are_recorded_and_not_retried(self):
+        apod = self.create_apod(date(2024, 5, 1), '/missing.jpg')
+        self.server.responses = [(404, {})]
+        self.assertEqual(mirror_images([apod]), {'mirrored': 0, 'failed': 1})
+        apod.refresh_from_db()
+        self.assertIn('404', apod.image_error)
+        self.assertFalse(pending_images().exists())
+
+    def test_variants_are_served_with_immutable_cache_headers(self):
+        apod = self.create_apod(date(2024, 5, 1), '/large.jpg')
+        mirror_images([apod])
+        apod.refresh_from_db()
+
+        response = self.client.get(apod.image_url(640, 'webp'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get('/media/apod/../../settings.py').status_code, 404)
+
+    def test_archive_uses_srcset_and_mirrors_pending_images_in_background(self):
+        mirrored = self.create_apod(date(2024, 5, 1), '/large.jpg')
+        mirror_images([mirrored])
+        self.create_apod(date(2024, 5, 2), '/small.jpg')
+
+        with mock.patch('apod.views.refresh_in_background') as refresh:
+            response = self.client.get(reverse('apod:archive'))
+        mirrored.refresh_from_db()
+        self.assertContains(response, f'srcset="{mirrored.webp_srcset}"')
+        self.assertContains(response, 'loading="lazy"')
+        refresh.assert_called_once()
+        self.assertEqual(refresh.call_args.args[0], 'apod:images')
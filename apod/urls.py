@@ -7,5 +7,8 @@ urlpatterns = [
     path('', views.apod_home, name='home'),
     path('archive/', views.apod_archive, name='archive'),
     path('detail/<str:date>/', views.apod_detail, name='detail'),
+    path('search/', views.apod_search, name='search'),
+    path('api/search/', views.apod_search_api, name='search_api'),
+    path('export/', views.export_apod, name='export'),
     path('refresh/', views.refresh_apod, name='refresh'),
 ] 
\ No newline at end of file
@@ -1,54 +1,93 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
+from django.utils.dateparse import parse_date
+from django.utils.cache import add_never_cache_headers
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from core.background import refresh_in_background
+from core.breaker import source_unavailable
+from core.cache import cache_response, cached
+from core.conditional import conditional_on
+from core.exports import export_response
+from core.jobs import enqueue
+from core.models import FetchLedger
+from core.pagination import paginate_keyset
+from core.views import job_accepted
+from .images import mirror_pending
 from .models import APOD
-from .services import APODService
+from .search import search_apods
+from .services import ARCHIVE_START, APODService, archive_today
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_LIMIT = 100
+
+APOD_EXPORT_FIELDS = [
+    (name, name) for name in ('date', 'title', 'explanation', 'media_type', 'url', 'hdurl')
+]
 
 
 def apod_home(request):
     """
-    Display the Astronomy Picture of the Day
+    Display the Astronomy Picture of the Day.
+
+    Always rendered from stored data. When the newest stored APOD is behind
+    NASA's current date it is shown marked stale while the missing entry is
+    fetched in the background.
     """
     try:
-        # Get or fetch the latest APOD
         service = APODService()
         apod = service.get_latest_apod()
+        is_stale = apod is None or apod.date < archive_today()
+        if is_stale:
+            refresh_in_background('apod:latest', service.refresh_latest)
         
         if apod:
             context = {
                 'apod': apod,
                 'is_image': apod.media_type == 'image',
                 'is_video': apod.media_type == 'video',
+                'is_stale': is_stale,
+                'stale': source_unavailable(FetchLedger.SOURCE_APOD),
+                'stale_source': 'APOD',
             }
         else:
-            # Fallback data if API fails
+            # Nothing stored yet; the background refresh is fetching it
             context = {
                 'apod': None,
-                'error_message': 'Unable to fetch today\'s Astronomy Picture of the Day. Please try again later.',
+                'error_message': 'The Astronomy Picture of the Day is being fetched from NASA. Please check back in a moment.',
             }
-            messages.warning(request, 'Unable to fetch APOD data from NASA API.')
+            messages.info(request, 'APOD data is being fetched from NASA API.')
             
     except Exception as e:
         context = {
             'apod': None,
-            'error_message': 'An error occurred while fetching the Astronomy Picture of the Day.',
+            'error_message': 'An error occurred while loading the Astronomy Picture of the Day.',
         }
         messages.error(request, f'Error: {str(e)}')
     
     return render(request, 'apod/home.html', context)
 
 
+@conditional_on(FetchLedger.SOURCE_APOD)
 def apod_archive(request):
     """
-    Display a list of recent APOD entries
+    Display the APOD archive, newest first, 20 entries per page, with the
+    locally mirrored image variants
     """
     try:
-        # Get recent APODs from database
-        recent_apods = APOD.objects.all()[:20]  # Last 20 entries
+        page = cached(
+            'apod:archive', [FetchLedger.SOURCE_APOD], (request.GET.get('cursor'),),
+            lambda: paginate_keyset(
+                APOD.objects.all(), request.GET.get('cursor'), ordering=('-date', '-id'), per_page=20
+            )
+        )
+        if any(apod.image_pending for apod in page):
+            # Visitors get NASA's images until the local variants exist
+            refresh_in_background('apod:images', mirror_pending)
         
         context = {
-            'apods': recent_apods,
+            'apods': page,
+            'page': page,
         }
         
     except Exception as e:
@@ -58,35 +97,99 @@ def apod_archive(request):
         }
         messages.error(request, f'Error: {str(e)}')
     
-    return render(request, 'apod/archive.html', context)
+    response = render(request, 'apod/archive.html', context)
+    if 'error_message' in context:
+        # Not validated, so the next visit loads the data again
+        add_never_cache_headers(response)
+    return response
 
 
-@require_http_methods(["POST"])
-def refresh_apod(request):
+@conditional_on(FetchLedger.SOURCE_APOD)
+def apod_search(request):
     """
-    AJAX endpoint to refresh APOD data
+    Full-text search page over APOD titles and explanations
     """
+    query = request.GET.get('q', '').strip()
     try:
-        service = APODService()
-        apod = service.fetch_apod()  # Force fetch new data
+        context = {
+            'query': query,
+            'results': search_apods(query, limit=SEARCH_PAGE_SIZE) if query else [],
+        }
         
-        if apod:
-            return JsonResponse({
-                'success': True,
-                'apod': {
+    except Exception as e:
+        context = {
+            'query': query,
+            'results': [],
+            'error_message': 'Unable to search the APOD archive.',
+        }
+        messages.error(request, f'Error: {str(e)}')
+    
+    response = render(request, 'apod/search.html', context)
+    if 'error_message' in context:
+        # Not validated, so the next visit loads the data again
+        add_never_cache_headers(response)
+    return response
+
+
+@conditional_on(FetchLedger.SOURCE_APOD)
+@cache_response(FetchLedger.SOURCE_APOD)
+def apod_search_api(request):
+    """
+    JSON endpoint for APOD full-text search
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(int(request.GET.get('limit', SEARCH_PAGE_SIZE)), SEARCH_MAX_LIMIT)
+    except ValueError:
+        limit = SEARCH_PAGE_SIZE
+    
+    try:
+        results = search_apods(query, limit=max(limit, 1)) if query else []
+        return JsonResponse({
+            'success': True,
+            'query': query,
+            'count': len(results),
+            'results': [
+                {
+                    'date': apod.date.strftime('%Y-%m-%d'),
                     'title': apod.title,
-                    'explanation': apod.explanation,
-                    'url': apod.url,
+                    'title_highlight': apod.title_highlight,
+                    'snippet': apod.snippet,
                     'media_type': apod.media_type,
-                    'date': apod.date.strftime('%Y-%m-%d'),
+                    'url': apod.url,
+                    'rank': apod.rank,
                 }
-            })
-        else:
-            return JsonResponse({
-                'success': False,
-                'error': 'Unable to fetch APOD data'
-            })
-            
+                for apod in results
+            ],
+        })
+        
+    except Exception as e:
+        response = JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+        # Not kept by cache_response
+        add_never_cache_headers(response)
+        return response
+
+
+@conditional_on(FetchLedger.SOURCE_APOD)
+def export_apod(request):
+    """
+    Stream the APOD archive as NDJSON or CSV, newest first
+    """
+    return export_response(request, APOD.objects.order_by('-date'), APOD_EXPORT_FIELDS, 'apod')
+
+
+@require_http_methods(["POST"])
+def refresh_apod(request):
+    """
+    AJAX endpoint queueing a refresh of the APOD data. Answers at once with
+    the job; poll its status URL for progress and the result.
+    """
+    try:
+        return job_accepted(enqueue('apod.refresh', unique=True))
+        
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -94,23 +197,21 @@ def refresh_apod(request):
         })
 
 
+@conditional_on(FetchLedger.SOURCE_APOD)
 def apod_detail(request, date):
     """
-    Display a specific APOD by date
+    Display a specific APOD by date, fetching it from NASA if it is not
+    stored yet
     """
     try:
-        apod = APOD.objects.get(date=date)
-        context = {
-            'apod': apod,
-            'is_image': apod.media_type == 'image',
-            'is_video': apod.media_type == 'video',
-        }
-        
-    except APOD.DoesNotExist:
-        # Try to fetch from API
-        service = APODService()
-        apod = service.fetch_apod(date)
-        
+        day = parse_date(date)
+    except ValueError:
+        day = None
+    if day is None or not ARCHIVE_START <= day <= archive_today():
+        raise Http404(f'No APOD for {date}')
+    
+    try:
+        apod = APODService().fetch_apod(day)
         if apod:
             context = {
                 'apod': apod,
@@ -120,8 +221,19 @@ def apod_detail(request, date):
         else:
             context = {
                 'apod': None,
-                'error_message': f'No APOD found for {date}',
+                'error_message': f'No APOD found for {day}',
             }
-            messages.warning(request, f'No APOD found for {date}')
+            messages.warning(request, f'No APOD found for {day}')
+    
+    except Exception as e:
+        context = {
+            'apod': None,
+            'error_message': f'An error occurred while loading the APOD for {day}.',
+        }
+        messages.error(request, f'Error: {str(e)}')
     
-    return render(request, 'apod/detail.html', context)
+    response = render(request, 'apod/detail.html', context)
+    if 'error_message' in context:
+        # Not validated, so the next visit loads the data again
+        add_never_cache_headers(response)
+    return response
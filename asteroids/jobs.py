@@ -0,0 +1,22 @@
+from core.breaker import source_unavailable
+from core.jobs import job
+from core.models import FetchLedger
+from .services import AsteroidService
+
+
+@job('asteroids.refresh')
+def refresh(progress):
+    """
+    Fetch the coming week of close approaches for the refresh button on the
+    asteroid page
+    """
+    progress('Fetching near-Earth asteroids from NASA NeoWs')
+    stats = AsteroidService().fetch_asteroids()
+    asteroids_created = stats['asteroids_inserted']
+    
+    return {
+        'asteroids_created': asteroids_created,
+        'stats': stats,
+        'stale': source_unavailable(FetchLedger.SOURCE_NEOWS),
+        'message': f'Successfully fetched {asteroids_created} new asteroids',
+    }
@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from asteroids.models import Asteroid
+from asteroids.search import search_asteroids
+from asteroids.services import AsteroidService
+from core.sample_payloads import make_neows_feed
+
+
+class Command(BaseCommand):
+    help = 'Time ranked asteroid name search against an icontains scan on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--asteroids',
+            type=int,
+            default=36000,
+            help='Synthetic asteroids to load (default: 36000, about the full NEO catalog)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Runs per query and method (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            AsteroidService(api_key='BENCHMARK').ingest_feed(make_neows_feed(options['asteroids']))
+            sample = Asteroid.objects.order_by('id')[options['asteroids'] // 2]
+            typo = sample.name[:-3] + ('7' if sample.name[-3] != '7' else '3') + sample.name[-2:]
+            queries = [
+                ('exact', sample.name),
+                ('reference id', sample.neo_reference_id),
+                ('prefix', sample.name[:7]),
+                ('typo', typo),
+                ('no match', 'zzzz 9999'),
+            ]
+            self.stdout.write(self.style.SUCCESS(
+                f"{'query':<28} {'search median':>14} {'icontains median':>17}  top match"
+            ))
+            for label, query in queries:
+                results, ranked = self._time(lambda: search_asteroids(query), options['repeat'])
+                _, scan = self._time(
+                    lambda: list(Asteroid.objects.filter(
+                        Q(name__icontains=query) | Q(neo_reference_id__icontains=query)
+                    )[:10]),
+                    options['repeat'],
+                )
+                top = f'{results[0].name} ({results[0].match})' if results else '-'
+                self.stdout.write(
+                    f'{f"{label}: {query}":<28} {ranked * 1000:>12.2f}ms {scan * 1000:>15.2f}ms  {top}'
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _time(self, search, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            results = search()
+            timings.append(time.perf_counter() - started)
+        return results, statistics.median(timings)
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from asteroids.models import Asteroid, CloseApproach
+from asteroids.services import AsteroidService
+from core.sample_payloads import make_neows_feed
+
+
+class QueryCounter:
+    """
+    Count executed statements without keeping a query log
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-row vs bulk asteroid ingest (query count and wall time) on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--asteroids',
+            type=int,
+            default=150,
+            help='Number of objects in the synthetic feed (default: 150, about one 7-day window)'
+        )
+
+    def handle(self, *args, **options):
+        count = options['asteroids']
+        feed = make_neows_feed(count)
+        service = AsteroidService(api_key='BENCHMARK')
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(self.style.SUCCESS(f'Ingesting a synthetic feed of {count} asteroids'))
+            for label, bulk in (('per-row', False), ('bulk', True)):
+                CloseApproach.objects.all().delete()
+                Asteroid.objects.all().delete()
+                for phase in ('initial load', 'repeat sync'):
+                    queries = QueryCounter()
+                    with connection.execute_wrapper(queries):
+                        started = time.perf_counter()
+                        stats = service.ingest_feed(feed, bulk=bulk)
+                        elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'  {label:<8} {phase:<13} {queries.count:>6} queries  {elapsed * 1000:>9.1f} ms  '
+                        f"asteroids +{stats['asteroids_inserted']}/~{stats['asteroids_updated']}"
+                        f"/={stats['asteroids_skipped']}  "
+                        f"approaches +{stats['approaches_inserted']}/~{stats['approaches_updated']}"
+                        f"/={stats['approaches_skipped']}"
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -1,5 +1,10 @@
-from django.core.management.base import BaseCommand
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
 from asteroids.services import AsteroidService
+from core.ledger import get_policy
+from core.models import FetchLedger
 
 
 class Command(BaseCommand):
@@ -10,19 +15,81 @@ class Command(BaseCommand):
             '--days',
             type=int,
             default=7,
-            help='Number of days to fetch (default: 7)'
+            help='Number of days to fetch starting at --start or today (default: 7, ignored when --end is given)'
+        )
+        parser.add_argument(
+            '--start',
+            type=date.fromisoformat,
+            help='First day of the range to backfill (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--end',
+            type=date.fromisoformat,
+            help='Last day of the range to backfill (YYYY-MM-DD, default: the range covers --days days starting at --start)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of concurrent NeoWs requests (default: 4)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Fetch every window again, even if the fetch ledger has it'
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='Parse responses incrementally to keep memory flat on large backfills'
         )
 
     def handle(self, *args, **options):
-        days = options['days']
-        
+        start = options['start'] or timezone.now().date()
+        end = options['end'] or start + timedelta(days=options['days'] - 1)
+        if end < start:
+            raise CommandError('--end must not be before --start')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
         self.stdout.write(
-            self.style.SUCCESS(f'Starting to fetch asteroid data for the next {days} days...')
+            self.style.SUCCESS(
+                f"Starting to fetch asteroid data from {start} to {end} "
+                f"with {options['workers']} workers..."
+            )
         )
-        
+
+        def on_window_done(window, stats):
+            self.stdout.write(
+                f"  - {window[0]} to {window[1]}: {stats['approaches_inserted']} approaches inserted, "
+                f"{stats['approaches_updated']} updated"
+            )
+
         service = AsteroidService()
-        asteroids_created = service.fetch_asteroids()
-        
+        stats = service.backfill(
+            start, end,
+            workers=options['workers'],
+            force=options['force'],
+            stream=options['stream'],
+            on_window_done=on_window_done,
+        )
+
+        if stats['skipped_days']:
+            self.stdout.write(f"  Skipped {stats['skipped_days']} days already in the fetch ledger")
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully fetched {asteroids_created} asteroids')
-        ) 
\ No newline at end of file
+            self.style.SUCCESS(
+                f"Successfully fetched asteroids: {stats['asteroids_inserted']} inserted, "
+                f"{stats['asteroids_updated']} updated, {stats['asteroids_skipped']} skipped"
+            )
+        )
+        self.stdout.write(
+            f"  Close approaches: {stats['approaches_inserted']} inserted, "
+            f"{stats['approaches_updated']} updated, {stats['approaches_skipped']} skipped"
+        )
+        if stats['failed_windows']:
+            failed = ', '.join(f'{s} to {e}' for s, e in stats['failed_windows'])
+            # The ledger skips recently failed windows until the negative-cache TTL expires
+            retry_after = get_policy(FetchLedger.SOURCE_NEOWS)['negative_ttl_minutes']
+            self.stdout.write(self.style.WARNING(
+                f'Failed windows (re-run with --force, or after {retry_after} minutes, to retry): {failed}'
+            ))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asteroids', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApproachDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('approach_count', models.IntegerField(default=0)),
+                ('hazardous_count', models.IntegerField(default=0, help_text='Approaches by potentially hazardous asteroids')),
+                ('closest_miss_kilometers', models.FloatField(null=True)),
+                ('closest_miss_lunar', models.FloatField(null=True)),
+                ('fastest_velocity_km_per_sec', models.FloatField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Daily Approach Rollup',
+                'verbose_name_plural': 'Daily Approach Rollups',
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AsteroidCatalogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_asteroids', models.IntegerField(default=0)),
+                ('hazardous_asteroids', models.IntegerField(default=0)),
+                ('sentry_asteroids', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Asteroid Catalog Rollup',
+                'verbose_name_plural': 'Asteroid Catalog Rollup',
+            },
+        ),
+    ]
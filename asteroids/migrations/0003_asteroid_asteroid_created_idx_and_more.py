@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asteroids', '0002_approachdailyrollup_asteroidcatalogrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asteroid',
+            index=models.Index(fields=['created_at'], name='asteroid_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asteroid',
+            index=models.Index(condition=models.Q(('is_potentially_hazardous', True)), fields=['created_at'], name='asteroid_hazardous_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asteroid',
+            index=models.Index(condition=models.Q(('is_sentry_object', True)), fields=['created_at'], name='asteroid_sentry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='closeapproach',
+            index=models.Index(fields=['close_approach_date'], name='approach_date_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from asteroids.names import name_trigrams, normalize_name
+
+
+def index_existing_names(apps, schema_editor):
+    Asteroid = apps.get_model('asteroids', 'Asteroid')
+    AsteroidNameTrigram = apps.get_model('asteroids', 'AsteroidNameTrigram')
+    asteroids = list(Asteroid.objects.only('id', 'name'))
+    for asteroid in asteroids:
+        asteroid.normalized_name = normalize_name(asteroid.name)
+    Asteroid.objects.bulk_update(asteroids, ['normalized_name'], batch_size=500)
+    AsteroidNameTrigram.objects.bulk_create(
+        (
+            AsteroidNameTrigram(asteroid_id=asteroid.id, trigram=trigram)
+            for asteroid in asteroids
+            for trigram in name_trigrams(asteroid.normalized_name)
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asteroids', '0003_asteroid_asteroid_created_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsteroidNameTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='asteroid',
+            name='normalized_name',
+            field=models.CharField(blank=True, editable=False, help_text='Name reduced to lowercase letters and digits for search', max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='asteroid',
+            index=models.Index(fields=['normalized_name'], name='asteroid_normalized_name_idx'),
+        ),
+        migrations.AddField(
+            model_name='asteroidnametrigram',
+            name='asteroid',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_trigrams', to='asteroids.asteroid'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='asteroidnametrigram',
+            unique_together={('trigram', 'asteroid')},
+        ),
+        migrations.RunPython(index_existing_names, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.utils import timezone
 import pytz
+from .names import normalize_name
 
 
 class Asteroid(models.Model):
@@ -9,6 +10,8 @@ class Asteroid(models.Model):
     """
     neo_reference_id = models.CharField(max_length=50, unique=True)
     name = models.CharField(max_length=200)
+    normalized_name = models.CharField(max_length=200, blank=True, editable=False,
+                                       help_text="Name reduced to lowercase letters and digits for search")
     nasa_jpl_url = models.URLField()
     absolute_magnitude_h = models.FloatField()
     estimated_diameter_min = models.FloatField(help_text="Estimated diameter in kilometers (min)")
@@ -22,10 +25,24 @@ class Asteroid(models.Model):
         ordering = ['-created_at']
         verbose_name = "Near-Earth Asteroid"
         verbose_name_plural = "Near-Earth Asteroids"
+        indexes = [
+            models.Index(fields=['created_at'], name='asteroid_created_idx'),
+            # Boolean filters render as a bare column test, which SQLite can
+            # only serve from a partial index
+            models.Index(fields=['created_at'], condition=models.Q(is_potentially_hazardous=True),
+                         name='asteroid_hazardous_idx'),
+            models.Index(fields=['created_at'], condition=models.Q(is_sentry_object=True),
+                         name='asteroid_sentry_idx'),
+            models.Index(fields=['normalized_name'], name='asteroid_normalized_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} (ID: {self.neo_reference_id})"
 
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
 
 class CloseApproach(models.Model):
     """
@@ -46,6 +63,9 @@ class CloseApproach(models.Model):
         verbose_name = "Close Approach"
         verbose_name_plural = "Close Approaches"
         unique_together = ['asteroid', 'close_approach_date']
+        indexes = [
+            models.Index(fields=['close_approach_date'], name='approach_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.asteroid.name} - {self.close_approach_date.strftime('%Y-%m-%d %H:%M')}"
@@ -66,3 +86,62 @@ class CloseApproach(models.Model):
         """Calculate days until approach"""
         delta = self.close_approach_date - timezone.now()
         return delta.days
+
+
+class AsteroidNameTrigram(models.Model):
+    """
+    Trigrams of each asteroid's normalized name, the index behind
+    typo-tolerant name search
+    """
+    asteroid = models.ForeignKey(Asteroid, on_delete=models.CASCADE, related_name='name_trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        unique_together = ['trigram', 'asteroid']
+
+    def __str__(self):
+        return f"{self.trigram} -> {self.asteroid_id}"
+
+
+class ApproachDailyRollup(models.Model):
+    """
+    Per-day close approach aggregates, kept up to date by ingest so the
+    dashboard does not have to scan the CloseApproach table
+    """
+    day = models.DateField(unique=True)
+    approach_count = models.IntegerField(default=0)
+    hazardous_count = models.IntegerField(default=0, help_text="Approaches by potentially hazardous asteroids")
+    closest_miss_kilometers = models.FloatField(null=True)
+    closest_miss_lunar = models.FloatField(null=True)
+    fastest_velocity_km_per_sec = models.FloatField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['day']
+        verbose_name = "Daily Approach Rollup"
+        verbose_name_plural = "Daily Approach Rollups"
+
+    def __str__(self):
+        return f"{self.day}: {self.approach_count} approaches"
+
+
+class AsteroidCatalogRollup(models.Model):
+    """
+    Single-row catalog totals, refreshed by ingest
+    """
+    total_asteroids = models.IntegerField(default=0)
+    hazardous_asteroids = models.IntegerField(default=0)
+    sentry_asteroids = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Asteroid Catalog Rollup"
+        verbose_name_plural = "Asteroid Catalog Rollup"
+
+    def __str__(self):
+        return f"{self.total_asteroids} asteroids ({self.hazardous_asteroids} hazardous)"
+
+    @classmethod
+    def current(cls):
+        """Return the totals row, or an empty unsaved one before the first ingest"""
+        return cls.objects.first() or cls()
@@ -0,0 +1,17 @@
+import re
+
+_NOT_ALPHANUMERIC = re.compile(r'[\W_]+')
+
+
+def normalize_name(name):
+    """
+    Reduce an asteroid name or designation to lowercase letters and digits,
+    so "(2024 AB12)", "2024 ab12" and "2024AB12" all become "2024ab12" and
+    "433 Eros (A898 PA)" becomes "433erosa898pa"
+    """
+    return _NOT_ALPHANUMERIC.sub('', name or '').lower()
+
+
+def name_trigrams(normalized):
+    """Return the set of three-character substrings of a normalized name"""
+    return {normalized[i:i + 3] for i in range(len(normalized) - 2)}
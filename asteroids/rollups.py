@@ -0,0 +1,120 @@
+import logging
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+import pytz
+from core.dates import day_start
+from .models import Asteroid, ApproachDailyRollup, AsteroidCatalogRollup, CloseApproach
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FIELDS = [
+    'approach_count',
+    'hazardous_count',
+    'closest_miss_kilometers',
+    'closest_miss_lunar',
+    'fastest_velocity_km_per_sec',
+]
+
+
+def refresh_approach_rollups(days):
+    """
+    Recompute the daily approach rollups for the span covering ``days``.
+
+    Days in the span that no longer have approaches lose their rollup row.
+    """
+    days = set(days)
+    if not days:
+        return 0
+    first_day, last_day = min(days), max(days)
+    
+    aggregates = CloseApproach.objects.filter(
+        close_approach_date__gte=day_start(first_day),
+        close_approach_date__lt=day_start(last_day + timedelta(days=1)),
+    ).annotate(
+        day=TruncDate('close_approach_date', tzinfo=pytz.UTC)
+    ).values('day').annotate(
+        approach_count=Count('id'),
+        hazardous_count=Count('id', filter=Q(asteroid__is_potentially_hazardous=True)),
+        closest_miss_kilometers=Min('miss_distance_kilometers'),
+        closest_miss_lunar=Min('miss_distance_lunar'),
+        fastest_velocity_km_per_sec=Max('relative_velocity_km_per_sec'),
+    ).order_by()
+    
+    rollups = [ApproachDailyRollup(**row) for row in aggregates]
+    
+    with transaction.atomic():
+        ApproachDailyRollup.objects.filter(
+            day__gte=first_day, day__lte=last_day
+        ).exclude(day__in=[rollup.day for rollup in rollups]).delete()
+        ApproachDailyRollup.objects.bulk_create(
+            rollups,
+            update_conflicts=True,
+            unique_fields=['day'],
+            update_fields=[*ROLLUP_FIELDS, 'updated_at'],
+        )
+    
+    return len(rollups)
+
+
+def refresh_catalog_rollup():
+    """
+    Recompute the single-row asteroid catalog totals
+    """
+    totals = Asteroid.objects.aggregate(
+        total_asteroids=Count('id'),
+        hazardous_asteroids=Count('id', filter=Q(is_potentially_hazardous=True)),
+        sentry_asteroids=Count('id', filter=Q(is_sentry_object=True)),
+    )
+    catalog = AsteroidCatalogRollup.current()
+    for field, value in totals.items():
+        setattr(catalog, field, value)
+    catalog.save()
+    return catalog
+
+
+def approach_days_for(neo_reference_ids):
+    """
+    Days with approaches by the given asteroids, e.g. after their hazard
+    classification changed
+    """
+    return set(
+        CloseApproach.objects.filter(
+            asteroid__neo_reference_id__in=list(neo_reference_ids)
+        ).annotate(
+            day=TruncDate('close_approach_date', tzinfo=pytz.UTC)
+        ).values_list('day', flat=True).distinct()
+    )
+
+
+def rebuild_rollups():
+    """
+    Rebuild every asteroid rollup from the raw tables
+    """
+    with transaction.atomic():
+        ApproachDailyRollup.objects.all().delete()
+        bounds = CloseApproach.objects.aggregate(
+            first=Min('close_approach_date'), last=Max('close_approach_date')
+        )
+        days = 0
+        if bounds['first']:
+            days = refresh_approach_rollups({
+                bounds['first'].astimezone(pytz.UTC).date(),
+                bounds['last'].astimezone(pytz.UTC).date(),
+            })
+        refresh_catalog_rollup()
+    logger.info(f"Rebuilt asteroid rollups for {days} days")
+    return days
+
+
+def approach_totals(start_day=None, end_day=None):
+    """
+    Sum of approach counts over an optional inclusive day range
+    """
+    rollups = ApproachDailyRollup.objects.all()
+    if start_day:
+        rollups = rollups.filter(day__gte=start_day)
+    if end_day:
+        rollups = rollups.filter(day__lte=end_day)
+    return rollups.aggregate(total=Sum('approach_count'))['total'] or 0
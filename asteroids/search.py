@@ -0,0 +1,134 @@
+import math
+from django.db import connection
+from django.db.models import Count
+from django.db.models.functions import Length
+from .models import Asteroid, AsteroidNameTrigram
+from .names import name_trigrams, normalize_name
+
+# Share of the query's trigrams a name must contain to count as a fuzzy match
+FUZZY_MIN_SIMILARITY = 0.5
+# Fuzzy candidates scored in Python, best trigram overlap first
+FUZZY_CANDIDATES = 200
+# Trigram postings counted per query trigram when picking the rarest ones
+FUZZY_POSTING_CAP = 5000
+
+MATCH_EXACT = 'exact'
+MATCH_PREFIX = 'prefix'
+MATCH_FUZZY = 'fuzzy'
+
+
+def index_name_trigrams(names_by_id):
+    """
+    Replace the stored trigrams of the given asteroids.
+
+    ``names_by_id`` maps asteroid pk to normalized name. Called by ingest
+    for every asteroid that was inserted or renamed.
+    """
+    if not names_by_id:
+        return
+    AsteroidNameTrigram.objects.filter(asteroid_id__in=list(names_by_id)).delete()
+    AsteroidNameTrigram.objects.bulk_create(
+        (
+            AsteroidNameTrigram(asteroid_id=asteroid_id, trigram=trigram)
+            for asteroid_id, normalized in names_by_id.items()
+            for trigram in name_trigrams(normalized)
+        ),
+        batch_size=2000,
+    )
+
+
+def _prefix_upper_bound(prefix):
+    """
+    Smallest string greater than every string starting with ``prefix``, so
+    a prefix match can be written as an index-friendly range
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def search_asteroids(text, limit=10, queryset=None):
+    """
+    Ranked asteroid search by name, designation or NeoWs reference ID.
+
+    Matches come in three tiers: exact normalized name or reference ID,
+    then normalized-name prefixes (shortest names first), then fuzzy
+    matches sharing at least FUZZY_MIN_SIMILARITY of the query's trigrams,
+    which tolerates typos. The fuzzy tier only runs when the first two do
+    not fill ``limit``. Each result is annotated with ``match`` and a
+    ``score`` between 0 and 1. ``queryset`` restricts the search, e.g. to
+    hazardous asteroids.
+    """
+    query = normalize_name(text)
+    if not query:
+        return []
+    asteroids = Asteroid.objects.all() if queryset is None else queryset
+    results = {}
+
+    def add(matches, match, score):
+        for asteroid in matches:
+            if asteroid.pk not in results and len(results) < limit:
+                asteroid.match, asteroid.score = match, score(asteroid)
+                results[asteroid.pk] = asteroid
+
+    add(asteroids.filter(normalized_name=query)[:limit], MATCH_EXACT, lambda a: 1.0)
+    add(asteroids.filter(neo_reference_id=text.strip())[:limit], MATCH_EXACT, lambda a: 1.0)
+    if len(results) < limit:
+        prefixed = asteroids.filter(
+            normalized_name__gte=query, normalized_name__lt=_prefix_upper_bound(query)
+        ).order_by(Length('normalized_name'), 'normalized_name')
+        add(prefixed[:limit + len(results)], MATCH_PREFIX, lambda a: len(query) / len(a.normalized_name))
+    if len(results) < limit:
+        add(_fuzzy_matches(query, asteroids), MATCH_FUZZY, lambda a: a.similarity)
+
+    return list(results.values())
+
+
+def _posting_counts(trigrams):
+    """
+    Number of names containing each trigram, capped at FUZZY_POSTING_CAP,
+    counted from the (trigram, asteroid) index in a single round trip
+    """
+    table = AsteroidNameTrigram._meta.db_table
+    counts = ' UNION ALL '.join(
+        f'SELECT %s, (SELECT COUNT(*) FROM (SELECT 1 FROM {table} WHERE trigram = %s LIMIT %s))'
+        for _ in trigrams
+    )
+    params = [value for trigram in trigrams for value in (trigram, trigram, FUZZY_POSTING_CAP)]
+    with connection.cursor() as cursor:
+        cursor.execute(counts, params)
+        return dict(cursor.fetchall())
+
+
+def _fuzzy_matches(query, asteroids):
+    """
+    Asteroids sharing enough trigrams with ``query``, most similar first.
+
+    A name sharing ``required`` of the query's n trigrams must contain at
+    least one of its n - required + 1 rarest trigrams, so only asteroids
+    holding one of those are scored. This keeps trigrams such as "202",
+    which every recent designation contains, from dominating the query.
+    """
+    trigrams = name_trigrams(query)
+    if not trigrams:
+        return []
+    required = math.ceil(len(trigrams) * FUZZY_MIN_SIMILARITY)
+    postings = _posting_counts(trigrams)
+    rarest = sorted(trigrams, key=postings.get)[:len(trigrams) - required + 1]
+    if sum(postings[trigram] for trigram in rarest) >= FUZZY_POSTING_CAP:
+        # Even the rarest trigrams are everywhere; the query is too vague to
+        # be worth a fuzzy pass
+        return []
+
+    candidates = AsteroidNameTrigram.objects.filter(trigram__in=rarest).values('asteroid_id')
+    overlap = dict(
+        AsteroidNameTrigram.objects.filter(asteroid_id__in=candidates, trigram__in=trigrams)
+        .values('asteroid_id')
+        .annotate(shared=Count('id'))
+        .filter(shared__gte=required)
+        .order_by('-shared')
+        .values_list('asteroid_id', 'shared')[:FUZZY_CANDIDATES]
+    )
+    matches = list(asteroids.filter(pk__in=list(overlap)))
+    for asteroid in matches:
+        asteroid.similarity = overlap[asteroid.pk] / len(trigrams)
+    matches.sort(key=lambda a: (-a.similarity, len(a.normalized_name), a.normalized_name))
+    return matches
@@ -1,13 +1,58 @@
 import requests
 import logging
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 import pytz
+from core.breaker import CircuitOpenError, circuit_breaker
+from core.dates import day_start, split_windows
+from core.http_client import nasa_client
+from core.ingest import IngestRecorder, count, counting_chunks, phase, received, record_error, storing
+from core.ledger import plan_windows, record_fetch
+from core.models import FetchLedger
+from core.singleflight import single_flight
+from core.streaming import CHUNK_SIZE, batched, iter_file_chunks, iter_json_items
+from core.versions import bump_data_version
 from .models import Asteroid, CloseApproach
+from .names import normalize_name
+from .rollups import approach_days_for, refresh_approach_rollups, refresh_catalog_rollup
+from .search import index_name_trigrams
 
 logger = logging.getLogger(__name__)
 
+BULK_BATCH_SIZE = 500
+
+# NeoWs /feed rejects ranges longer than 7 days
+FEED_WINDOW_DAYS = 7
+
+# Location of the per-day object arrays inside a /feed payload
+FEED_OBJECTS_PATH = ('near_earth_objects', '*')
+
+# Streamed feed bodies larger than this are spooled to disk
+SPOOL_MAX_SIZE = 1024 * 1024
+
+ASTEROID_UPDATE_FIELDS = [
+    'name',
+    'normalized_name',
+    'nasa_jpl_url',
+    'absolute_magnitude_h',
+    'estimated_diameter_min',
+    'estimated_diameter_max',
+    'is_potentially_hazardous',
+    'is_sentry_object',
+]
+
+APPROACH_UPDATE_FIELDS = [
+    'relative_velocity_km_per_sec',
+    'relative_velocity_km_per_hour',
+    'miss_distance_astronomical',
+    'miss_distance_lunar',
+    'miss_distance_kilometers',
+    'orbiting_body',
+]
+
 
 class AsteroidService:
     """
@@ -16,51 +61,445 @@ class AsteroidService:
     BASE_URL = "https://api.nasa.gov/neo/rest/v1"
     
     def __init__(self, api_key=None):
-        self.api_key = api_key or getattr(settings, 'NASA_API_KEY', 'DEMO_KEY')
+        # None lets the shared client pick a key from the NASA_API_KEYS pool
+        self.api_key = api_key
     
-    def fetch_asteroids(self, start_date=None, end_date=None):
+    def fetch_asteroids(self, start_date=None, end_date=None, bulk=True, force=False, stream=False):
         """
-        Fetch near-Earth asteroids for a date range
+        Fetch near-Earth asteroids for a date range and store them.
+
+        Returns a stats dict with inserted/updated/skipped counts for
+        asteroids and close approaches. ``bulk=False`` keeps the original
+        row-by-row ingest path; ``stream=True`` parses the response body
+        incrementally instead of decoding it in one piece.
         """
         if start_date is None:
             start_date = timezone.now().date()
         if end_date is None:
-            end_date = start_date + timedelta(days=7)
+            end_date = start_date + timedelta(days=FEED_WINDOW_DAYS - 1)
+        
+        return self.backfill(start_date, end_date, workers=1, bulk=bulk, force=force, stream=stream)
+    
+    def backfill(self, start_date, end_date, workers=4, bulk=True, force=False, stream=False,
+                 on_window_done=None):
+        """
+        Fetch an arbitrary date span as 7-day NeoWs windows.
+
+        Only windows the fetch ledger reports as missing or stale are
+        requested unless ``force`` is set, so an interrupted backfill resumes
+        where it stopped. Windows are downloaded concurrently by a bounded
+        thread pool while the calling thread is the single writer that
+        ingests each payload as it arrives and records it in the ledger.
+        ``on_window_done(window, stats)`` is called after each window is
+        committed.
+
+        With ``stream=True`` workers spool the raw body to a temporary file
+        and the writer parses it record by record, so peak memory does not
+        grow with the size of a window.
+
+        Concurrent calls for the same span share one run (see
+        core.singleflight); a caller from another process waits for it and
+        then finds the windows in the ledger.
+        """
+        return single_flight(
+            f"{FetchLedger.SOURCE_NEOWS}:{start_date}:{end_date}:{'force' if force else 'plan'}",
+            lambda: self._backfill(start_date, end_date, workers, bulk, force, stream, on_window_done),
+        )
+    
+    def _backfill(self, start_date, end_date, workers, bulk, force, stream, on_window_done):
+        if force:
+            windows = split_windows(start_date, end_date, FEED_WINDOW_DAYS)
+        else:
+            windows = plan_windows(FetchLedger.SOURCE_NEOWS, start_date, end_date, FEED_WINDOW_DAYS)
+        totals = self._empty_stats()
+        failed = []
+        download = self._download_feed if stream else self.request_feed
+        # One IngestRun per window, timed on the download thread and the writer
+        runs = {}
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+            queued = iter(windows)
+            
+            def submit_next():
+                window = next(queued, None)
+                if window is not None:
+                    run = runs[window] = IngestRecorder(FetchLedger.SOURCE_NEOWS, *window)
+                    pending[pool.submit(run.call, download, *window)] = window
+            
+            # Keep at most two payloads per worker in flight so memory stays
+            # bounded no matter how long the span is
+            for _ in range(workers * 2):
+                submit_next()
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window = pending.pop(future)
+                    try:
+                        with runs.pop(window):
+                            if stream:
+                                with future.result() as body, storing():
+                                    stats = self.ingest_feed_stream(iter_file_chunks(body))
+                                    self._record_window(window, stats)
+                            else:
+                                stats = self.store_feed(*window, future.result(), bulk=bulk)
+                    except CircuitOpenError as e:
+                        logger.warning(f"Skipping asteroids {window[0]} to {window[1]}: {e}")
+                        failed.append(window)
+                    except requests.RequestException as e:
+                        logger.error(f"Error fetching asteroids {window[0]} to {window[1]}: {e}")
+                        record_fetch(FetchLedger.SOURCE_NEOWS, *window, error=e)
+                        failed.append(window)
+                    except Exception as e:
+                        logger.error(f"Unexpected error processing asteroids {window[0]} to {window[1]}: {e}")
+                        record_fetch(FetchLedger.SOURCE_NEOWS, *window, error=e)
+                        failed.append(window)
+                    else:
+                        for key, value in stats.items():
+                            totals[key] += value
+                        if on_window_done:
+                            on_window_done(window, stats)
+                    submit_next()
+        
+        fetched_days = sum((end - start).days + 1 for start, end in windows)
+        logger.info(
+            f"Successfully fetched asteroids {start_date} to {end_date}: "
+            f"{len(windows) - len(failed)} of {len(windows)} windows; "
+            f"{totals['asteroids_inserted']} inserted, {totals['asteroids_updated']} updated, "
+            f"{totals['asteroids_skipped']} skipped; "
+            f"{totals['approaches_inserted']} approaches inserted, "
+            f"{totals['approaches_updated']} updated, {totals['approaches_skipped']} skipped"
+        )
+        return {
+            **totals,
+            'windows': len(windows),
+            'skipped_days': (end_date - start_date).days + 1 - fetched_days,
+            'failed_windows': sorted(failed),
+        }
+    
+    def store_feed(self, start_date, end_date, data, bulk=True):
+        """
+        Store a decoded NeoWs feed window, record it in the fetch ledger and
+        return ingest stats
+        """
+        with storing():
+            stats = self.ingest_feed(data, bulk=bulk)
+            self._record_window((start_date, end_date), stats)
+        return stats
+    
+    def _record_window(self, window, stats):
+        records = stats['asteroids_inserted'] + stats['asteroids_updated'] + stats['asteroids_skipped']
+        record_fetch(FetchLedger.SOURCE_NEOWS, *window, records=records)
+        # The ingest run counts asteroids and close approaches together
+        count(**{
+            outcome: stats[f'asteroids_{outcome}'] + stats[f'approaches_{outcome}']
+            for outcome in ('inserted', 'updated', 'skipped')
+        })
+    
+    def request_feed(self, start_date, end_date):
+        """
+        Request one NeoWs feed window and return the decoded payload
+        """
+        params = {
+            'api_key': self.api_key,
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d')
+        }
         
+        with circuit_breaker(FetchLedger.SOURCE_NEOWS):
+            response = nasa_client().get(f"{self.BASE_URL}/feed", params=params, timeout=15)
+            response.raise_for_status()
+        received(len(response.content))
+        with phase('parse'):
+            return response.json()
+    
+    def _download_feed(self, start_date, end_date):
+        """
+        Stream one NeoWs feed window into a temporary file and return it
+        rewound; small bodies stay in memory, large ones spill to disk
+        """
         params = {
             'api_key': self.api_key,
             'start_date': start_date.strftime('%Y-%m-%d'),
             'end_date': end_date.strftime('%Y-%m-%d')
         }
         
+        body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
         try:
-            response = requests.get(f"{self.BASE_URL}/feed", params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            asteroids_created = 0
-            approaches_created = 0
+            with circuit_breaker(FetchLedger.SOURCE_NEOWS), \
+                    nasa_client().get(f"{self.BASE_URL}/feed", params=params, timeout=15, stream=True) as response:
+                response.raise_for_status()
+                for chunk in counting_chunks(response.iter_content(CHUNK_SIZE)):
+                    body.write(chunk)
+        except Exception:
+            body.close()
+            raise
+        body.seek(0)
+        return body
+    
+    def ingest_feed(self, data, bulk=True):
+        """
+        Store a decoded NeoWs feed payload and return ingest stats
+        """
+        if bulk:
+            return self.ingest_objects(self._iter_feed_objects(data))
+        return self._row_ingest_feed(data)
+    
+    def ingest_feed_stream(self, chunks):
+        """
+        Store a NeoWs feed read incrementally from an iterable of byte chunks
+        """
+        return self.ingest_objects(iter_json_items(chunks, FEED_OBJECTS_PATH))
+    
+    @staticmethod
+    def _empty_stats():
+        return {
+            'asteroids_inserted': 0,
+            'asteroids_updated': 0,
+            'asteroids_skipped': 0,
+            'approaches_inserted': 0,
+            'approaches_updated': 0,
+            'approaches_skipped': 0,
+        }
+    
+    def _row_ingest_feed(self, data):
+        """
+        Original per-row ingest: one get_or_create/exists/create per record
+        """
+        stats = self._empty_stats()
+        affected_days = set()
+        
+        for date_str, asteroids_data in data.get('near_earth_objects', {}).items():
+            for asteroid_data in asteroids_data:
+                try:
+                    asteroid, created, approaches = self._create_asteroid_from_data(asteroid_data, date_str)
+                    stats['asteroids_inserted' if created else 'asteroids_skipped'] += 1
+                    stats['approaches_inserted'] += len(approaches)
+                    stats['approaches_skipped'] += len(asteroid_data.get('close_approach_data', [])) - len(approaches)
+                    affected_days.update(
+                        approach.close_approach_date.astimezone(pytz.UTC).date() for approach in approaches
+                    )
+                except Exception as e:
+                    logger.error(f"Error processing asteroid data: {e}")
+                    record_error(f"Error processing asteroid data: {e}")
+                    stats['asteroids_skipped'] += 1
+                    continue
+        
+        self._on_data_changed(stats, affected_days)
+        return stats
+    
+    def ingest_objects(self, objects, batch_size=BULK_BATCH_SIZE):
+        """
+        Normalize NeoWs objects one at a time and upsert them in fixed-size
+        batches of set-based statements inside one transaction.
+
+        Conflicts are resolved by the ``neo_reference_id`` unique constraint
+        and the (asteroid, close_approach_date) unique_together constraint.
+        Rows identical to what is already stored are counted as skipped and
+        not written.
+        """
+        stats = self._empty_stats()
+        affected_days = set()
+        hazard_changed = set()
+        
+        with transaction.atomic():
+            for batch in batched(self._iter_rows(objects, stats), batch_size):
+                asteroid_rows = {}
+                approach_rows = {}
+                for row, approaches in batch:
+                    if row['neo_reference_id'] in asteroid_rows:
+                        # The same object can be listed under several feed days
+                        stats['asteroids_skipped'] += 1
+                    asteroid_rows[row['neo_reference_id']] = row
+                    for approach_row in approaches:
+                        key = (row['neo_reference_id'], approach_row['close_approach_date'])
+                        if key in approach_rows:
+                            stats['approaches_skipped'] += 1
+                        approach_rows[key] = approach_row
+                
+                ids_by_neo = self._upsert_asteroids(asteroid_rows, stats, hazard_changed)
+                self._upsert_approaches(approach_rows, ids_by_neo, stats)
+                affected_days.update(approach_date.astimezone(pytz.UTC).date() for _, approach_date in approach_rows)
             
-            for date_str, asteroids_data in data.get('near_earth_objects', {}).items():
-                for asteroid_data in asteroids_data:
-                    try:
-                        asteroid, approaches = self._create_asteroid_from_data(asteroid_data, date_str)
-                        if asteroid:
-                            asteroids_created += 1
-                            approaches_created += len(approaches)
-                    except Exception as e:
-                        logger.error(f"Error processing asteroid data: {e}")
-                        continue
+            self._on_data_changed(stats, affected_days, hazard_changed)
+        
+        return stats
+    
+    def _on_data_changed(self, stats, affected_days, hazard_changed=()):
+        """
+        Bring the dashboard rollups up to date and bump the data version
+        after an ingest wrote rows
+        """
+        if not any(stats[key] for key in ('asteroids_inserted', 'asteroids_updated',
+                                          'approaches_inserted', 'approaches_updated')):
+            return
+        if hazard_changed:
+            affected_days |= approach_days_for(hazard_changed)
+        refresh_approach_rollups(affected_days)
+        refresh_catalog_rollup()
+        bump_data_version(FetchLedger.SOURCE_NEOWS)
+    
+    def _iter_rows(self, objects, stats):
+        """
+        Yield (asteroid_row, approach_rows) for each valid NeoWs object,
+        counting malformed records as skipped
+        """
+        for asteroid_data in objects:
+            try:
+                row = self._asteroid_row(asteroid_data)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Error processing asteroid data: {e}")
+                record_error(f"Error processing asteroid data: {e}")
+                stats['asteroids_skipped'] += 1
+                continue
+            if not row['neo_reference_id']:
+                record_error(f"Asteroid without neo_reference_id: {row['name']}")
+                stats['asteroids_skipped'] += 1
+                continue
             
-            logger.info(f"Successfully fetched and saved {asteroids_created} asteroids with {approaches_created} approaches")
-            return asteroids_created
+            approaches = []
+            for approach_data in asteroid_data.get('close_approach_data', []):
+                try:
+                    approach_row = self._approach_row(approach_data)
+                except (TypeError, ValueError) as e:
+                    logger.error(f"Error processing approach data: {e}")
+                    record_error(f"Error processing approach data of {row['neo_reference_id']}: {e}")
+                    approach_row = None
+                if approach_row is None:
+                    stats['approaches_skipped'] += 1
+                    continue
+                approaches.append(approach_row)
             
-        except requests.RequestException as e:
-            logger.error(f"Error fetching asteroids: {e}")
-            return 0
-        except Exception as e:
-            logger.error(f"Unexpected error processing asteroids: {e}")
-            return 0
+            yield row, approaches
+    
+    def _upsert_asteroids(self, asteroid_rows, stats, hazard_changed):
+        """
+        Upsert parsed asteroid rows and return a neo_reference_id -> pk map.
+        Asteroids whose hazard classification changed are added to
+        ``hazard_changed``.
+        """
+        neo_ids = list(asteroid_rows)
+        existing = {
+            row['neo_reference_id']: row
+            for row in Asteroid.objects.filter(
+                neo_reference_id__in=neo_ids
+            ).values('neo_reference_id', *ASTEROID_UPDATE_FIELDS)
+        }
+        
+        to_write = []
+        renamed = []
+        for neo_id, row in asteroid_rows.items():
+            current = existing.get(neo_id)
+            if current is None:
+                stats['asteroids_inserted'] += 1
+            elif any(current[field] != row[field] for field in ASTEROID_UPDATE_FIELDS):
+                stats['asteroids_updated'] += 1
+                if current['is_potentially_hazardous'] != row['is_potentially_hazardous']:
+                    hazard_changed.add(neo_id)
+            else:
+                stats['asteroids_skipped'] += 1
+                continue
+            if current is None or current['normalized_name'] != row['normalized_name']:
+                renamed.append(neo_id)
+            to_write.append(Asteroid(**row))
+        
+        if to_write:
+            Asteroid.objects.bulk_create(
+                to_write,
+                batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['neo_reference_id'],
+                update_fields=[*ASTEROID_UPDATE_FIELDS, 'updated_at'],
+            )
+        
+        ids_by_neo = dict(
+            Asteroid.objects.filter(neo_reference_id__in=neo_ids).values_list('neo_reference_id', 'id')
+        )
+        index_name_trigrams({ids_by_neo[neo_id]: asteroid_rows[neo_id]['normalized_name'] for neo_id in renamed})
+        return ids_by_neo
+    
+    def _upsert_approaches(self, approach_rows, ids_by_neo, stats):
+        """
+        Upsert parsed close approach rows for already-stored asteroids
+        """
+        if not approach_rows:
+            return
+        
+        existing = {
+            (row['asteroid_id'], row['close_approach_date']): row
+            for row in CloseApproach.objects.filter(
+                asteroid_id__in=set(ids_by_neo.values())
+            ).values('asteroid_id', 'close_approach_date', *APPROACH_UPDATE_FIELDS)
+        }
+        
+        to_write = []
+        for (neo_id, approach_date), row in approach_rows.items():
+            asteroid_id = ids_by_neo.get(neo_id)
+            if asteroid_id is None:
+                stats['approaches_skipped'] += 1
+                continue
+            current = existing.get((asteroid_id, approach_date))
+            if current is None:
+                stats['approaches_inserted'] += 1
+            elif any(current[field] != row[field] for field in APPROACH_UPDATE_FIELDS):
+                stats['approaches_updated'] += 1
+            else:
+                stats['approaches_skipped'] += 1
+                continue
+            to_write.append(CloseApproach(asteroid_id=asteroid_id, **row))
+        
+        if to_write:
+            CloseApproach.objects.bulk_create(
+                to_write,
+                batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['asteroid', 'close_approach_date'],
+                update_fields=APPROACH_UPDATE_FIELDS,
+            )
+    
+    @staticmethod
+    def _iter_feed_objects(data):
+        for asteroids_data in data.get('near_earth_objects', {}).values():
+            yield from asteroids_data
+    
+    def _asteroid_row(self, asteroid_data):
+        """
+        Normalize one NeoWs object into Asteroid field values
+        """
+        return {
+            'neo_reference_id': asteroid_data.get('neo_reference_id'),
+            'name': asteroid_data.get('name', ''),
+            'normalized_name': normalize_name(asteroid_data.get('name', '')),
+            'nasa_jpl_url': asteroid_data.get('nasa_jpl_url', ''),
+            'absolute_magnitude_h': float(asteroid_data.get('absolute_magnitude_h', 0.0)),
+            'estimated_diameter_min': float(self._get_diameter_min(asteroid_data)),
+            'estimated_diameter_max': float(self._get_diameter_max(asteroid_data)),
+            'is_potentially_hazardous': bool(asteroid_data.get('is_potentially_hazardous_asteroid', False)),
+            'is_sentry_object': bool(asteroid_data.get('is_sentry_object', False)),
+        }
+    
+    def _approach_row(self, approach_data):
+        """
+        Normalize one close approach entry into CloseApproach field values
+        """
+        approach_date = self._parse_datetime(approach_data.get('close_approach_date_full'))
+        if not approach_date:
+            record_error(f"Close approach without a valid date: {approach_data.get('close_approach_date_full')}")
+            return None
+        
+        relative_velocity = approach_data.get('relative_velocity', {})
+        miss_distance = approach_data.get('miss_distance', {})
+        
+        return {
+            'close_approach_date': approach_date,
+            'relative_velocity_km_per_sec': float(relative_velocity.get('kilometers_per_second', 0)),
+            'relative_velocity_km_per_hour': float(relative_velocity.get('kilometers_per_hour', 0)),
+            'miss_distance_astronomical': float(miss_distance.get('astronomical', 0)),
+            'miss_distance_lunar': float(miss_distance.get('lunar', 0)),
+            'miss_distance_kilometers': float(miss_distance.get('kilometers', 0)),
+            'orbiting_body': approach_data.get('orbiting_body', 'Earth'),
+        }
     
     def _create_asteroid_from_data(self, asteroid_data, date_str):
         """
@@ -82,6 +521,9 @@ class AsteroidService:
             }
         )
         
+        if created:
+            index_name_trigrams({asteroid.pk: asteroid.normalized_name})
+        
         # Process close approaches
         approaches = []
         for approach_data in asteroid_data.get('close_approach_data', []):
@@ -93,7 +535,7 @@ class AsteroidService:
                 logger.error(f"Error processing approach data: {e}")
                 continue
         
-        return asteroid, approaches
+        return asteroid, created, approaches
     
     def _create_approach_from_data(self, asteroid, approach_data):
         """
@@ -161,7 +603,7 @@ class AsteroidService:
         """
         start_date = timezone.now().date() - timedelta(days=days)
         return CloseApproach.objects.filter(
-            close_approach_date__date__gte=start_date
+            close_approach_date__gte=day_start(start_date)
         ).select_related('asteroid').order_by('close_approach_date')
     
     def get_hazardous_asteroids(self):
@@ -176,8 +618,9 @@ class AsteroidService:
         """
         Get upcoming close approaches
         """
-        end_date = timezone.now().date() + timedelta(days=days)
+        today = timezone.now().date()
+        end_date = today + timedelta(days=days)
         return CloseApproach.objects.filter(
-            close_approach_date__date__gte=timezone.now().date(),
-            close_approach_date__date__lte=end_date
+            close_approach_date__gte=day_start(today),
+            close_approach_date__lt=day_start(end_date + timedelta(days=1))
         ).select_related('asteroid').order_by('close_approach_date') 
\ No newline at end of file
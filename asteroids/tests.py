@@ -1,3 +1,353 @@
-from django.test import TestCase
+import copy
+import io
+import json
+import tempfile
+import threading
+from collections import defaultdict
+from datetime import date, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from core.dates import split_windows
+from core.models import FetchLedger
+from core.sample_payloads import make_neows_feed
+from core.testing import QueryPlanAssertions, start_stand_in_nasa
+from .models import ApproachDailyRollup, Asteroid, AsteroidCatalogRollup, AsteroidNameTrigram, CloseApproach
+from .names import normalize_name
+from .rollups import rebuild_rollups, refresh_approach_rollups
+from .search import _prefix_upper_bound, search_asteroids
+from .services import AsteroidService
 
-# Create your tests here.
+
+def _objects(feed):
+    return [obj for day in feed['near_earth_objects'].values() for obj in day]
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class DashboardQueryPlanTests(QueryPlanAssertions, TestCase):
+    """
+    Dashboard queries must use an index search, not a full table scan
+    """
+
+    def setUp(self):
+        self.service = AsteroidService(api_key='TEST')
+
+    def test_recent_approaches(self):
+        self.assertIndexSearch(self.service.get_recent_approaches(days=30))
+
+    def test_upcoming_approaches(self):
+        self.assertIndexSearch(self.service.get_upcoming_approaches(days=7))
+
+    def test_hazardous_asteroids(self):
+        self.assertIndexSearch(self.service.get_hazardous_asteroids())
+
+    def test_future_approaches_list(self):
+        approaches = CloseApproach.objects.select_related('asteroid').filter(
+            close_approach_date__gte=timezone.now()
+        )
+        self.assertIndexSearch(approaches)
+
+
+class NameSearchTests(QueryPlanAssertions, TestCase):
+    """
+    Asteroid search matches designations in any spelling, ranks exact and
+    prefix matches ahead of fuzzy ones and follows renames from ingest
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        feed = make_neows_feed(3)
+        objects = [obj for day in feed['near_earth_objects'].values() for obj in day]
+        for obj, name in zip(objects, ['433 Eros (A898 PA)', '(2024 AB12)', '(2024 AB1)']):
+            obj['name'] = name
+        cls.feed = feed
+        AsteroidService(api_key='TEST').ingest_feed(feed)
+
+    def setUp(self):
+        # Views cache their data per data version, which tests change directly
+        cache.clear()
+
+    def names(self, query, **kwargs):
+        return [(asteroid.name, asteroid.match) for asteroid in search_asteroids(query, **kwargs)]
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name('(2024 AB12)'), '2024ab12')
+        self.assertEqual(normalize_name('433 Eros (A898 PA)'), '433erosa898pa')
+
+    def test_designation_spellings_rank_exact_then_prefix(self):
+        expected = [('(2024 AB12)', 'exact')]
+        self.assertEqual(self.names('2024 ab12')[:1], expected)
+        self.assertEqual(self.names('2024AB12')[:1], expected)
+        self.assertEqual(
+            self.names('2024 ab'), [('(2024 AB1)', 'prefix'), ('(2024 AB12)', 'prefix')]
+        )
+        self.assertEqual(self.names('433')[:1], [('433 Eros (A898 PA)', 'prefix')])
+
+    def test_typo_and_inner_word_match_fuzzily(self):
+        self.assertEqual(self.names('2024 AB13')[0], ('(2024 AB1)', 'fuzzy'))
+        self.assertEqual(self.names('eros'), [('433 Eros (A898 PA)', 'fuzzy')])
+
+    def test_reference_id(self):
+        asteroid = Asteroid.objects.get(name='(2024 AB12)')
+        self.assertEqual(self.names(asteroid.neo_reference_id)[:1], [('(2024 AB12)', 'exact')])
+
+    def test_ingest_reindexes_renamed_asteroids(self):
+        obj = next(iter(self.feed['near_earth_objects'].values()))[0]
+        obj['name'] = '433 Eros'
+        AsteroidService(api_key='TEST').ingest_feed(self.feed)
+        asteroid = Asteroid.objects.get(neo_reference_id=obj['neo_reference_id'])
+        self.assertEqual(asteroid.normalized_name, '433eros')
+        self.assertFalse(AsteroidNameTrigram.objects.filter(asteroid=asteroid, trigram='a89').exists())
+        self.assertEqual(self.names('pa'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+    def test_prefix_search_uses_index(self):
+        self.assertIndexSearch(Asteroid.objects.filter(
+            normalized_name__gte='2024a', normalized_name__lt=_prefix_upper_bound('2024a')
+        ))
+
+    def test_search_api(self):
+        response = self.client.get(reverse('asteroids:search_api'), {'q': '(2024 AB12)', 'limit': 1})
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(
+            [(r['name'], r['match'], r['score']) for r in data['results']], [('(2024 AB12)', 'exact', 1.0)]
+        )
+
+
+class BulkIngestTests(TestCase):
+    """
+    Bulk ingest upserts asteroids and approaches and counts what it wrote
+    """
+
+    def setUp(self):
+        self.service = AsteroidService(api_key='TEST')
+        self.feed = make_neows_feed(20)
+
+    def counts(self, stats, kind):
+        return tuple(stats[f'{kind}_{outcome}'] for outcome in ('inserted', 'updated', 'skipped'))
+
+    def test_first_load_repeat_sync_and_changed_field(self):
+        stats = self.service.ingest_feed(self.feed)
+        self.assertEqual(self.counts(stats, 'asteroids'), (20, 0, 0))
+        self.assertEqual(self.counts(stats, 'approaches'), (20, 0, 0))
+
+        # Nothing changed, so nothing is written
+        stats = self.service.ingest_feed(self.feed)
+        self.assertEqual(self.counts(stats, 'asteroids'), (0, 0, 20))
+        self.assertEqual(self.counts(stats, 'approaches'), (0, 0, 20))
+
+        objects = _objects(self.feed)
+        objects[0]['absolute_magnitude_h'] += 1
+        objects[1]['close_approach_data'][0]['orbiting_body'] = 'Mars'
+        stats = self.service.ingest_feed(self.feed)
+        self.assertEqual(self.counts(stats, 'asteroids'), (0, 1, 19))
+        self.assertEqual(self.counts(stats, 'approaches'), (0, 1, 19))
+        self.assertEqual(
+            Asteroid.objects.get(neo_reference_id=objects[0]['neo_reference_id']).absolute_magnitude_h,
+            objects[0]['absolute_magnitude_h'],
+        )
+        self.assertEqual(
+            CloseApproach.objects.get(asteroid__neo_reference_id=objects[1]['neo_reference_id']).orbiting_body, 'Mars'
+        )
+        self.assertEqual((Asteroid.objects.count(), CloseApproach.objects.count()), (20, 20))
+
+    def test_in_batch_duplicates_are_written_once(self):
+        objects = _objects(self.feed)
+        # An object listed under two feed days, the last listing wins
+        duplicate = copy.deepcopy(objects[0])
+        duplicate['name'] = 'Renamed'
+        stats = self.service.ingest_objects(objects + [duplicate])
+
+        self.assertEqual(self.counts(stats, 'asteroids'), (20, 0, 1))
+        self.assertEqual(self.counts(stats, 'approaches'), (20, 0, 1))
+        self.assertEqual(Asteroid.objects.get(neo_reference_id=objects[0]['neo_reference_id']).name, 'Renamed')
+        self.assertEqual(CloseApproach.objects.count(), 20)
+
+    def test_hazard_changes_are_tracked(self):
+        self.service.ingest_feed(self.feed)
+        obj = _objects(self.feed)[0]
+        rows = {obj['neo_reference_id']: self.service._asteroid_row(obj)}
+
+        hazard_changed = set()
+        self.service._upsert_asteroids(rows, self.service._empty_stats(), hazard_changed)
+        self.assertEqual(hazard_changed, set())
+
+        rows[obj['neo_reference_id']]['is_potentially_hazardous'] = not obj['is_potentially_hazardous_asteroid']
+        self.service._upsert_asteroids(rows, self.service._empty_stats(), hazard_changed)
+        self.assertEqual(hazard_changed, {obj['neo_reference_id']})
+
+    def test_update_leaves_created_at_untouched(self):
+        self.service.ingest_feed(self.feed)
+        obj = _objects(self.feed)[0]
+        created_at = timezone.now() - timedelta(days=30)
+        Asteroid.objects.filter(neo_reference_id=obj['neo_reference_id']).update(created_at=created_at)
+
+        obj['name'] = 'Renamed'
+        self.service.ingest_feed(self.feed)
+        asteroid = Asteroid.objects.get(neo_reference_id=obj['neo_reference_id'])
+        self.assertEqual(asteroid.name, 'Renamed')
+        self.assertEqual(asteroid.created_at, created_at)
+        self.assertGreater(asteroid.updated_at, created_at)
+
+
+@override_settings(NASA_API_KEYS=['key'])
+class BackfillTests(TransactionTestCase):
+    """
+    A backfill fetches 7-day windows concurrently, stores them on the calling
+    thread and reports the windows that failed
+    """
+
+    def setUp(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        override = override_settings(SINGLE_FLIGHT_LOCK_DIR=lock_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.server = start_stand_in_nasa(self)
+        self.server.bodies = {'/neo/rest/v1/feed': self.feed}
+        patcher = mock.patch.object(
+            AsteroidService, 'BASE_URL', f'http://127.0.0.1:{self.server.server_port}/neo/rest/v1'
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def feed(query):
+        start = date.fromisoformat(query['start_date'])
+        if start == date(2024, 1, 8):
+            return b'{"near_earth_objects": '
+        # Distinct objects per window: two per day of the window
+        days = (date.fromisoformat(query['end_date']) - start).days + 1
+        payload = make_neows_feed(2 * days, start_date=start)
+        for day in payload['near_earth_objects'].values():
+            for obj in day:
+                obj['neo_reference_id'] = f"{start:%Y%m%d}{obj['neo_reference_id']}"
+        return json.dumps(payload).encode()
+
+    def test_command_covers_days_from_start_and_explains_retries(self):
+        stats = {**AsteroidService._empty_stats(), 'windows': 2, 'skipped_days': 0,
+                 'failed_windows': [(date(2024, 1, 8), date(2024, 1, 10))]}
+        out = io.StringIO()
+        with mock.patch.object(AsteroidService, 'backfill', return_value=stats) as backfill:
+            call_command('fetch_asteroids', start=date(2024, 1, 1), days=10, stdout=out)
+        self.assertEqual(backfill.call_args.args, (date(2024, 1, 1), date(2024, 1, 10)))
+        self.assertIn('re-run with --force, or after 15 minutes', out.getvalue())
+        self.assertIn('2024-01-08 to 2024-01-10', out.getvalue())
+
+    def test_split_windows(self):
+        self.assertEqual(split_windows(date(2024, 1, 1), date(2024, 1, 16), 7), [
+            (date(2024, 1, 1), date(2024, 1, 7)),
+            (date(2024, 1, 8), date(2024, 1, 14)),
+            (date(2024, 1, 15), date(2024, 1, 16)),
+        ])
+        self.assertEqual(split_windows(date(2024, 1, 1), date(2024, 1, 1), 7), [(date(2024, 1, 1), date(2024, 1, 1))])
+        self.assertEqual(split_windows(date(2024, 1, 2), date(2024, 1, 1), 7), [])
+
+    def test_backfill_reports_each_window_and_failures(self):
+        service = AsteroidService()
+        workers = 2
+        started, done = [], {}
+        lock = threading.Lock()
+        request_feed = service.request_feed
+
+        def counting_request_feed(start_date, end_date):
+            with lock:
+                started.append((start_date, end_date))
+            return request_feed(start_date, end_date)
+
+        def on_window_done(window, stats):
+            # Downloads never run further ahead of the writer than two per worker
+            with lock:
+                self.assertLessEqual(len(started) - len(done), workers * 2)
+            done[window] = stats
+
+        with mock.patch.object(service, 'request_feed', counting_request_feed):
+            stats = service.backfill(date(2024, 1, 1), date(2024, 2, 4), workers=workers,
+                                     on_window_done=on_window_done)
+
+        windows = [(date(2024, 1, d), date(2024, 1, d + 6)) for d in (1, 8, 15, 22)]
+        windows.append((date(2024, 1, 29), date(2024, 2, 4)))
+        self.assertEqual(sorted(started), windows)
+        self.assertEqual(stats['windows'], 5)
+        self.assertEqual(stats['failed_windows'], [windows[1]])
+        self.assertEqual(sorted(done), windows[:1] + windows[2:])
+        for window_stats in done.values():
+            self.assertEqual((window_stats['asteroids_inserted'], window_stats['approaches_inserted']), (14, 14))
+        self.assertEqual(stats['asteroids_inserted'], 56)
+        self.assertEqual(Asteroid.objects.count(), 56)
+
+        ledger = dict(FetchLedger.objects.filter(source=FetchLedger.SOURCE_NEOWS).values_list('start_date', 'status'))
+        self.assertEqual(ledger[windows[1][0]], FetchLedger.STATUS_ERROR)
+        self.assertEqual({ledger[start] for start, _ in windows[:1] + windows[2:]}, {FetchLedger.STATUS_SUCCESS})
+
+
+class ApproachRollupTests(TestCase):
+    """
+    Daily approach rollups and catalog totals match the raw tables
+    """
+
+    def setUp(self):
+        AsteroidService(api_key='TEST').ingest_feed(make_neows_feed(300))
+
+    def raw_days(self):
+        days = defaultdict(list)
+        for approach in CloseApproach.objects.select_related('asteroid'):
+            days[approach.close_approach_date.astimezone(dt_timezone.utc).date()].append(approach)
+        return {
+            day: (
+                len(approaches),
+                sum(approach.asteroid.is_potentially_hazardous for approach in approaches),
+                min(approach.miss_distance_kilometers for approach in approaches),
+                min(approach.miss_distance_lunar for approach in approaches),
+                max(approach.relative_velocity_km_per_sec for approach in approaches),
+            )
+            for day, approaches in days.items()
+        }
+
+    def rollup_days(self):
+        return {
+            rollup.day: (
+                rollup.approach_count, rollup.hazardous_count, rollup.closest_miss_kilometers,
+                rollup.closest_miss_lunar, rollup.fastest_velocity_km_per_sec,
+            )
+            for rollup in ApproachDailyRollup.objects.all()
+        }
+
+    def test_ingest_keeps_rollups_in_sync(self):
+        self.assertEqual(len(self.rollup_days()), 7)
+        self.assertEqual(self.rollup_days(), self.raw_days())
+        catalog = AsteroidCatalogRollup.current()
+        self.assertEqual(
+            (catalog.total_asteroids, catalog.hazardous_asteroids, catalog.sentry_asteroids),
+            (300, Asteroid.objects.filter(is_potentially_hazardous=True).count(),
+             Asteroid.objects.filter(is_sentry_object=True).count()),
+        )
+
+    def test_refresh_drops_days_without_approaches(self):
+        first, gone, last = date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)
+        CloseApproach.objects.filter(close_approach_date__date=gone).delete()
+
+        refresh_approach_rollups({first, last})
+        days = self.rollup_days()
+        self.assertNotIn(gone, days)
+        self.assertEqual(days, self.raw_days())
+
+    def test_rebuild_matches_raw_tables(self):
+        ApproachDailyRollup.objects.filter(day=date(2024, 1, 2)).update(approach_count=999, hazardous_count=0)
+        ApproachDailyRollup.objects.create(day=date(2030, 1, 1), approach_count=1)
+        Asteroid.objects.filter(pk__in=Asteroid.objects.values('pk')[:10]).update(is_potentially_hazardous=True)
+        AsteroidCatalogRollup.objects.update(total_asteroids=0)
+
+        self.assertEqual(rebuild_rollups(), 7)
+        self.assertEqual(self.rollup_days(), self.raw_days())
+        self.assertEqual(AsteroidCatalogRollup.current().total_asteroids, 300)
+        self.assertEqual(
+            AsteroidCatalogRollup.current().hazardous_asteroids,
+            Asteroid.objects.filter(is_potentially_hazardous=True).count(),
+        )
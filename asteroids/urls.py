@@ -7,5 +7,7 @@ urlpatterns = [
     path('', views.asteroids_home, name='home'),
     path('list/', views.asteroids_list, name='list'),
     path('approaches/', views.approaches_list, name='approaches'),
+    path('api/search/', views.asteroids_search_api, name='search_api'),
+    path('approaches/export/', views.export_approaches, name='approaches_export'),
     path('refresh/', views.refresh_asteroids, name='refresh'),
 ] 
\ No newline at end of file
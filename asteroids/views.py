@@ -2,15 +2,52 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.utils import PlotlyJSONEncoder
 import json
+from datetime import timedelta
+from django.conf import settings
 from django.shortcuts import render
 from django.http import JsonResponse
+from django.utils.cache import add_never_cache_headers
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
-from .models import Asteroid, CloseApproach
+from .models import Asteroid, AsteroidCatalogRollup, CloseApproach
+from .rollups import approach_totals
+from .search import search_asteroids
 from .services import AsteroidService
 from django.utils import timezone
+from core.breaker import source_unavailable
+from core.cache import cache_response, cached
+from core.charts import cached_chart
+from core.conditional import conditional_on
+from core.downsampling import density_bin, lttb
+from core.exports import export_response
+from core.jobs import enqueue
+from core.models import FetchLedger
+from core.pagination import KeysetPage, paginate_keyset
+from core.views import job_accepted
 
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
 
+APPROACH_EXPORT_FIELDS = [
+    ('id', 'id'),
+    ('neo_reference_id', 'asteroid__neo_reference_id'),
+    ('name', 'asteroid__name'),
+    ('is_potentially_hazardous', 'asteroid__is_potentially_hazardous'),
+    ('is_sentry_object', 'asteroid__is_sentry_object'),
+    ('absolute_magnitude_h', 'asteroid__absolute_magnitude_h'),
+    ('estimated_diameter_min_km', 'asteroid__estimated_diameter_min'),
+    ('estimated_diameter_max_km', 'asteroid__estimated_diameter_max'),
+    ('close_approach_date', 'close_approach_date'),
+    ('relative_velocity_km_per_sec', 'relative_velocity_km_per_sec'),
+    ('relative_velocity_km_per_hour', 'relative_velocity_km_per_hour'),
+    ('miss_distance_astronomical', 'miss_distance_astronomical'),
+    ('miss_distance_lunar', 'miss_distance_lunar'),
+    ('miss_distance_kilometers', 'miss_distance_kilometers'),
+    ('orbiting_body', 'orbiting_body'),
+]
+
+
+@conditional_on(FetchLedger.SOURCE_NEOWS, daily=True)
 def asteroids_home(request):
     """
     Display asteroids dashboard with visualizations
@@ -23,19 +60,37 @@ def asteroids_home(request):
         hazardous_asteroids = service.get_hazardous_asteroids()
         upcoming_approaches = service.get_upcoming_approaches(days=7)
         
-        # Create visualizations
-        scatter_chart = create_asteroid_scatter(recent_approaches)
-        distance_chart = create_distance_timeline(upcoming_approaches)
+        # Create visualizations; cached until the next ingest
+        today = timezone.now().date()
+        scatter_chart = cached_chart(
+            'asteroid_scatter', FetchLedger.SOURCE_NEOWS, (today, 30),
+            lambda: create_asteroid_scatter(recent_approaches)
+        )
+        distance_chart = cached_chart(
+            'distance_timeline', FetchLedger.SOURCE_NEOWS, (today, 7),
+            lambda: create_distance_timeline(upcoming_approaches)
+        )
+        
+        # Lists and totals (from the rollups kept up to date by ingest) are
+        # cached until the next NeoWs ingest
+        def build_dashboard():
+            catalog = AsteroidCatalogRollup.current()
+            return {
+                'recent_approaches': list(recent_approaches[:10]),  # Show last 10 approaches
+                'hazardous_asteroids': list(hazardous_asteroids[:5]),  # Show top 5 hazardous
+                'upcoming_approaches': list(upcoming_approaches[:5]),  # Show next 5 approaches
+                'total_asteroids': catalog.total_asteroids,
+                'total_approaches': approach_totals(),
+                'hazardous_count': catalog.hazardous_asteroids,
+                'upcoming_count': approach_totals(today, today + timedelta(days=7)),
+            }
         
         context = {
-            'recent_approaches': recent_approaches[:10],  # Show last 10 approaches
-            'hazardous_asteroids': hazardous_asteroids[:5],  # Show top 5 hazardous
-            'upcoming_approaches': upcoming_approaches[:5],  # Show next 5 approaches
+            **cached('asteroids:home', [FetchLedger.SOURCE_NEOWS], (today,), build_dashboard),
             'scatter_chart': scatter_chart,
             'distance_chart': distance_chart,
-            'total_asteroids': Asteroid.objects.count(),
-            'total_approaches': CloseApproach.objects.count(),
-            'hazardous_count': hazardous_asteroids.count(),
+            'stale': source_unavailable(FetchLedger.SOURCE_NEOWS),
+            'stale_source': 'NeoWs',
         }
         
     except Exception as e:
@@ -48,13 +103,19 @@ def asteroids_home(request):
             'total_asteroids': 0,
             'total_approaches': 0,
             'hazardous_count': 0,
+            'upcoming_count': 0,
             'error_message': 'Unable to load asteroid data.',
         }
         messages.error(request, f'Error: {str(e)}')
     
-    return render(request, 'asteroids/home.html', context)
+    response = render(request, 'asteroids/home.html', context)
+    if 'error_message' in context:
+        # Not validated, so the next visit loads the data again
+        add_never_cache_headers(response)
+    return response
 
 
+@conditional_on(FetchLedger.SOURCE_NEOWS)
 def asteroids_list(request):
     """
     Display a list of all asteroids with filtering options
@@ -72,8 +133,25 @@ def asteroids_list(request):
         if sentry_only == 'true':
             asteroids = asteroids.filter(is_sentry_object=True)
         
+        # Ranked name search replaces the date ordering when a query is given
+        query = request.GET.get('q', '').strip()
+        if query:
+            page = cached(
+                'asteroids:search', [FetchLedger.SOURCE_NEOWS], (request.GET.urlencode(),),
+                lambda: KeysetPage(search_asteroids(query, limit=50, queryset=asteroids))
+            )
+        else:
+            page = cached(
+                'asteroids:list', [FetchLedger.SOURCE_NEOWS], (request.GET.urlencode(),),
+                lambda: paginate_keyset(
+                    asteroids, request.GET.get('cursor'), ordering=('-created_at', '-id'), per_page=50
+                )
+            )
+        
         context = {
-            'asteroids': asteroids[:50],  # Limit to 50 results
+            'asteroids': page,
+            'page': page,
+            'query': query,
             'hazardous_only': hazardous_only == 'true',
             'sentry_only': sentry_only == 'true',
         }
@@ -85,23 +163,32 @@ def asteroids_list(request):
         }
         messages.error(request, f'Error: {str(e)}')
     
-    return render(request, 'asteroids/list.html', context)
+    response = render(request, 'asteroids/list.html', context)
+    if 'error_message' in context:
+        # Not validated, so the next visit loads the data again
+        add_never_cache_headers(response)
+    return response
 
 
+@conditional_on(FetchLedger.SOURCE_NEOWS, daily=True)
 def approaches_list(request):
     """
     Display a list of close approaches
     """
     try:
-        approaches = CloseApproach.objects.select_related('asteroid').all()
-        
-        # Filter by future/past approaches
+        approaches = filter_approaches(CloseApproach.objects.select_related('asteroid'), request.GET)
         future_only = request.GET.get('future')
-        if future_only == 'true':
-            approaches = approaches.filter(close_approach_date__gte=timezone.now())
+        
+        page = cached(
+            'asteroids:approaches', [FetchLedger.SOURCE_NEOWS], (request.GET.urlencode(), timezone.now().date()),
+            lambda: paginate_keyset(
+                approaches, request.GET.get('cursor'), ordering=('close_approach_date', 'id'), per_page=50
+            )
+        )
         
         context = {
-            'approaches': approaches[:50],  # Limit to 50 results
+            'approaches': page,
+            'page': page,
             'future_only': future_only == 'true',
         }
         
@@ -112,24 +199,89 @@ def approaches_list(request):
         }
         messages.error(request, f'Error: {str(e)}')
     
-    return render(request, 'asteroids/approaches.html', context)
+    response = render(request, 'asteroids/approaches.html', context)
+    if 'error_message' in context:
+        # Not validated, so the next visit loads the data again
+        add_never_cache_headers(response)
+    return response
 
 
-@require_http_methods(["POST"])
-def refresh_asteroids(request):
+@conditional_on(FetchLedger.SOURCE_NEOWS)
+@cache_response(FetchLedger.SOURCE_NEOWS)
+def asteroids_search_api(request):
     """
-    AJAX endpoint to refresh asteroid data
+    JSON type-ahead endpoint for asteroid names, designations and
+    reference IDs
     """
+    query = request.GET.get('q', '').strip()
     try:
-        service = AsteroidService()
-        asteroids_created = service.fetch_asteroids()
-        
+        limit = min(int(request.GET.get('limit', SEARCH_DEFAULT_LIMIT)), SEARCH_MAX_LIMIT)
+    except ValueError:
+        limit = SEARCH_DEFAULT_LIMIT
+    
+    try:
+        asteroids = Asteroid.objects.all()
+        if request.GET.get('hazardous') == 'true':
+            asteroids = asteroids.filter(is_potentially_hazardous=True)
+        results = search_asteroids(query, limit=max(limit, 1), queryset=asteroids)
         return JsonResponse({
             'success': True,
-            'asteroids_created': asteroids_created,
-            'message': f'Successfully fetched {asteroids_created} new asteroids'
+            'query': query,
+            'results': [
+                {
+                    'neo_reference_id': asteroid.neo_reference_id,
+                    'name': asteroid.name,
+                    'is_potentially_hazardous': asteroid.is_potentially_hazardous,
+                    'is_sentry_object': asteroid.is_sentry_object,
+                    'nasa_jpl_url': asteroid.nasa_jpl_url,
+                    'match': asteroid.match,
+                    'score': round(asteroid.score, 3),
+                }
+                for asteroid in results
+            ],
         })
         
+    except Exception as e:
+        response = JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+        # Not kept by cache_response
+        add_never_cache_headers(response)
+        return response
+
+
+@conditional_on(FetchLedger.SOURCE_NEOWS, daily=True)
+def export_approaches(request):
+    """
+    Stream close approaches joined with their asteroid as NDJSON or CSV,
+    using the close approaches list filters
+    """
+    approaches = filter_approaches(CloseApproach.objects.all(), request.GET)
+    return export_response(
+        request, approaches.order_by('close_approach_date', 'id'), APPROACH_EXPORT_FIELDS, 'close_approaches'
+    )
+
+
+def filter_approaches(approaches, params):
+    """
+    Apply the close approaches list filters in ``params`` to a queryset
+    """
+    # Filter by future/past approaches
+    if params.get('future') == 'true':
+        approaches = approaches.filter(close_approach_date__gte=timezone.now())
+    return approaches
+
+
+@require_http_methods(["POST"])
+def refresh_asteroids(request):
+    """
+    AJAX endpoint queueing a refresh of the asteroid data. Answers at once with
+    the job; poll its status URL for progress and the result.
+    """
+    try:
+        return job_accepted(enqueue('asteroids.refresh', unique=True))
+        
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -137,18 +289,42 @@ def refresh_asteroids(request):
         })
 
 
-def create_asteroid_scatter(approaches):
+def approach_columns(approaches, *fields):
+    """
+    Read only ``fields`` from the queryset and return them as one flat
+    list per field, or an empty list when there are no rows
     """
-    Create a scatter plot of asteroid approaches using Plotly
+    return [list(column) for column in zip(*approaches.values_list(*fields))]
+
+
+def create_asteroid_scatter(approaches, point_budget=None):
     """
-    if not approaches:
+    Create a scatter plot of asteroid approaches using Plotly.
+
+    Only the plotted columns are read, and dense regions are thinned by
+    density binning so the figure never holds more than about
+    ``point_budget`` points (CHART_POINT_BUDGET by default).
+    """
+    columns = approach_columns(
+        approaches,
+        'miss_distance_kilometers', 'relative_velocity_km_per_sec', 'asteroid__name',
+        'asteroid__is_potentially_hazardous',
+    )
+    if not columns:
         return None
     
     # Prepare data for scatter plot
-    distances = [approach.miss_distance_kilometers for approach in approaches]
-    velocities = [approach.relative_velocity_km_per_sec for approach in approaches]
-    names = [approach.asteroid.name for approach in approaches]
-    hazardous = [approach.asteroid.is_potentially_hazardous for approach in approaches]
+    distances, velocities, names, hazardous = columns
+    keep, counts = density_bin(
+        distances, velocities, point_budget or settings.CHART_POINT_BUDGET, groups=hazardous
+    )
+    distances = [distances[i] for i in keep]
+    velocities = [velocities[i] for i in keep]
+    hazardous = [hazardous[i] for i in keep]
+    names = [
+        names[i] if count == 1 else f'{names[i]} (+{count - 1} nearby)'
+        for i, count in zip(keep, counts)
+    ]
     
     # Color based on hazardous status
     colors = ['red' if h else 'blue' for h in hazardous]
@@ -183,18 +359,28 @@ def create_asteroid_scatter(approaches):
     return json.dumps(fig, cls=PlotlyJSONEncoder)
 
 
-def create_distance_timeline(approaches):
+def create_distance_timeline(approaches, point_budget=None):
     """
-    Create a timeline chart of upcoming close approaches
+    Create a timeline chart of upcoming close approaches.
+
+    Only the plotted columns are read, and long series are reduced with
+    Largest-Triangle-Three-Buckets to at most ``point_budget`` points
+    (CHART_POINT_BUDGET by default).
     """
-    if not approaches:
+    columns = approach_columns(
+        approaches.order_by('close_approach_date'),
+        'close_approach_date', 'miss_distance_lunar', 'asteroid__name', 'asteroid__is_potentially_hazardous',
+    )
+    if not columns:
         return None
     
     # Prepare data for timeline
-    dates = [approach.close_approach_date for approach in approaches]
-    distances = [approach.miss_distance_lunar for approach in approaches]  # In lunar distances
-    names = [approach.asteroid.name for approach in approaches]
-    hazardous = [approach.asteroid.is_potentially_hazardous for approach in approaches]
+    dates, distances, names, hazardous = columns  # Distances in lunar distances
+    keep = lttb([date.timestamp() for date in dates], distances, point_budget or settings.CHART_POINT_BUDGET)
+    dates = [dates[i] for i in keep]
+    distances = [distances[i] for i in keep]
+    names = [names[i] for i in keep]
+    hazardous = [hazardous[i] for i in keep]
     
     # Color based on hazardous status
     colors = ['red' if h else 'blue' for h in hazardous]
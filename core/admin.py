@@ -0,0 +1,204 @@
+import json
+from datetime import timedelta
+
+import plotly.graph_objects as go
+from django.contrib import admin
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.shortcuts import render
+from django.urls import path
+from django.utils import timezone
+from plotly.utils import PlotlyJSONEncoder
+from .breaker import reset_breaker
+from .models import CircuitBreaker, FetchLedger, IngestRun, Job
+
+# Days of ingest runs shown on the trends page unless ?days= says otherwise
+TREND_DAYS = 30
+
+
+@admin.register(FetchLedger)
+class FetchLedgerAdmin(admin.ModelAdmin):
+    list_display = ('source', 'start_date', 'end_date', 'status', 'records', 'fetched_at')
+    list_filter = ('source', 'status', 'fetched_at')
+    search_fields = ('error',)
+    readonly_fields = ('source', 'start_date', 'end_date', 'fetched_at', 'status', 'records', 'error')
+    date_hierarchy = 'fetched_at'
+    
+    def has_add_permission(self, request):
+        """Prevent manual addition - Ledger entries are written by the fetchers"""
+        return False
+
+
+@admin.register(CircuitBreaker)
+class CircuitBreakerAdmin(admin.ModelAdmin):
+    list_display = ('source', 'state', 'consecutive_failures', 'state_changed_at', 'last_failure_at')
+    list_filter = ('state',)
+    readonly_fields = ('source', 'state', 'consecutive_failures', 'state_changed_at', 'last_failure_at', 'last_error')
+    actions = ['reset_breakers']
+    
+    def has_add_permission(self, request):
+        """Prevent manual addition - Breakers are created by the fetchers"""
+        return False
+    
+    @admin.action(description="Close selected breakers")
+    def reset_breakers(self, request, queryset):
+        for breaker in queryset:
+            reset_breaker(breaker.source)
+        self.message_user(request, f"Closed {queryset.count()} circuit breakers.")
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'worker', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status', 'created_at')
+    search_fields = ('error', 'worker')
+    readonly_fields = (
+        'kind', 'params', 'status', 'progress', 'result', 'error', 'attempts', 'max_attempts', 'run_after',
+        'worker', 'heartbeat_at', 'created_at', 'started_at', 'finished_at',
+    )
+    date_hierarchy = 'created_at'
+    
+    def has_add_permission(self, request):
+        """Prevent manual addition - Jobs are queued by the application"""
+        return False
+
+
+@admin.register(IngestRun)
+class IngestRunAdmin(admin.ModelAdmin):
+    list_display = (
+        'started_at', 'source', 'start_date', 'end_date', 'status', 'inserted', 'updated', 'skipped',
+        'record_error_count', 'http', 'parse', 'db', 'size', 'throughput',
+    )
+    list_filter = ('source', 'status', 'started_at')
+    search_fields = ('error',)
+    readonly_fields = (
+        'source', 'start_date', 'end_date', 'status', 'started_at', 'finished_at', 'http_seconds',
+        'bytes_received', 'parse_seconds', 'db_seconds', 'inserted', 'updated', 'skipped', 'error',
+        'record_errors', 'record_error_count',
+    )
+    date_hierarchy = 'started_at'
+    change_list_template = 'admin/core/ingestrun/change_list.html'
+    
+    def has_add_permission(self, request):
+        """Prevent manual addition - Runs are written by the fetchers"""
+        return False
+    
+    @admin.display(description='HTTP s', ordering='http_seconds')
+    def http(self, run):
+        return f"{run.http_seconds:.2f}"
+    
+    @admin.display(description='Parse s', ordering='parse_seconds')
+    def parse(self, run):
+        return f"{run.parse_seconds:.2f}"
+    
+    @admin.display(description='DB s', ordering='db_seconds')
+    def db(self, run):
+        return f"{run.db_seconds:.2f}"
+    
+    @admin.display(description='KB', ordering='bytes_received')
+    def size(self, run):
+        return f"{run.bytes_received / 1024:.0f}"
+    
+    @admin.display(description='Records/s')
+    def throughput(self, run):
+        return f"{run.records_per_second:.0f}" if run.records_per_second is not None else '-'
+    
+    def get_urls(self):
+        return [
+            path('trends/', self.admin_site.admin_view(self.trends_view), name='core_ingestrun_trends'),
+        ] + super().get_urls()
+    
+    def trends_view(self, request):
+        """
+        Ingest throughput and where the time went, per source, over the last
+        ``?days=`` days (default TREND_DAYS), optionally for one ``?source=``
+        """
+        try:
+            days = max(1, int(request.GET.get('days', TREND_DAYS)))
+        except ValueError:
+            days = TREND_DAYS
+        source = request.GET.get('source', '')
+        runs = IngestRun.objects.filter(started_at__gte=timezone.now() - timedelta(days=days))
+        if source:
+            runs = runs.filter(source=source)
+        
+        summary = runs.values('source').annotate(
+            runs=Count('id'), inserted=Sum('inserted'), updated=Sum('updated'), skipped=Sum('skipped'),
+            record_errors=Sum('record_error_count'), bytes_received=Sum('bytes_received'),
+            http_seconds=Sum('http_seconds'), parse_seconds=Sum('parse_seconds'), db_seconds=Sum('db_seconds'),
+        ).order_by('source')
+        sources = dict(FetchLedger.SOURCE_CHOICES)
+        for row in summary:
+            row['name'] = sources.get(row['source'], row['source'])
+            records = row['inserted'] + row['updated'] + row['skipped']
+            busy = row['http_seconds'] + row['parse_seconds'] + row['db_seconds']
+            row['records_per_second'] = records / busy if busy else None
+            row['megabytes'] = row['bytes_received'] / (1024 * 1024)
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Ingest throughput',
+            'days': days,
+            'source': source,
+            'sources': FetchLedger.SOURCE_CHOICES,
+            'summary': summary,
+            'throughput_chart': create_throughput_chart(
+                runs.filter(status=IngestRun.STATUS_SUCCESS).order_by('started_at'), sources
+            ),
+            'phase_chart': create_phase_chart(
+                runs.annotate(day=TruncDate('started_at')).values('day').annotate(
+                    http=Sum('http_seconds'), parse=Sum('parse_seconds'), db=Sum('db_seconds'),
+                ).order_by('day')
+            ),
+        }
+        return render(request, 'admin/core/ingestrun/trends.html', context)
+
+
+def create_throughput_chart(runs, sources):
+    """
+    Create a chart of the records per second of every successful run, one
+    line per source, using Plotly
+    """
+    series = {}
+    for run in runs:
+        if run.records_per_second is not None:
+            times, rates = series.setdefault(run.source, ([], []))
+            times.append(run.started_at)
+            rates.append(run.records_per_second)
+    if not series:
+        return None
+    
+    fig = go.Figure()
+    for source, (times, rates) in series.items():
+        fig.add_trace(go.Scatter(x=times, y=rates, mode='lines+markers', name=sources.get(source, source)))
+    fig.update_layout(
+        title='Ingest Throughput',
+        xaxis_title='Run started',
+        yaxis_title='Records per second',
+        height=400,
+    )
+    return json.dumps(fig, cls=PlotlyJSONEncoder)
+
+
+def create_phase_chart(daily):
+    """
+    Create a stacked bar chart of the seconds spent per day on HTTP,
+    parsing and database writes, using Plotly
+    """
+    daily = list(daily)
+    if not daily:
+        return None
+    
+    days = [row['day'] for row in daily]
+    fig = go.Figure()
+    for key, label, color in (('http', 'HTTP', '#4e79a7'), ('parse', 'Parse', '#f28e2b'), ('db', 'Database', '#59a14f')):
+        fig.add_trace(go.Bar(x=days, y=[row[key] for row in daily], name=label, marker_color=color))
+    fig.update_layout(
+        title='Ingest Time per Day',
+        xaxis_title='Date',
+        yaxis_title='Seconds',
+        barmode='stack',
+        height=400,
+    )
+    return json.dumps(fig, cls=PlotlyJSONEncoder)
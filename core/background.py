@@ -0,0 +1,47 @@
+import logging
+import math
+import threading
+import time
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_running = set()
+_last_started = {}
+_lock = threading.Lock()
+
+
+def refresh_in_background(key, refresh):
+    """
+    Run ``refresh()`` on a daemon thread so the current request never waits
+    for it, and return True if it was started.
+
+    Within a process at most one refresh per ``key`` runs at a time, and a
+    key is refreshed at most once every BACKGROUND_REFRESH_INTERVAL seconds
+    however many requests ask for it. Across processes ``refresh`` should be
+    single-flight and ledger-aware itself, like the NASA fetchers.
+    """
+    now = time.monotonic()
+    with _lock:
+        last_started = _last_started.get(key, -math.inf)
+        if key in _running or now - last_started < settings.BACKGROUND_REFRESH_INTERVAL:
+            return False
+        _running.add(key)
+        _last_started[key] = now
+
+    threading.Thread(target=_run, args=(key, refresh), name=f'refresh-{key}', daemon=True).start()
+    return True
+
+
+def _run(key, refresh):
+    try:
+        refresh()
+        logger.info(f"Background refresh of {key} finished")
+    except Exception as e:
+        logger.error(f"Background refresh of {key} failed: {e}")
+    finally:
+        # The thread's own database connections would otherwise stay open
+        connections.close_all()
+        with _lock:
+            _running.discard(key)
@@ -0,0 +1,172 @@
+import logging
+from contextlib import contextmanager
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .models import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a source whose circuit breaker is open"""
+
+    def __init__(self, source, retry_at):
+        super().__init__(f"{source} is unavailable; next attempt after {retry_at:%Y-%m-%d %H:%M:%S %Z}")
+        self.source = source
+        self.retry_at = retry_at
+
+
+def _cooldown():
+    return timedelta(seconds=settings.CIRCUIT_BREAKER_COOLDOWN_SECONDS)
+
+
+def is_local_refusal(error):
+    """
+    True when ``error`` is our own client refusing to send the request
+    (QuotaExhausted): NASA was never asked, so it says nothing about it
+    """
+    # Imported here: http_client reports to core.ingest, which imports this module
+    from .http_client import QuotaExhausted
+    return isinstance(error, QuotaExhausted)
+
+
+def is_source_failure(error):
+    """
+    True when ``error`` means the source itself is failing: no response,
+    a timeout, a server error or rate limiting. Other 4xx responses are
+    answers about the request and leave the breaker alone, as do requests
+    refused locally (see is_local_refusal).
+    """
+    if is_local_refusal(error):
+        return False
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(error, requests.RequestException)
+
+
+def allow_request(source, now=None):
+    """
+    Raise CircuitOpenError unless a request to ``source`` may go ahead.
+
+    A closed breaker lets everything through. Once an open breaker's
+    cooldown has passed, exactly one caller wins the switch to half-open
+    and probes the source while everyone else keeps being refused; if the
+    probe never reports back, another one is let through after a further
+    cooldown.
+    """
+    now = now or timezone.now()
+    breaker = CircuitBreaker.objects.filter(source=source).first()
+    if breaker is None or breaker.state == CircuitBreaker.STATE_CLOSED:
+        return
+
+    retry_at = breaker.state_changed_at + _cooldown()
+    if now < retry_at:
+        raise CircuitOpenError(source, retry_at)
+
+    claimed = CircuitBreaker.objects.filter(
+        pk=breaker.pk, state=breaker.state, state_changed_at=breaker.state_changed_at
+    ).update(state=CircuitBreaker.STATE_HALF_OPEN, state_changed_at=now)
+    if not claimed:
+        raise CircuitOpenError(source, now + _cooldown())
+    logger.info(f"Circuit for {source} half-open; probing")
+
+
+def record_success(source):
+    """
+    Close the breaker. A healthy breaker is only read: even an UPDATE that
+    matches no rows takes SQLite's write lock, which would make every
+    successful request contend with the ingest writer.
+    """
+    unhealthy = CircuitBreaker.objects.filter(source=source).exclude(
+        state=CircuitBreaker.STATE_CLOSED, consecutive_failures=0
+    )
+    if unhealthy.exists() and unhealthy.update(
+        state=CircuitBreaker.STATE_CLOSED, consecutive_failures=0, state_changed_at=timezone.now()
+    ):
+        logger.info(f"Circuit for {source} closed")
+
+
+def record_failure(source, error):
+    """
+    Count a failed request and open the breaker once
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD consecutive requests have failed, or
+    straight away when a half-open probe fails
+    """
+    now = timezone.now()
+    breaker, _ = CircuitBreaker.objects.get_or_create(source=source, defaults={'state_changed_at': now})
+    CircuitBreaker.objects.filter(pk=breaker.pk).update(
+        consecutive_failures=F('consecutive_failures') + 1, last_failure_at=now, last_error=str(error)
+    )
+    breaker.refresh_from_db()
+
+    if breaker.state == CircuitBreaker.STATE_OPEN:
+        return
+    if (breaker.state == CircuitBreaker.STATE_HALF_OPEN
+            or breaker.consecutive_failures >= settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+        CircuitBreaker.objects.filter(pk=breaker.pk).update(state=CircuitBreaker.STATE_OPEN, state_changed_at=now)
+        logger.warning(
+            f"Circuit for {source} opened after {breaker.consecutive_failures} consecutive failures: {error}"
+        )
+
+
+def reset_breaker(source):
+    """Close a breaker by hand, e.g. from the admin once NASA has recovered"""
+    CircuitBreaker.objects.filter(source=source).update(
+        state=CircuitBreaker.STATE_CLOSED, consecutive_failures=0, state_changed_at=timezone.now()
+    )
+
+
+@contextmanager
+def circuit_breaker(source):
+    """
+    Guard one request to ``source``.
+
+    Raises CircuitOpenError without running the block while the breaker is
+    open. Source failures raised by the block (see is_source_failure) are
+    counted against the breaker; a block that completes, or gets a 4xx
+    answer, closes it. Other exceptions, such as a malformed payload or a
+    request our own quota refused, are re-raised without changing the
+    breaker.
+    """
+    allow_request(source)
+    try:
+        yield
+    except requests.RequestException as e:
+        if is_source_failure(e):
+            record_failure(source, e)
+        elif not is_local_refusal(e):
+            record_success(source)
+        raise
+    record_success(source)
+
+
+def source_unavailable(source):
+    """True while ``source``'s breaker is refusing requests"""
+    return CircuitBreaker.objects.filter(source=source).exclude(state=CircuitBreaker.STATE_CLOSED).exists()
+
+
+def breaker_states():
+    """
+    Current breaker of every known source, for monitoring. Sources that
+    never failed have no row yet and are reported as closed.
+    """
+    breakers = {breaker.source: breaker for breaker in CircuitBreaker.objects.all()}
+    states = {}
+    for source, label in CircuitBreaker._meta.get_field('source').choices:
+        breaker = breakers.get(source)
+        states[source] = {
+            'name': label,
+            'state': breaker.state if breaker else CircuitBreaker.STATE_CLOSED,
+            'consecutive_failures': breaker.consecutive_failures if breaker else 0,
+            'state_changed_at': breaker.state_changed_at.isoformat() if breaker else None,
+            'last_failure_at': (
+                breaker.last_failure_at.isoformat() if breaker and breaker.last_failure_at else None
+            ),
+            'last_error': breaker.last_error if breaker else '',
+        }
+    return states
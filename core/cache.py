@@ -0,0 +1,143 @@
+import functools
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import has_vary_header
+from .models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+# Per-source list of the keys stored, used to drop them after an ingest
+INDEX_KEY = 'data-cache-index:{source}'
+
+
+class CacheStats:
+    """
+    Hit and miss counters per namespace for this process
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, namespace, hit):
+        with self._lock:
+            counts = self._counts.setdefault(namespace, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {namespace: dict(counts) for namespace, counts in sorted(self._counts.items())}
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+cache_stats = CacheStats()
+
+
+def data_versions(sources):
+    """Current data version of each source, in one query"""
+    versions = dict(DataVersion.objects.filter(source__in=sources).values_list('source', 'version'))
+    return [(source, versions.get(source, 0)) for source in sources]
+
+
+def versioned_key(namespace, sources, params):
+    """
+    Cache key of ``params`` in ``namespace`` at the current data versions
+    of ``sources``, so entries built before an ingest are never read again
+    """
+    versions = ','.join(f"{source}={version}" for source, version in data_versions(sources))
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()
+    return f"{namespace}:{versions}:{digest}"
+
+
+def _remember(key, sources):
+    """Add ``key`` to the index of every source it was built from"""
+    for source in sources:
+        index_key = INDEX_KEY.format(source=source)
+        # Concurrent writers may drop each other's additions; such keys are
+        # still unreachable after the next version bump and simply expire
+        keys = cache.get(index_key, [])
+        if key not in keys:
+            # The cache itself holds at most CACHE_MAX_ENTRIES entries
+            cache.set(index_key, (keys + [key])[-settings.CACHE_MAX_ENTRIES:], None)
+
+
+def cached(namespace, sources, params, build, timeout=None):
+    """
+    Return ``build()`` cached in the site cache under the data versions of
+    ``sources`` (FetchLedger source names).
+
+    ``params`` must include everything the value depends on besides stored
+    data, such as filters or the day a relative window starts. The value
+    must be picklable: plain data or evaluated querysets, not lazy ones.
+    """
+    key = versioned_key(namespace, sources, params)
+    value = cache.get(key)
+    cache_stats.record(namespace, value is not None)
+    if value is None:
+        value = build()
+        cache.set(key, value, settings.CACHE_TIMEOUT if timeout is None else timeout)
+        _remember(key, sources)
+    return value
+
+
+def drop_source(source):
+    """
+    Delete every entry built from ``source``'s data. Called after an ingest
+    bumped its data version, so the cache does not fill up with entries that
+    can no longer be read.
+    """
+    index_key = INDEX_KEY.format(source=source)
+    keys = cache.get(index_key, [])
+    cache.delete_many(keys + [index_key])
+    if keys:
+        logger.debug(f"Dropped {len(keys)} cached entries of {source}")
+    return len(keys)
+
+
+def cache_response(*sources, timeout=None):
+    """
+    Decorator caching a view's whole GET responses per full path (query
+    string included) at the current data versions of ``sources``.
+
+    Only plain 200 responses that neither set cookies, used the CSRF token
+    nor forbid caching (e.g. error payloads sent with
+    ``add_never_cache_headers``) are stored, so no visitor's token is ever
+    served to another; pages rendering the token cache their context with
+    ``cached`` instead.
+    """
+    def decorator(view):
+        namespace = f"response:{view.__module__}.{view.__name__}"
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            key = versioned_key(namespace, sources, (request.get_full_path(), args, sorted(kwargs.items())))
+            stored = cache.get(key)
+            cache_stats.record(namespace, stored is not None)
+            if stored is not None:
+                content, content_type = stored
+                return HttpResponse(content, content_type=content_type)
+
+            response = view(request, *args, **kwargs)
+            if (response.status_code == 200 and not response.streaming and not response.cookies
+                    and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+                    and not has_vary_header(response, 'Cookie')
+                    and 'no-cache' not in response.get('Cache-Control', '')):
+                cache.set(
+                    key, (response.content, response['Content-Type']),
+                    settings.CACHE_TIMEOUT if timeout is None else timeout,
+                )
+                _remember(key, sources)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,66 @@
+import logging
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .metrics import timed
+from .versions import get_data_version
+
+logger = logging.getLogger(__name__)
+
+
+class ChartCache:
+    """
+    Size-bounded, thread-safe LRU cache of serialized Plotly figures
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key], True
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+chart_cache = ChartCache(max_entries=getattr(settings, 'CHART_CACHE_MAX_ENTRIES', 128))
+
+
+def cached_chart(chart_type, source, params, build):
+    """
+    Return the serialized chart for (chart_type, params) at the current data
+    version of ``source``, calling ``build()`` only on a cache miss.
+
+    ``params`` must be hashable and include everything the chart depends on
+    besides stored data (for example the day a relative window starts).
+    Entries built before the last ingest are never served again and age out
+    of the LRU.
+    """
+    key = (chart_type, params, source, get_data_version(source))
+    chart, found = chart_cache.get(key)
+    if not found:
+        with timed('chart'):
+            chart = build()
+        chart_cache.set(key, chart)
+    return chart
@@ -0,0 +1,95 @@
+import functools
+import hashlib
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from .models import DataVersion
+
+
+def make_etag(*parts):
+    """
+    Weak ETag of ``parts`` and the deployed APP_RELEASE. Weak because pages
+    built from the same data still differ byte for byte (CSRF tokens).
+    """
+    digest = hashlib.sha1(repr((settings.APP_RELEASE,) + parts).encode()).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def source_validators(sources, daily=False):
+    """
+    ETag and Last-Modified of a response built from the stored data of
+    ``sources`` (FetchLedger source names), read in one query.
+
+    ``daily`` responses also depend on today's date, e.g. through a 30 day
+    window, so they change at midnight (UTC) even without an ingest.
+    """
+    rows = {
+        source: (version, updated_at)
+        for source, version, updated_at in DataVersion.objects.filter(source__in=sources)
+        .values_list('source', 'version', 'updated_at')
+    }
+    versions = [(source, rows.get(source, (0, None))[0]) for source in sources]
+    modified = [updated_at for _, updated_at in rows.values()]
+    if daily:
+        today = timezone.now().date()
+        versions.append(('today', today.isoformat()))
+        modified.append(datetime.combine(today, time.min, tzinfo=dt_timezone.utc))
+    return make_etag(*versions), max(modified) if modified else None
+
+
+def set_validators(response, etag, last_modified=None):
+    """
+    Add ``etag`` and ``last_modified`` to a successful response and ask
+    clients to revalidate it on every use. Responses sent with ``no-store``
+    (e.g. error pages marked with ``add_never_cache_headers``) are left
+    alone, so the next request tries again.
+    """
+    if response.status_code not in (200, 304) or 'no-store' in response.get('Cache-Control', ''):
+        return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Pages carry their visitor's CSRF token, so shared caches must not keep them
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    304 (or 412) response when the request's validators match ``etag`` /
+    ``last_modified``, otherwise None
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp()) if last_modified else None
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def conditional_on(*sources, daily=False):
+    """
+    Decorator answering conditional GETs (``If-None-Match`` or
+    ``If-Modified-Since``) of a view showing the stored data of ``sources``
+    with 304 Not Modified until their next ingest, before the view runs.
+
+    Validators come from the sources' data versions, see
+    ``source_validators``. Apply it outside ``cache_response``, which must
+    not see the ``no-cache`` header added here.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            etag, last_modified = source_validators(sources, daily)
+            response = not_modified(request, etag, last_modified)
+            if response is None:
+                response = set_validators(view(request, *args, **kwargs), etag, last_modified)
+            return response
+        return wrapper
+    return decorator
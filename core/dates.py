@@ -0,0 +1,25 @@
+from datetime import datetime, time, timedelta
+import pytz
+
+
+def day_start(day):
+    """
+    Midnight UTC at the start of ``day``, for half-open datetime ranges
+    (``field >= day_start(a)`` and ``field < day_start(b + 1 day)``) that
+    can use an index, unlike ``__date`` lookups
+    """
+    return datetime.combine(day, time.min).replace(tzinfo=pytz.UTC)
+
+
+def split_windows(start_date, end_date, days):
+    """
+    Split an inclusive date span into consecutive (start, end) windows of
+    at most ``days`` calendar days each
+    """
+    windows = []
+    window_start = start_date
+    while window_start <= end_date:
+        window_end = min(window_start + timedelta(days=days - 1), end_date)
+        windows.append((window_start, window_end))
+        window_start = window_end + timedelta(days=1)
+    return windows
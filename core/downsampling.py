@@ -0,0 +1,89 @@
+import math
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    ``x`` must be numeric and sorted ascending. Returns the indices of at
+    most ``threshold`` points that preserve the visual shape of the series;
+    the first and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1][:max(threshold, 0)]
+
+    indices = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third vertex of the triangle
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(x[next_start:next_end]) / span
+        avg_y = sum(y[next_start:next_end]) / span
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = x[a], y[a]
+        best_area = -1
+        best = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (y[j] - ay) - (ax - x[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        indices.append(best)
+        a = best
+
+    indices.append(n - 1)
+    return indices
+
+
+def density_bin(x, y, budget, groups=None, log_x=False):
+    """
+    Thin a scatter plot to roughly ``budget`` points by gridding the plane.
+
+    Each occupied cell keeps its first point, so outliers survive while
+    dense regions collapse. Points are binned separately per value of
+    ``groups`` (for example the hazardous flag) so no group disappears.
+    Returns (indices, counts) where counts[k] is how many points the kept
+    point indices[k] stands for.
+    """
+    n = len(x)
+    if n <= budget:
+        return list(range(n)), [1] * n
+
+    if log_x:
+        # Non-positive values have no place on a log axis; count them in the
+        # leftmost column instead of mixing linear values with logarithms
+        positive = [v for v in x if v > 0]
+        floor = math.log10(min(positive)) if positive else 0.0
+        xs = [math.log10(v) if v > 0 else floor for v in x]
+    else:
+        xs = x
+    min_x, max_x = min(xs), max(xs)
+    min_y, max_y = min(y), max(y)
+    group_count = len(set(groups)) if groups is not None else 1
+    side = max(int(math.sqrt(budget / group_count)), 1)
+    width = (max_x - min_x) / side or 1
+    height = (max_y - min_y) / side or 1
+
+    cells = {}
+    for i in range(n):
+        cell = (
+            groups[i] if groups is not None else None,
+            min(int((xs[i] - min_x) / width), side - 1),
+            min(int((y[i] - min_y) / height), side - 1),
+        )
+        if cell in cells:
+            cells[cell][1] += 1
+        else:
+            cells[cell] = [i, 1]
+
+    kept = sorted(cells.values())
+    return [index for index, _ in kept], [count for _, count in kept]
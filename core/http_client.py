@@ -0,0 +1,307 @@
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from .ingest import add_http_time
+from .metrics import add_time
+
+logger = logging.getLogger(__name__)
+
+# Responses worth trying again after a pause; anything else is returned as is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class QuotaExhausted(requests.RequestException):
+    """Raised when the API key's quota would not allow a request soon enough"""
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``rate`` tokens per second up to ``capacity``.
+    Callers reserve a token and sleep until it is theirs, so concurrent
+    threads are spaced out in the order they arrived.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, max_wait=None):
+        """
+        Take a token, sleeping until it is available. Raises QuotaExhausted
+        without taking it if that would mean sleeping longer than ``max_wait``.
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                raise QuotaExhausted(f"Rate limit reached; next request possible in {wait:.0f}s")
+            self.tokens -= 1
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def set_rate(self, rate, capacity, tokens=None):
+        """Change the refill rate and capacity, optionally lowering the tokens left"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+            self.capacity = capacity
+            self.tokens = min(self.tokens, capacity if tokens is None else tokens)
+
+
+class KeyPool:
+    """
+    NASA API keys with the quota each has left, as last reported by NASA's
+    rate-limit headers and counted down locally for requests in flight.
+
+    ``checkout()`` hands out the key with the most headroom; keys NASA
+    reports as exhausted are skipped until ``window`` seconds later, when
+    their hourly quota has refilled.
+    """
+
+    def __init__(self, keys, window, default_quota=1000):
+        self.window = window
+        self.default_quota = default_quota
+        self._lock = threading.Lock()
+        self._keys = {
+            key: {'limit': None, 'remaining': None, 'exhausted_until': None, 'requests': 0, 'rate_limited': 0}
+            for key in keys
+        }
+
+    def _headroom(self, state, now):
+        if state['exhausted_until'] is not None:
+            if now < state['exhausted_until']:
+                return 0
+            state.update(remaining=None, exhausted_until=None)
+        if state['remaining'] is None:
+            return state['limit'] or self.default_quota
+        return state['remaining']
+
+    def checkout(self):
+        """Return the key with the most quota left, counting the request against it"""
+        with self._lock:
+            now = time.monotonic()
+            key, state = max(
+                self._keys.items(), key=lambda item: (self._headroom(item[1], now), -item[1]['requests'])
+            )
+            if self._headroom(state, now) <= 0:
+                wait = min(state['exhausted_until'] - now for state in self._keys.values())
+                raise QuotaExhausted(f"All {len(self._keys)} NASA API keys are exhausted for another {wait:.0f}s")
+            if state['remaining'] is not None:
+                state['remaining'] -= 1
+                if state['remaining'] <= 0:
+                    state['exhausted_until'] = now + self.window
+            state['requests'] += 1
+            return key
+
+    def available(self):
+        """True if some key still has quota"""
+        with self._lock:
+            now = time.monotonic()
+            return any(self._headroom(state, now) > 0 for state in self._keys.values())
+
+    def observe(self, key, limit, remaining):
+        """Record the quota NASA reported for ``key``"""
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None:
+                return
+            state.update(limit=limit, remaining=remaining)
+            if remaining > 0:
+                state['exhausted_until'] = None
+            elif state['exhausted_until'] is None:
+                state['exhausted_until'] = time.monotonic() + self.window
+
+    def exhaust(self, key, retry_after=None):
+        """Take ``key`` out of rotation after NASA answered 429 for it"""
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None:
+                return
+            try:
+                pause = float(retry_after)
+            except (TypeError, ValueError):
+                pause = self.window
+            state.update(remaining=0, exhausted_until=time.monotonic() + pause)
+            state['rate_limited'] += 1
+
+    def stats(self):
+        """Per-key usage with the keys masked to their last four characters"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                f"...{key[-4:]}": {
+                    'requests': state['requests'],
+                    'rate_limited': state['rate_limited'],
+                    'limit': state['limit'],
+                    'remaining': state['remaining'],
+                    'exhausted_for_seconds': (
+                        round(state['exhausted_until'] - now)
+                        if state['exhausted_until'] is not None and state['exhausted_until'] > now else 0
+                    ),
+                }
+                for key, state in self._keys.items()
+            }
+
+
+class NasaClient:
+    """
+    HTTP client shared by the NASA services.
+
+    Requests go through one pooled keep-alive session, so repeated calls to
+    api.nasa.gov skip the TCP and TLS handshakes. Connection errors,
+    timeouts, 429 and 5xx responses are retried with exponential backoff
+    and full jitter (honouring Retry-After). Each API key has a token
+    bucket; once NASA's ``X-RateLimit-Remaining`` falls below
+    NASA_RATE_LIMIT_SLOWDOWN_FRACTION of ``X-RateLimit-Limit`` the bucket
+    spreads the remaining requests over the rate-limit window instead of
+    running into 429s. Per-endpoint timings are kept in ``stats()``.
+
+    Requests whose ``api_key`` parameter is None are sent with a key from
+    NASA_API_KEYS chosen by the KeyPool; a key that gets a 429 is rotated
+    out and the request retried at once on another one. Per-key usage is
+    in ``key_stats()``.
+    """
+
+    def __init__(self):
+        self.max_retries = settings.NASA_HTTP_MAX_RETRIES
+        self.backoff_base = settings.NASA_HTTP_BACKOFF_BASE
+        self.backoff_max = settings.NASA_HTTP_BACKOFF_MAX
+        self.rate = settings.NASA_RATE_LIMIT_PER_SECOND
+        self.burst = settings.NASA_RATE_LIMIT_BURST
+        self.slowdown_fraction = settings.NASA_RATE_LIMIT_SLOWDOWN_FRACTION
+        self.window = settings.NASA_RATE_LIMIT_WINDOW_SECONDS
+        self.max_wait = settings.NASA_RATE_LIMIT_MAX_WAIT
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.NASA_HTTP_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.keys = KeyPool(settings.NASA_API_KEYS, self.window)
+        self._buckets = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    def get(self, url, params=None, timeout=15, stream=False):
+        """
+        GET ``url`` and return the final response, like ``requests.get``.
+
+        The response of the last attempt is returned even if it is still an
+        error, so callers keep using ``raise_for_status()``. Network errors
+        are re-raised once the retries are used up.
+        """
+        params = dict(params or {})
+        pinned_key = params.get('api_key')
+        path = urlsplit(url).path
+        attempt = 0
+        while True:
+            api_key = params['api_key'] = pinned_key or self.keys.checkout()
+            bucket = self._bucket(api_key)
+            bucket.acquire(self.max_wait)
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(path, time.perf_counter() - started, None, attempt)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"GET {path} failed ({e}); retry {attempt + 1} in {delay:.1f}s")
+            else:
+                # Time to the response headers; streamed bodies are read later
+                self._record(path, time.perf_counter() - started, response.status_code, attempt)
+                self._observe_quota(api_key, bucket, response)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response.headers.get('Retry-After'))
+                if response.status_code == 429 and not pinned_key:
+                    self.keys.exhaust(api_key, response.headers.get('Retry-After'))
+                    if self.keys.available():
+                        delay = 0
+                logger.warning(
+                    f"GET {path} returned {response.status_code}; retry {attempt + 1} in {delay:.1f}s"
+                )
+                response.close()
+            attempt += 1
+            time.sleep(delay)
+
+    def _bucket(self, api_key):
+        with self._lock:
+            bucket = self._buckets.get(api_key)
+            if bucket is None:
+                bucket = self._buckets[api_key] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def _backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        try:
+            return max(delay, min(float(retry_after), self.backoff_max))
+        except (TypeError, ValueError):
+            return delay
+
+    def _observe_quota(self, api_key, bucket, response):
+        try:
+            limit = int(response.headers['X-RateLimit-Limit'])
+            remaining = int(response.headers['X-RateLimit-Remaining'])
+        except (KeyError, ValueError):
+            return
+        self.keys.observe(api_key, limit, remaining)
+        if limit > 0 and remaining / limit > self.slowdown_fraction:
+            bucket.set_rate(self.rate, self.burst)
+        else:
+            bucket.set_rate(min(self.rate, max(remaining, 1) / self.window), 1, tokens=min(remaining, 1))
+
+    def _record(self, path, seconds, status, attempt):
+        with self._lock:
+            timing = self._timings.setdefault(path, {
+                'calls': 0, 'errors': 0, 'retries': 0, 'total_seconds': 0.0, 'max_seconds': 0.0,
+                'last_status': None,
+            })
+            timing['calls'] += 1
+            timing['retries'] += attempt > 0
+            timing['errors'] += status is None or status >= 400
+            timing['total_seconds'] += seconds
+            timing['max_seconds'] = max(timing['max_seconds'], seconds)
+            timing['last_status'] = status
+        add_time('http', seconds)
+        add_http_time(seconds)
+        logger.debug(f"GET {path} -> {status} in {seconds * 1000:.0f} ms")
+
+    def stats(self):
+        """Per-path call counts and timings since the process started"""
+        with self._lock:
+            return {path: dict(timing) for path, timing in self._timings.items()}
+
+    def key_stats(self):
+        """Per-key requests and remaining quota since the process started"""
+        return self.keys.stats()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def nasa_client():
+    """The process-wide NasaClient, created on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = NasaClient()
+        return _client
@@ -0,0 +1,178 @@
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from django.db import DatabaseError, connection
+from django.utils import timezone
+from .breaker import CircuitOpenError
+from .models import IngestRun
+
+logger = logging.getLogger(__name__)
+
+# Dropped records whose error is kept on the run; the rest are only counted
+ERROR_SAMPLE_SIZE = 20
+
+_current = contextvars.ContextVar('ingest_run', default=None)
+
+
+class IngestRecorder:
+    """
+    Timings, counts and record errors of fetching and storing one window of
+    a NASA source, saved as an IngestRun.
+
+    Used as a context manager around the fetch: the fetcher code reports to
+    the recorder active in its thread through the functions below, and the
+    run is saved on exit, as failed when an exception leaves the block.
+    Downloads running on pool threads activate it with ``call()``.
+    """
+
+    def __init__(self, source, start_date, end_date):
+        self.source = source
+        self.start_date = start_date
+        self.end_date = end_date
+        self.started_at = timezone.now()
+        self.seconds = {'http': 0.0, 'parse': 0.0, 'db': 0.0}
+        self.bytes_received = 0
+        self.counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        self.record_errors = []
+        self.record_error_count = 0
+        self._tokens = []
+
+    def call(self, function, *args):
+        """Call ``function(*args)`` with this recorder active, e.g. on a download thread"""
+        token = _current.set(self)
+        try:
+            return function(*args)
+        finally:
+            _current.reset(token)
+
+    def __enter__(self):
+        self._tokens.append(_current.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        _current.reset(self._tokens.pop())
+        self.save(exc)
+        return False
+
+    def save(self, error=None):
+        """Store the run; failures to do so are logged, never raised"""
+        if error is None:
+            status = IngestRun.STATUS_SUCCESS
+        elif isinstance(error, CircuitOpenError):
+            status = IngestRun.STATUS_SKIPPED
+        else:
+            status = IngestRun.STATUS_ERROR
+        try:
+            return IngestRun.objects.create(
+                source=self.source,
+                start_date=self.start_date,
+                end_date=self.end_date,
+                status=status,
+                started_at=self.started_at,
+                finished_at=timezone.now(),
+                http_seconds=self.seconds['http'],
+                bytes_received=self.bytes_received,
+                parse_seconds=self.seconds['parse'],
+                db_seconds=self.seconds['db'],
+                error=str(error) if error else '',
+                record_errors=self.record_errors,
+                record_error_count=self.record_error_count,
+                **self.counts,
+            )
+        except DatabaseError as e:
+            logger.error(f"Could not save ingest run of {self.source} {self.start_date} to {self.end_date}: {e}")
+            return None
+
+
+@contextmanager
+def phase(name):
+    """Count the time spent in the block as ``http`` or ``parse`` time of the active run"""
+    run = _current.get()
+    if run is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.seconds[name] += time.perf_counter() - started
+
+
+def add_http_time(seconds):
+    """Add a NASA request's ``seconds`` to the active run; called by NasaClient"""
+    run = _current.get()
+    if run is not None:
+        run.seconds['http'] += seconds
+
+
+def received(byte_count):
+    """Add ``byte_count`` bytes of response body to the active run"""
+    run = _current.get()
+    if run is not None:
+        run.bytes_received += byte_count
+
+
+def counting_chunks(chunks):
+    """
+    Pass through the byte chunks of a streamed response body, counting them
+    and the time spent waiting for them as HTTP time of the active run
+    """
+    iterator = iter(chunks)
+    while True:
+        with phase('http'):
+            chunk = next(iterator, None)
+        if chunk is None:
+            return
+        received(len(chunk))
+        yield chunk
+
+
+@contextmanager
+def storing():
+    """
+    Time storing records in the active run: database queries count as DB
+    time, everything else (decoding, normalizing, rollups in Python) as
+    parse time, except body chunks still being read from NASA
+    """
+    run = _current.get()
+    if run is None:
+        yield
+        return
+    db = [0.0]
+
+    def timed_execute(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            db[0] += time.perf_counter() - started
+
+    started = time.perf_counter()
+    http_before = run.seconds['http']
+    try:
+        with connection.execute_wrapper(timed_execute):
+            yield
+    finally:
+        elapsed = time.perf_counter() - started
+        run.seconds['db'] += db[0]
+        run.seconds['parse'] += max(0.0, elapsed - db[0] - (run.seconds['http'] - http_before))
+
+
+def count(inserted=0, updated=0, skipped=0):
+    """Add stored records to the counts of the active run"""
+    run = _current.get()
+    if run is not None:
+        run.counts['inserted'] += inserted
+        run.counts['updated'] += updated
+        run.counts['skipped'] += skipped
+
+
+def record_error(message):
+    """Note a record dropped while storing; the first ERROR_SAMPLE_SIZE are kept"""
+    run = _current.get()
+    if run is not None:
+        run.record_error_count += 1
+        if len(run.record_errors) < ERROR_SAMPLE_SIZE:
+            run.record_errors.append(str(message)[:300])
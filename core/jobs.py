@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Seconds between deletions of old finished jobs by a running worker
+PRUNE_INTERVAL = 3600
+
+_handlers = {}
+
+
+def job(kind, max_attempts=1):
+    """
+    Register the decorated function as the handler of ``kind`` jobs.
+
+    Handlers live in an app's ``jobs`` module, which is imported at startup.
+    They are called as ``handler(progress, **params)``, may report progress
+    with ``progress(message)`` and return a JSON-serializable result.
+    Raising fails the attempt; it is retried with backoff until
+    ``max_attempts`` attempts have been made.
+    """
+    def register(handler):
+        _handlers[kind] = (handler, max_attempts)
+        return handler
+    return register
+
+
+def enqueue(kind, params=None, unique=False):
+    """
+    Queue a ``kind`` job and return it without waiting for it to run.
+
+    With ``unique``, a job of the same kind and parameters that is still
+    queued or running is returned instead, so repeated refresh clicks share
+    one job.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind {kind}")
+    params = params or {}
+    if unique:
+        existing = Job.objects.filter(
+            kind=kind, params=params, status__in=(Job.STATUS_QUEUED, Job.STATUS_RUNNING)
+        ).order_by('id').first()
+        if existing:
+            return existing
+
+    queued = Job.objects.create(kind=kind, params=params, max_attempts=_handlers[kind][1], run_after=timezone.now())
+    if settings.JOB_EMBEDDED_WORKER:
+        transaction.on_commit(start_embedded_worker)
+    return queued
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_job(worker, now=None):
+    """
+    Claim the oldest job that is due and return it, or None when there is
+    none. The claim is a conditional UPDATE that only one worker can win;
+    losers move on to the next job.
+    """
+    now = now or timezone.now()
+    while True:
+        pk = Job.objects.filter(
+            status=Job.STATUS_QUEUED, run_after__lte=now
+        ).order_by('run_after', 'id').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        claimed = Job.objects.filter(pk=pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, worker=worker, attempts=F('attempts') + 1,
+            started_at=now, heartbeat_at=now, progress='',
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+
+
+def run_job(claimed):
+    """
+    Run a claimed job and record its result, a retry or its failure.
+    Returns True if it succeeded.
+    """
+    # Updates only apply while this worker still owns the job, so a job
+    # given up as abandoned and claimed again is not overwritten
+    owned = Job.objects.filter(pk=claimed.pk, status=Job.STATUS_RUNNING, worker=claimed.worker)
+
+    def progress(message):
+        owned.update(progress=message[:200], heartbeat_at=timezone.now())
+
+    handler, _ = _handlers.get(claimed.kind, (None, None))
+    name = f"{claimed.kind} #{claimed.pk}"
+    started = time.monotonic()
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for {claimed.kind} jobs")
+        result = handler(progress, **claimed.params)
+    except Exception as e:
+        now = timezone.now()
+        if claimed.attempts < claimed.max_attempts:
+            delay = settings.JOB_RETRY_DELAY_SECONDS * 2 ** (claimed.attempts - 1)
+            logger.warning(f"Job {name} failed ({e}); retry in {delay}s")
+            owned.update(status=Job.STATUS_QUEUED, error=str(e), worker='', run_after=now + timedelta(seconds=delay))
+        else:
+            logger.error(f"Job {name} failed: {e}")
+            owned.update(status=Job.STATUS_FAILED, error=str(e), finished_at=now)
+        return False
+
+    try:
+        json.dumps(result, cls=Job._meta.get_field('result').encoder)
+    except (TypeError, ValueError) as e:
+        # Checked up front: a failing save would leave the job running, to
+        # be requeued and its work done again
+        logger.error(f"Job {name} returned a result that cannot be stored: {e}")
+        owned.update(status=Job.STATUS_FAILED, error=f"Result could not be stored: {e}", finished_at=timezone.now())
+        return False
+    
+    owned.update(status=Job.STATUS_SUCCEEDED, result=result, error='', finished_at=timezone.now())
+    logger.info(f"Job {name} succeeded in {time.monotonic() - started:.1f}s")
+    return True
+
+
+def requeue_abandoned(now=None):
+    """
+    Return running jobs whose worker has not reported for JOB_LEASE_SECONDS,
+    e.g. after a crash or a redeploy, to the queue, or fail them once they
+    are out of attempts
+    """
+    now = now or timezone.now()
+    abandoned = Job.objects.filter(
+        status=Job.STATUS_RUNNING, heartbeat_at__lt=now - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    )
+    # Only read in the common case, keeping idle workers off the write lock
+    if not abandoned.exists():
+        return 0
+    abandoned.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.STATUS_FAILED, error='Worker stopped responding', finished_at=now
+    )
+    requeued = abandoned.update(status=Job.STATUS_QUEUED, worker='', run_after=now)
+    if requeued:
+        logger.warning(f"Requeued {requeued} abandoned jobs")
+    return requeued
+
+
+def prune_jobs(now=None):
+    """Delete jobs that finished more than JOB_RETENTION_DAYS ago"""
+    now = now or timezone.now()
+    deleted, _ = Job.objects.filter(
+        status__in=(Job.STATUS_SUCCEEDED, Job.STATUS_FAILED),
+        finished_at__lt=now - timedelta(days=settings.JOB_RETENTION_DAYS),
+    ).delete()
+    return deleted
+
+
+def work(burst=False, poll_interval=None, max_jobs=None, stop=None):
+    """
+    Claim and run jobs one at a time until ``stop`` (a threading.Event) is
+    set or ``max_jobs`` have run. With ``burst`` return as soon as no job is
+    due; otherwise poll every ``poll_interval`` seconds (JOB_POLL_INTERVAL).
+    Returns the number of jobs run.
+    """
+    poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    stop = stop or threading.Event()
+    worker = worker_name()
+    pruned_at = -PRUNE_INTERVAL
+    done = 0
+    while not stop.is_set() and (max_jobs is None or done < max_jobs):
+        if time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+            prune_jobs()
+            pruned_at = time.monotonic()
+        requeue_abandoned()
+        claimed = claim_job(worker)
+        if claimed is None:
+            if burst:
+                break
+            stop.wait(poll_interval)
+            continue
+        run_job(claimed)
+        done += 1
+    return done
+
+
+_embedded = None
+_embedded_lock = threading.Lock()
+
+
+def start_embedded_worker():
+    """
+    Drain the queue on a daemon thread of this process unless one is
+    already doing so. Used with JOB_EMBEDDED_WORKER where no separate
+    `run_worker` process can run; the request still returns at once.
+    """
+    global _embedded
+    with _embedded_lock:
+        if _embedded is None:
+            _embedded = threading.Thread(target=_drain, name='job-worker', daemon=True)
+            _embedded.start()
+
+
+def _drain():
+    global _embedded
+    try:
+        while True:
+            work(burst=True)
+            with _embedded_lock:
+                # Jobs queued after the last claim would otherwise wait for
+                # the next enqueue
+                if not Job.objects.filter(status=Job.STATUS_QUEUED, run_after__lte=timezone.now()).exists():
+                    _embedded = None
+                    return
+    except Exception as e:
+        logger.error(f"Embedded job worker stopped: {e}")
+        with _embedded_lock:
+            _embedded = None
+    finally:
+        connections.close_all()
+
+
+def job_status(queued):
+    """JSON-serializable view of a job for the status endpoint"""
+    return {
+        'id': queued.pk,
+        'kind': queued.kind,
+        'status': queued.status,
+        'finished': queued.is_finished,
+        'progress': queued.progress,
+        'result': queued.result,
+        'error': queued.error,
+        'attempts': queued.attempts,
+        'created_at': queued.created_at.isoformat(),
+        'started_at': queued.started_at.isoformat() if queued.started_at else None,
+        'finished_at': queued.finished_at.isoformat() if queued.finished_at else None,
+    }
@@ -0,0 +1,117 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import FetchLedger
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY = {
+    'recent_days': 3,
+    'ttl_hours': 6,
+    'negative_ttl_minutes': 15,
+}
+
+
+def get_policy(source):
+    """
+    Return the re-fetch policy for a source.
+
+    Days within ``recent_days`` of the moment they were fetched may still be
+    revised by NASA, so they are considered stale once their ledger entry is
+    older than ``ttl_hours``. Older days are fetched once and then kept.
+    A failed fetch is remembered for ``negative_ttl_minutes`` before the
+    same window is requested again.
+    """
+    policies = getattr(settings, 'FETCH_LEDGER_POLICY', {})
+    policy = dict(DEFAULT_POLICY)
+    policy.update(policies.get('default', {}))
+    policy.update(policies.get(source, {}))
+    return policy
+
+
+def _is_fresh(fetched_at, day, now, policy):
+    if (fetched_at.date() - day).days > policy['recent_days']:
+        return True
+    return now - fetched_at < timedelta(hours=policy['ttl_hours'])
+
+
+def _failed_recently(fetched_at, now, policy):
+    return now - fetched_at < timedelta(minutes=policy['negative_ttl_minutes'])
+
+
+def plan_windows(source, start_date, end_date, max_days, now=None):
+    """
+    Return the (start, end) windows within the inclusive span that still
+    need to be requested from ``source``: days never fetched successfully
+    or whose ledger entry is stale, except days whose fetch failed within
+    the negative-cache TTL. Contiguous missing days are merged and
+    split into windows of at most ``max_days`` days.
+    """
+    now = now or timezone.now()
+    policy = get_policy(source)
+    
+    entries = FetchLedger.objects.filter(
+        source=source,
+        start_date__lte=end_date,
+        end_date__gte=start_date,
+    ).values_list('start_date', 'end_date', 'fetched_at', 'status')
+    
+    fresh_days = set()
+    for entry_start, entry_end, fetched_at, status in entries:
+        day = max(entry_start, start_date)
+        while day <= min(entry_end, end_date):
+            if status == FetchLedger.STATUS_SUCCESS:
+                fresh = _is_fresh(fetched_at, day, now, policy)
+            else:
+                fresh = _failed_recently(fetched_at, now, policy)
+            if fresh:
+                fresh_days.add(day)
+            day += timedelta(days=1)
+    
+    windows = []
+    window_start = None
+    day = start_date
+    while day <= end_date + timedelta(days=1):
+        missing = day <= end_date and day not in fresh_days
+        if missing and window_start is None:
+            window_start = day
+        if window_start is not None and (not missing or (day - window_start).days == max_days):
+            windows.append((window_start, day - timedelta(days=1)))
+            window_start = day if missing else None
+        day += timedelta(days=1)
+    
+    return windows
+
+
+def recent_failure(source, start_date, end_date, now=None):
+    """
+    Return the ledger entry of a fetch of exactly this window that failed
+    within the negative-cache TTL, or None
+    """
+    now = now or timezone.now()
+    policy = get_policy(source)
+    return FetchLedger.objects.filter(
+        source=source,
+        start_date=start_date,
+        end_date=end_date,
+        status=FetchLedger.STATUS_ERROR,
+        fetched_at__gt=now - timedelta(minutes=policy['negative_ttl_minutes']),
+    ).first()
+
+
+def record_fetch(source, start_date, end_date, records=0, error=None):
+    """
+    Store the outcome of fetching one window, replacing any earlier entry
+    """
+    FetchLedger.objects.update_or_create(
+        source=source,
+        start_date=start_date,
+        end_date=end_date,
+        defaults={
+            'fetched_at': timezone.now(),
+            'status': FetchLedger.STATUS_ERROR if error else FetchLedger.STATUS_SUCCESS,
+            'records': records,
+            'error': str(error) if error else '',
+        }
+    )
@@ -0,0 +1,81 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+
+from asteroids.services import AsteroidService
+from core.cache import cache_stats
+from core.charts import chart_cache
+from core.sample_payloads import make_donki_flares, make_neows_feed
+from solarflares.services import SolarFlareService
+
+PAGES = ['/asteroids/', '/solar-flares/']
+
+
+class Command(BaseCommand):
+    help = 'Measure dashboard latency with cold and warm chart and data caches on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--records',
+            type=int,
+            default=2000,
+            help='Approaches and flares to seed (default: 2000)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=20,
+            help='Requests per page and cache state (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self._seed(options['records'])
+            client = Client()
+            self.stdout.write(self.style.SUCCESS(
+                f"{'page':<16} {'cold median':>12} {'warm median':>12} {'speedup':>8}"
+            ))
+            for page in PAGES:
+                cold = self._time(client, page, options['requests'], clear=True)
+                warm = self._time(client, page, options['requests'], clear=False)
+                self.stdout.write(
+                    f'{page:<16} {cold * 1000:>10.1f}ms {warm * 1000:>10.1f}ms {cold / warm:>7.1f}x'
+                )
+            self.stdout.write(f'Chart cache: {chart_cache.hits} hits, {chart_cache.misses} misses')
+            for namespace, counts in cache_stats.snapshot().items():
+                self.stdout.write(f"Data cache {namespace}: {counts['hits']} hits, {counts['misses']} misses")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _seed(self, records):
+        """Load synthetic approaches and flares around today"""
+        today = timezone.now().date()
+        feed = make_neows_feed(records, start_date=today - timedelta(days=3))
+        AsteroidService(api_key='BENCHMARK').ingest_feed(feed)
+        SolarFlareService(api_key='BENCHMARK').ingest_flares(
+            make_donki_flares(records, start_date=today - timedelta(days=records // 24))
+        )
+
+    def _time(self, client, page, count, clear):
+        """Median seconds per request, optionally clearing the caches before each"""
+        client.get(page)  # Warm imports and template loading
+        timings = []
+        for _ in range(count):
+            if clear:
+                chart_cache.clear()
+                cache.clear()
+            started = time.perf_counter()
+            response = client.get(page)
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.status_code
+        return statistics.median(timings)
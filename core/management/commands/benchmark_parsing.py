@@ -0,0 +1,118 @@
+import glob
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from asteroids.models import Asteroid, CloseApproach
+from asteroids.services import FEED_OBJECTS_PATH, AsteroidService
+from core.sample_payloads import make_donki_flares, make_neows_feed
+from core.streaming import batched, iter_file_chunks, iter_json_items
+from solarflares.models import SolarFlare
+from solarflares.services import BULK_BATCH_SIZE, SolarFlareService
+
+DEFAULT_SIZES = [1000, 5000, 20000, 50000]
+
+
+class Command(BaseCommand):
+    help = 'Compare peak memory of whole-body vs streaming parsing of NeoWs and DONKI payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=DEFAULT_SIZES,
+            help='Records per generated fixture payload (default: 1000 5000 20000 50000)'
+        )
+        parser.add_argument(
+            '--fixtures-dir',
+            help='Directory of recorded NeoWs/DONKI responses (*.json) to use instead of generated ones'
+        )
+
+    def handle(self, *args, **options):
+        self.asteroid_service = AsteroidService(api_key='BENCHMARK')
+        self.flare_service = SolarFlareService(api_key='BENCHMARK')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            if options['fixtures_dir']:
+                paths = sorted(glob.glob(os.path.join(options['fixtures_dir'], '*.json')), key=os.path.getsize)
+            else:
+                paths = self._write_fixtures(tmp_dir, options['sizes'])
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{'payload':<24} {'size':>9}  {'eager peak':>11} {'eager time':>11}  "
+                f"{'stream peak':>11} {'stream time':>11}"
+            ))
+            for path in paths:
+                with open(path, 'rb') as f:
+                    is_feed = f.read(1) == b'{'
+                eager = self._measure(self._parse_eager, path, is_feed)
+                streamed = self._measure(self._parse_streaming, path, is_feed)
+                self.stdout.write(
+                    f"{os.path.basename(path):<24} {os.path.getsize(path) / 1e6:>7.1f}MB  "
+                    f"{eager[0] / 1e6:>9.1f}MB {eager[1] * 1000:>9.0f}ms  "
+                    f"{streamed[0] / 1e6:>9.1f}MB {streamed[1] * 1000:>9.0f}ms"
+                )
+
+    def _write_fixtures(self, tmp_dir, sizes):
+        paths = []
+        for size in sizes:
+            for name, payload in ((f'neows_{size}.json', make_neows_feed(size)),
+                                  (f'donki_{size}.json', make_donki_flares(size))):
+                path = os.path.join(tmp_dir, name)
+                with open(path, 'w') as f:
+                    json.dump(payload, f)
+                paths.append(path)
+        return paths
+
+    def _measure(self, parse, path, is_feed):
+        """
+        Return (peak traced bytes, seconds) for parsing ``path``; timing is
+        taken on a separate untraced run since tracemalloc slows Python down
+        """
+        started = time.perf_counter()
+        with open(path, 'rb') as f:
+            parse(f, is_feed)
+        elapsed = time.perf_counter() - started
+
+        tracemalloc.start()
+        with open(path, 'rb') as f:
+            parse(f, is_feed)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak, elapsed
+
+    def _parse_eager(self, f, is_feed):
+        """Previous behaviour: decode the whole body, then build every instance"""
+        data = json.load(f)
+        if is_feed:
+            instances = []
+            for objects in data.get('near_earth_objects', {}).values():
+                for asteroid_data in objects:
+                    instances.append(Asteroid(**self.asteroid_service._asteroid_row(asteroid_data)))
+                    for approach_data in asteroid_data.get('close_approach_data', []):
+                        instances.append(CloseApproach(**self.asteroid_service._approach_row(approach_data)))
+        else:
+            instances = [SolarFlare(**self.flare_service._flare_row(flare)) for flare in data]
+        return len(instances)
+
+    def _parse_streaming(self, f, is_feed):
+        """Streaming mode: one record at a time, instances built per batch"""
+        count = 0
+        if is_feed:
+            records = iter_json_items(iter_file_chunks(f), FEED_OBJECTS_PATH)
+            for batch in batched(records, BULK_BATCH_SIZE):
+                instances = []
+                for asteroid_data in batch:
+                    instances.append(Asteroid(**self.asteroid_service._asteroid_row(asteroid_data)))
+                    for approach_data in asteroid_data.get('close_approach_data', []):
+                        instances.append(CloseApproach(**self.asteroid_service._approach_row(approach_data)))
+                count += len(instances)
+        else:
+            for batch in batched(iter_json_items(iter_file_chunks(f)), BULK_BATCH_SIZE):
+                count += len([SolarFlare(**self.flare_service._flare_row(flare)) for flare in batch])
+        return count
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from asteroids import rollups as asteroid_rollups
+from solarflares import rollups as flare_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the dashboard rollup tables from the raw asteroid and solar flare data'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Rebuilding dashboard rollups...'))
+        
+        days = asteroid_rollups.rebuild_rollups()
+        self.stdout.write(f'  - Close approaches: {days} days')
+        
+        rows = flare_rollups.rebuild_rollups()
+        self.stdout.write(f'  - Solar flares: {rows} day/class rows')
+        
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt rollups'))
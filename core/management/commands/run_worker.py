@@ -0,0 +1,53 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.jobs import work, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs, such as the refreshes requested from the dashboards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no job is due instead of waiting for more'
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            help='Exit after running this many jobs'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help=f'Seconds between checks of an empty queue (default: {settings.JOB_POLL_INTERVAL})'
+        )
+
+    def handle(self, *args, **options):
+        if options['max_jobs'] is not None and options['max_jobs'] < 1:
+            raise CommandError('--max-jobs must be at least 1')
+        if options['poll_interval'] <= 0:
+            raise CommandError('--poll-interval must be positive')
+
+        # SIGTERM (e.g. a redeploy) lets the current job finish first
+        stop = threading.Event()
+        handlers = {signum: signal.signal(signum, lambda *args: stop.set()) for signum in (signal.SIGTERM, signal.SIGINT)}
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker_name()} waiting for jobs...'))
+
+        try:
+            done = work(
+                burst=options['burst'],
+                poll_interval=options['poll_interval'],
+                max_jobs=options['max_jobs'],
+                stop=stop,
+            )
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker_name()} stopped after {done} jobs'))
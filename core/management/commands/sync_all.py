@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import FetchLedger
+from core.sync import nasa_sources, sync_all
+
+
+class Command(BaseCommand):
+    help = 'Fetch APOD, solar flare and asteroid data from NASA concurrently'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apod-days',
+            type=int,
+            default=7,
+            help='Number of past days of APOD to fetch (default: 7)'
+        )
+        parser.add_argument(
+            '--flare-days',
+            type=int,
+            default=30,
+            help='Number of past days of solar flares to fetch (default: 30)'
+        )
+        parser.add_argument(
+            '--asteroid-days',
+            type=int,
+            default=7,
+            help='Number of days of asteroid approaches to fetch starting today (default: 7)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            action='append',
+            default=[],
+            metavar='SOURCE=N',
+            help='Concurrent downloads for one source, e.g. neows=8 (default: SYNC_CONCURRENCY)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Fetch every window again, even if the fetch ledger has it'
+        )
+
+    def handle(self, *args, **options):
+        for name in ('apod_days', 'flare_days', 'asteroid_days'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+        
+        sources = dict(FetchLedger.SOURCE_CHOICES)
+        concurrency = {}
+        for value in options['concurrency']:
+            source, _, limit = value.partition('=')
+            if source not in sources or not limit.isdigit() or int(limit) < 1:
+                raise CommandError(f"Invalid --concurrency '{value}'; use one of {', '.join(sources)}=N")
+            concurrency[source] = int(limit)
+        
+        self.stdout.write(self.style.SUCCESS('Starting to sync all NASA sources...'))
+        
+        def on_window_done(source, window, records, error):
+            outcome = f'failed: {error}' if error else f'{records} new records'
+            self.stdout.write(f"  - {sources[source]} {window[0]} to {window[1]}: {outcome}")
+        
+        stats = sync_all(
+            nasa_sources(
+                apod_days=options['apod_days'],
+                flare_days=options['flare_days'],
+                asteroid_days=options['asteroid_days'],
+                force=options['force'],
+                concurrency=concurrency,
+            ),
+            on_window_done=on_window_done,
+        )
+        
+        for source, result in stats['sources'].items():
+            self.stdout.write(
+                f"  {sources[source]}: {result['windows']} windows stored, {result['failed']} failed, "
+                f"{result['records']} new records, done after {result['seconds']:.1f}s"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Successfully synced all sources in {stats['seconds']:.1f}s"))
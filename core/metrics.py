@@ -0,0 +1,236 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Timed parts of a request besides the database, in Server-Timing order
+PARTS = ('template', 'chart', 'http')
+
+# Other methods are counted as "other", so clients cannot add label values
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Where the time of one request went: database queries and the sections
+    timed with ``timed()``. Parts may overlap, e.g. queries run while a
+    chart is built count toward both.
+    """
+
+    def __init__(self):
+        self.db_queries = 0
+        self.seconds = dict.fromkeys(('db',) + PARTS, 0.0)
+
+    def add(self, part, seconds):
+        self.seconds[part] += seconds
+
+    def execute(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing every query"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.seconds['db'] += time.perf_counter() - started
+
+    def server_timing(self, total):
+        """Server-Timing header value, in milliseconds"""
+        entries = [f'db;dur={self.seconds["db"] * 1000:.1f};desc="{self.db_queries} queries"']
+        entries += [f'{part};dur={self.seconds[part] * 1000:.1f}' for part in PARTS]
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def add_time(part, seconds):
+    """Add ``seconds`` to ``part`` of the current request, if any"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(part, seconds)
+
+
+@contextmanager
+def timed(part):
+    """Count the time spent in the block toward ``part`` of the current request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(part, time.perf_counter() - started)
+
+
+class ViewMetrics:
+    """
+    Latency histogram, status codes and summed request timings per view and
+    method for this process
+    """
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view, method, status, seconds, timings):
+        with self._lock:
+            stats = self._views.get((view, method))
+            if stats is None:
+                stats = self._views[(view, method)] = {
+                    'buckets': [0] * len(LATENCY_BUCKETS), 'count': 0, 'sum': 0.0, 'statuses': {},
+                    'db_queries': 0, 'seconds': dict.fromkeys(timings.seconds, 0.0),
+                }
+            bucket = bisect_left(LATENCY_BUCKETS, seconds)
+            if bucket < len(LATENCY_BUCKETS):
+                stats['buckets'][bucket] += 1
+            stats['count'] += 1
+            stats['sum'] += seconds
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            stats['db_queries'] += timings.db_queries
+            for part, part_seconds in timings.seconds.items():
+                stats['seconds'][part] += part_seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {**stats, 'buckets': list(stats['buckets']), 'statuses': dict(stats['statuses']),
+                      'seconds': dict(stats['seconds'])}
+                for key, stats in sorted(self._views.items())
+            }
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+view_metrics = ViewMetrics()
+
+
+class RequestMetricsMiddleware:
+    """
+    Time every request and record it in ``view_metrics`` under its URL name.
+
+    Database queries are counted through an execute wrapper; template
+    rendering, chart building and NASA calls report their time with
+    ``timed()`` / ``add_time()``. With SERVER_TIMING the breakdown is also
+    sent in a ``Server-Timing`` header, which browser dev tools display.
+    Streamed bodies (exports) are timed to their first byte.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(timings.execute))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        seconds = time.perf_counter() - started
+
+        match = request.resolver_match
+        view_metrics.record(
+            match.view_name if match else 'unresolved',
+            request.method if request.method in METHODS else 'other',
+            response.status_code, seconds, timings,
+        )
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing(seconds)
+        return response
+
+
+class TimedTemplate:
+    """Template of TimedDjangoTemplates, timing its rendering"""
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return self._template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template engine, counting the time spent rendering pages
+    toward the current request's template time
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def _label_value(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def metric_lines(name, kind, help_text, samples):
+    """
+    Lines of one metric family in the Prometheus text format. ``samples``
+    are ``(suffix, labels, value)`` tuples, e.g. ``('_bucket', {'le': '1'}, 3)``.
+    """
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for suffix, labels, value in samples:
+        label_text = ','.join(f'{key}="{_label_value(label)}"' for key, label in labels.items())
+        if label_text:
+            label_text = f'{{{label_text}}}'
+        # Counts stay exact integers; repr() keeps every digit of a float
+        lines.append(f'{name}{suffix}{label_text} {value if isinstance(value, int) else repr(float(value))}')
+    return lines
+
+
+def request_metric_lines():
+    """The request metrics of this process in the Prometheus text format"""
+    views = view_metrics.snapshot()
+    latency, statuses, queries = [], [], []
+    seconds = {part: [] for part in ('db',) + PARTS}
+    for (view, method), stats in views.items():
+        labels = {'view': view, 'method': method}
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+            cumulative += count
+            latency.append(('_bucket', {**labels, 'le': f'{bound:g}'}, cumulative))
+        latency.append(('_bucket', {**labels, 'le': '+Inf'}, stats['count']))
+        latency.append(('_sum', labels, stats['sum']))
+        latency.append(('_count', labels, stats['count']))
+        for status, count in sorted(stats['statuses'].items()):
+            statuses.append(('', {**labels, 'status': status}, count))
+        queries.append(('', labels, stats['db_queries']))
+        for part, part_seconds in stats['seconds'].items():
+            seconds[part].append(('', labels, part_seconds))
+
+    return (
+        metric_lines('django_http_request_duration_seconds', 'histogram',
+                     'Time to the response headers per view', latency)
+        + metric_lines('django_http_requests_total', 'counter', 'Requests per view and status', statuses)
+        + metric_lines('django_http_request_db_queries_total', 'counter', 'Database queries run by requests', queries)
+        + metric_lines('django_http_request_db_seconds_total', 'counter',
+                       'Seconds requests spent in database queries', seconds['db'])
+        + metric_lines('django_http_request_template_seconds_total', 'counter',
+                       'Seconds requests spent rendering templates', seconds['template'])
+        + metric_lines('django_http_request_chart_seconds_total', 'counter',
+                       'Seconds requests spent building Plotly charts', seconds['chart'])
+        + metric_lines('django_http_request_outbound_http_seconds_total', 'counter',
+                       'Seconds requests spent waiting on NASA responses', seconds['http'])
+    )
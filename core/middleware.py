@@ -0,0 +1,37 @@
+import os
+
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class MediaWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise serving MEDIA_ROOT at MEDIA_URL next to the static files.
+
+    Media files are written while the site runs, so a media URL that is not
+    known yet is looked up on disk and added on first request. Their names
+    are content hashes that never change, so they are cached for good.
+    """
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        self.media_root = os.path.abspath(settings.MEDIA_ROOT).rstrip(os.path.sep) + os.path.sep
+        self.media_prefix = settings.MEDIA_URL
+        os.makedirs(self.media_root, exist_ok=True)
+        self.add_files(self.media_root, prefix=self.media_prefix)
+
+    def __call__(self, request):
+        path = request.path_info
+        if not self.autorefresh and path.startswith(self.media_prefix) and path not in self.files:
+            self.add_media_file(path)
+        return super().__call__(request)
+
+    def add_media_file(self, url):
+        path = os.path.join(self.media_root, url[len(self.media_prefix):])
+        if self.url_is_canonical(url) and self.path_is_child_of(path, self.media_root) and os.path.isfile(path):
+            self.add_file_to_dictionary(url, path)
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(self.media_prefix):
+            return True
+        return super().immutable_file_test(path, url)
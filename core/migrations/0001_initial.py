@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FetchLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('apod', 'APOD'), ('donki_flr', 'DONKI Solar Flares'), ('neows', 'NeoWs Asteroids')], max_length=20)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('fetched_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('success', 'Success'), ('error', 'Error')], max_length=10)),
+                ('records', models.IntegerField(default=0, help_text='Number of records returned by NASA')),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Fetch Ledger Entry',
+                'verbose_name_plural': 'Fetch Ledger',
+                'ordering': ['-fetched_at'],
+                'indexes': [models.Index(fields=['source', 'end_date'], name='core_fetchl_source_b34ee0_idx')],
+                'unique_together': {('source', 'start_date', 'end_date')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('apod', 'APOD'), ('donki_flr', 'DONKI Solar Flares'), ('neows', 'NeoWs Asteroids')], max_length=20)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('status', models.CharField(choices=[('success', 'Success'), ('error', 'Error'), ('skipped', 'Skipped (circuit open)')], max_length=10)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('http_seconds', models.FloatField(default=0, help_text='Waiting on NASA, body download included')),
+                ('bytes_received', models.PositiveBigIntegerField(default=0)),
+                ('parse_seconds', models.FloatField(default=0, help_text='Decoding and normalizing records')),
+                ('db_seconds', models.FloatField(default=0, help_text='Database queries while storing')),
+                ('inserted', models.PositiveIntegerField(default=0)),
+                ('updated', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0, help_text='Records already stored or dropped')),
+                ('error', models.TextField(blank=True, help_text='Why the fetch failed')),
+                ('record_errors', models.JSONField(blank=True, default=list, help_text='Sample of dropped records')),
+                ('record_error_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Ingest Run',
+                'verbose_name_plural': 'Ingest Runs',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['source', 'started_at'], name='core_ingest_source_361028_idx')],
+            },
+        ),
+    ]
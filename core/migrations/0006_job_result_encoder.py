@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:10
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_ingestrun'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='result',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+    ]
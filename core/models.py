@@ -0,0 +1,203 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class FetchLedger(models.Model):
+    """
+    Record of which date window was fetched from which NASA source, when,
+    and with what result. Used to skip windows that are already ingested.
+    """
+    SOURCE_APOD = 'apod'
+    SOURCE_DONKI_FLR = 'donki_flr'
+    SOURCE_NEOWS = 'neows'
+    SOURCE_CHOICES = [
+        (SOURCE_APOD, 'APOD'),
+        (SOURCE_DONKI_FLR, 'DONKI Solar Flares'),
+        (SOURCE_NEOWS, 'NeoWs Asteroids'),
+    ]
+
+    STATUS_SUCCESS = 'success'
+    STATUS_ERROR = 'error'
+    STATUS_CHOICES = [
+        (STATUS_SUCCESS, 'Success'),
+        (STATUS_ERROR, 'Error'),
+    ]
+
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    fetched_at = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    records = models.IntegerField(default=0, help_text="Number of records returned by NASA")
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-fetched_at']
+        verbose_name = "Fetch Ledger Entry"
+        verbose_name_plural = "Fetch Ledger"
+        unique_together = ['source', 'start_date', 'end_date']
+        indexes = [
+            models.Index(fields=['source', 'end_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_source_display()} {self.start_date} to {self.end_date} ({self.status})"
+
+
+class DataVersion(models.Model):
+    """
+    Per-source counter bumped by every ingest that changed stored data.
+    Caches include it in their keys so entries built from older data are
+    never served again.
+    """
+    source = models.CharField(max_length=20, choices=FetchLedger.SOURCE_CHOICES, unique=True)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['source']
+        verbose_name = "Data Version"
+        verbose_name_plural = "Data Versions"
+
+    def __str__(self):
+        return f"{self.get_source_display()} v{self.version}"
+
+
+class CircuitBreaker(models.Model):
+    """
+    Health of one NASA source as seen by every worker process. After
+    repeated failures the breaker opens and requests to the source are
+    refused without waiting on NASA until a cooldown has passed.
+    """
+    STATE_CLOSED = 'closed'
+    STATE_OPEN = 'open'
+    STATE_HALF_OPEN = 'half_open'
+    STATE_CHOICES = [
+        (STATE_CLOSED, 'Closed'),
+        (STATE_OPEN, 'Open'),
+        (STATE_HALF_OPEN, 'Half-open'),
+    ]
+
+    source = models.CharField(max_length=20, choices=FetchLedger.SOURCE_CHOICES, unique=True)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=STATE_CLOSED)
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    state_changed_at = models.DateTimeField()
+    last_failure_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['source']
+        verbose_name = "Circuit Breaker"
+        verbose_name_plural = "Circuit Breakers"
+
+    def __str__(self):
+        return f"{self.get_source_display()} ({self.get_state_display()})"
+
+
+class Job(models.Model):
+    """
+    Background job in the database-backed queue (core.jobs). Workers claim
+    queued jobs with a conditional UPDATE, so any number of `run_worker`
+    processes on any host can share the queue.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.CharField(max_length=200, blank=True, help_text="Latest progress message from the job")
+    # Handlers may return dates, e.g. the failed windows of a NeoWs refresh
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    run_after = models.DateTimeField(help_text="Not claimed before this time; set when retrying")
+    worker = models.CharField(max_length=100, blank=True, help_text="host:pid of the worker running the job")
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['kind', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        """Check if the job has succeeded or failed for good"""
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
+
+class IngestRun(models.Model):
+    """
+    One fetch of a NASA source window (core.ingest): where its time went,
+    how many records it brought and a sample of the records it dropped.
+    """
+    STATUS_SUCCESS = 'success'
+    STATUS_ERROR = 'error'
+    STATUS_SKIPPED = 'skipped'
+    STATUS_CHOICES = [
+        (STATUS_SUCCESS, 'Success'),
+        (STATUS_ERROR, 'Error'),
+        (STATUS_SKIPPED, 'Skipped (circuit open)'),
+    ]
+
+    source = models.CharField(max_length=20, choices=FetchLedger.SOURCE_CHOICES)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    http_seconds = models.FloatField(default=0, help_text="Waiting on NASA, body download included")
+    bytes_received = models.PositiveBigIntegerField(default=0)
+    parse_seconds = models.FloatField(default=0, help_text="Decoding and normalizing records")
+    db_seconds = models.FloatField(default=0, help_text="Database queries while storing")
+    inserted = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0, help_text="Records already stored or dropped")
+    error = models.TextField(blank=True, help_text="Why the fetch failed")
+    record_errors = models.JSONField(default=list, blank=True, help_text="Sample of dropped records")
+    record_error_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = "Ingest Run"
+        verbose_name_plural = "Ingest Runs"
+        indexes = [
+            models.Index(fields=['source', 'started_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_source_display()} {self.start_date} to {self.end_date} ({self.status})"
+
+    @property
+    def records(self):
+        """Records NASA sent: inserted, updated and skipped"""
+        return self.inserted + self.updated + self.skipped
+
+    @property
+    def busy_seconds(self):
+        """Time spent on HTTP, parsing and the database"""
+        return self.http_seconds + self.parse_seconds + self.db_seconds
+
+    @property
+    def records_per_second(self):
+        """Throughput of the run, or None before any time was spent"""
+        return self.records / self.busy_seconds if self.busy_seconds else None
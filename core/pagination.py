@@ -0,0 +1,129 @@
+from datetime import date
+
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'core.pagination.cursor'
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset with opaque cursors to its
+    neighbours
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _split_ordering(ordering):
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def _encode_cursor(obj, keys, direction):
+    values = [getattr(obj, name) for name, _ in keys]
+    values = [value.isoformat() if isinstance(value, date) else value for value in values]
+    return signing.dumps([direction, values], salt=CURSOR_SALT)
+
+
+def _decode_cursor(cursor, model, keys):
+    """
+    Return ``(direction, values)`` for a cursor, or None if it is missing,
+    tampered with or does not match the ordering
+    """
+    if not cursor:
+        return None
+    try:
+        direction, values = signing.loads(cursor, salt=CURSOR_SALT)
+        if direction not in ('next', 'prev') or len(values) != len(keys):
+            return None
+        fields = [model._meta.get_field(name) for name, _ in keys]
+        return direction, [field.to_python(value) for field, value in zip(fields, values)]
+    except (signing.BadSignature, ValueError, TypeError, LookupError):
+        return None
+
+
+def _after(keys, values):
+    """
+    Build the filter selecting rows strictly after ``values`` in the order
+    given by ``keys``.
+
+    The leading key also gets a plain inclusive bound so the database can
+    start an index range scan at the cursor instead of walking every
+    earlier row.
+    """
+    (first, first_desc), first_value = keys[0], values[0]
+    condition = Q()
+    for position in range(len(keys) - 1, -1, -1):
+        name, descending = keys[position]
+        step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[position]})
+        if position < len(keys) - 1:
+            step |= Q(**{name: values[position]}) & condition
+        condition = step
+    return Q(**{f"{first}__{'lte' if first_desc else 'gte'}": first_value}) & condition
+
+
+def seek(queryset, ordering, values, backwards=False):
+    """
+    Return ``queryset`` restricted to the rows after ``values`` (before them
+    when ``backwards``) in ``ordering``, sorted away from that position
+    """
+    keys = _split_ordering(ordering)
+    if backwards:
+        keys = [(name, not descending) for name, descending in keys]
+    return queryset.filter(_after(keys, values)).order_by(
+        *(f'-{name}' if descending else name for name, descending in keys)
+    )
+
+
+def paginate_keyset(queryset, cursor=None, ordering=('-id',), per_page=50):
+    """
+    Return a KeysetPage of ``queryset`` sorted by ``ordering``.
+
+    ``ordering`` must end with a unique tiebreaker (normally ``id``) so every
+    row has a distinct position. Each page costs one query of ``per_page + 1``
+    rows no matter how deep it is, unlike OFFSET pagination. Invalid cursors
+    fall back to the first page.
+    """
+    keys = _split_ordering(ordering)
+    decoded = _decode_cursor(cursor, queryset.model, keys)
+    backwards = decoded is not None and decoded[0] == 'prev'
+
+    if decoded is None:
+        rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    else:
+        rows = list(seek(queryset, ordering, decoded[1], backwards)[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage([])
+
+    if backwards:
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, decoded is not None
+
+    return KeysetPage(
+        rows,
+        next_cursor=_encode_cursor(rows[-1], keys, 'next') if has_next else None,
+        previous_cursor=_encode_cursor(rows[0], keys, 'prev') if has_previous else None,
+    )
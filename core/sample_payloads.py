@@ -0,0 +1,140 @@
+import random
+from datetime import date, datetime, timedelta
+
+
+def make_neows_feed(count, start_date=None, seed=0):
+    """
+    Build a synthetic NeoWs /feed payload with ``count`` objects spread
+    over a 7-day window, shaped like the real API response.
+    """
+    rng = random.Random(seed)
+    start_date = start_date or date(2024, 1, 1)
+    near_earth_objects = {}
+
+    for i in range(count):
+        day = start_date + timedelta(days=i % 7)
+        approach_time = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randrange(1440))
+        miss_km = rng.uniform(1e5, 7.5e7)
+        velocity = rng.uniform(1, 40)
+        near_earth_objects.setdefault(day.strftime('%Y-%m-%d'), []).append({
+            'neo_reference_id': str(2000000 + i),
+            'name': f'({2000 + i % 25} {chr(65 + i % 26)}{chr(65 + (i // 26) % 26)}{i})',
+            'nasa_jpl_url': f'https://ssd.jpl.nasa.gov/tools/sbdb_lookup.html#/?sstr={2000000 + i}',
+            'absolute_magnitude_h': round(rng.uniform(15, 30), 2),
+            'estimated_diameter': {
+                'kilometers': {
+                    'estimated_diameter_min': rng.uniform(0.001, 1),
+                    'estimated_diameter_max': rng.uniform(1, 3),
+                },
+            },
+            'is_potentially_hazardous_asteroid': rng.random() < 0.1,
+            'is_sentry_object': rng.random() < 0.02,
+            'close_approach_data': [{
+                'close_approach_date': day.strftime('%Y-%m-%d'),
+                'close_approach_date_full': approach_time.strftime('%Y-%b-%d %H:%M'),
+                'relative_velocity': {
+                    'kilometers_per_second': str(velocity),
+                    'kilometers_per_hour': str(velocity * 3600),
+                },
+                'miss_distance': {
+                    'astronomical': str(miss_km / 149597870.7),
+                    'lunar': str(miss_km / 384400),
+                    'kilometers': str(miss_km),
+                },
+                'orbiting_body': 'Earth',
+            }],
+        })
+
+    return {
+        'element_count': count,
+        'near_earth_objects': near_earth_objects,
+    }
+
+
+def make_donki_flares(count, start_date=None, seed=0):
+    """
+    Build a synthetic DONKI /FLR payload with ``count`` flares, one every
+    hour from ``start_date``, shaped like the real API response.
+    """
+    rng = random.Random(seed)
+    start = datetime.combine(start_date or date(2024, 1, 1), datetime.min.time())
+    flares = []
+
+    for i in range(count):
+        begin = start + timedelta(hours=i)
+        peak = begin + timedelta(minutes=rng.randrange(5, 40))
+        end = peak + timedelta(minutes=rng.randrange(5, 90))
+        flare_class = rng.choice('ABCCCMMX')
+        flares.append({
+            'flrID': f"{peak.strftime('%Y-%m-%dT%H:%M:%S')}-FLR-{i:06d}",
+            'instruments': [{'displayName': 'GOES-P: EXIS 1.0-8.0'}],
+            'beginTime': begin.strftime('%Y-%m-%dT%H:%MZ'),
+            'peakTime': peak.strftime('%Y-%m-%dT%H:%MZ'),
+            'endTime': end.strftime('%Y-%m-%dT%H:%MZ'),
+            'classType': f'{flare_class}{rng.uniform(1, 9.9):.1f}',
+            'sourceLocation': f"S{rng.randrange(30):02d}W{rng.randrange(90):02d}",
+            'activeRegionNum': rng.randrange(13000, 14000),
+            'note': '',
+            'submissionTime': end.strftime('%Y-%m-%dT%H:%MZ'),
+            'versionId': 1,
+            'link': f'https://webtools.ccmc.gsfc.nasa.gov/DONKI/view/FLR/{i}/-1',
+            'linkedEvents': [{'activityID': f"{peak.strftime('%Y-%m-%dT%H:%M:%S')}-CME-001"}] if rng.random() < 0.2 else None,
+        })
+
+    return flares
+
+
+APOD_TOPICS = (
+    'galaxy nebula cluster comet planet moon eclipse aurora supernova remnant pulsar quasar '
+    'spiral elliptical hydrogen emission reflection Jupiter Saturn Mars Venus Mercury Andromeda '
+    'Orion Pleiades Hubble Webb meteor shower magnetic jet black hole infrared ultraviolet x-ray '
+    'radio mosaic filament shock expanding dwarf giant'
+).split()
+APOD_COMMON_WORDS = (
+    'the a of in and to with from by this that which is are was its near across toward beyond '
+    'image sky night light star bright faint years'
+).split()
+_SYLLABLES = 'ka lo mi ne ru sa te vo zi an el or ist ul ba de fi go hu'.split()
+
+
+def make_apod_entries(count, start_date=None, seed=0):
+    """
+    Build ``count`` synthetic APOD API entries, one per day from
+    ``start_date``, with explanations of realistic length. Each entry is
+    about one or two topics drawn from APOD_TOPICS and is otherwise filled
+    from common words and a large made-up lexicon, so topic words are about
+    as selective as in the real archive.
+    """
+    rng = random.Random(seed)
+    start_date = start_date or date(1995, 6, 16)
+    lexicon = sorted({
+        ''.join(rng.choice(_SYLLABLES) for _ in range(rng.randrange(2, 5))) for _ in range(8000)
+    })
+    entries = []
+
+    for i in range(count):
+        day = start_date + timedelta(days=i)
+        topics = rng.sample(APOD_TOPICS, rng.randrange(1, 3))
+        words = []
+        for _ in range(rng.randrange(100, 220)):
+            roll = rng.random()
+            if roll < 0.05:
+                words.append(rng.choice(topics))
+            elif roll < 0.45:
+                words.append(rng.choice(APOD_COMMON_WORDS))
+            else:
+                words.append(rng.choice(lexicon))
+        title = ' '.join(word.capitalize() for word in topics + rng.sample(lexicon, rng.randrange(1, 3)))
+        explanation = ' '.join(words) + '.'
+        is_video = rng.random() < 0.1
+        entries.append({
+            'date': day.strftime('%Y-%m-%d'),
+            'title': title,
+            'explanation': explanation[0].upper() + explanation[1:],
+            'media_type': 'video' if is_video else 'image',
+            'url': f'https://apod.nasa.gov/apod/image/{day.strftime("%y%m")}/sample{i}.jpg',
+            'hdurl': None if is_video else f'https://apod.nasa.gov/apod/image/{day.strftime("%y%m")}/sample{i}_big.jpg',
+            'service_version': 'v1',
+        })
+
+    return entries
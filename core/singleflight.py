@@ -0,0 +1,111 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are coordinated
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# How often a process waiting on another process's lock retries it
+LOCK_POLL_INTERVAL = 0.05
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised when waiting for another caller's fetch takes too long"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def _lock_path(key):
+    readable = re.sub(r'[^A-Za-z0-9_.-]+', '_', key)[:60]
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(settings.SINGLE_FLIGHT_LOCK_DIR, f'{readable}-{digest}.lock')
+
+
+class _ProcessLock:
+    """
+    Exclusive advisory lock on a per-key file, shared by every process on
+    the host. The OS releases it if the holder dies.
+    """
+
+    def __init__(self, key, timeout):
+        self.path = _lock_path(key)
+        self.timeout = timeout
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return self
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(self.fd)
+                    raise SingleFlightTimeout(f'Timed out waiting for lock {self.path}')
+                time.sleep(LOCK_POLL_INTERVAL)
+
+    def __exit__(self, *exc_info):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+
+
+def single_flight(key, fetch, timeout=None):
+    """
+    Run ``fetch()`` at most once at a time per ``key`` across threads and
+    processes and return its result.
+
+    Threads of one process that ask for a key already in flight wait for
+    the running call and receive its result (or its exception). Across
+    processes, a file lock makes the other callers wait until the running
+    fetch finishes, then run ``fetch`` themselves, so ``fetch`` must first
+    look for data stored meanwhile (the database or the fetch ledger) and
+    only call NASA when it is still missing.
+    """
+    timeout = settings.SINGLE_FLIGHT_TIMEOUT if timeout is None else timeout
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        logger.info(f"Waiting for in-flight fetch of {key}")
+        if not call.done.wait(timeout):
+            raise SingleFlightTimeout(f'Timed out waiting for in-flight fetch of {key}')
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        with _ProcessLock(key, timeout):
+            call.result = fetch()
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[key]
+        call.done.set()
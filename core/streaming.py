@@ -0,0 +1,136 @@
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+
+class _JSONStream:
+    """
+    Pull-style reader over an iterable of byte chunks.
+
+    Only the structure leading to the records is walked character by
+    character; every record (and every skipped value) is decoded with
+    ``json.JSONDecoder.raw_decode`` straight from the buffer, so at most one
+    record plus one chunk is held in memory at a time.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Append the next chunk to the buffer; return False at end of input"""
+        if self._eof:
+            return False
+        # Drop what has already been consumed before growing the buffer
+        if self._pos:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer += self._decoder.decode(chunk)
+                return True
+        self._buffer += self._decoder.decode(b'', final=True)
+        self._eof = True
+        return False
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON input')
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f'Expected {char!r} at offset {self._pos}, got {self._buffer[self._pos]!r}')
+        self._pos += 1
+
+    def value(self):
+        """Decode and consume the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number cut at the chunk boundary decodes "successfully", so
+            # only accept a value that is followed by more input
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def _iter_path(stream, path):
+    if not path:
+        stream.expect('[')
+        if stream.peek() == ']':
+            stream.expect(']')
+            return
+        while True:
+            yield stream.value()
+            if stream.peek() == ',':
+                stream.expect(',')
+            else:
+                stream.expect(']')
+                return
+
+    key, rest = path[0], path[1:]
+    stream.expect('{')
+    if stream.peek() == '}':
+        stream.expect('}')
+        return
+    while True:
+        name = stream.value()
+        stream.expect(':')
+        if key == '*' or name == key:
+            yield from _iter_path(stream, rest)
+        else:
+            stream.value()
+        if stream.peek() == ',':
+            stream.expect(',')
+        else:
+            stream.expect('}')
+            return
+
+
+def iter_json_items(chunks, path=()):
+    """
+    Incrementally yield the elements of the JSON array(s) found at ``path``.
+
+    ``chunks`` is any iterable of UTF-8 byte chunks (for example
+    ``response.iter_content(CHUNK_SIZE)``). ``path`` lists the object keys
+    leading to the array; ``'*'`` matches every key at that level. An empty
+    path means the document itself is an array, as for DONKI; NeoWs feeds
+    use ``('near_earth_objects', '*')``.
+    """
+    return _iter_path(_JSONStream(chunks), tuple(path))
+
+
+def iter_file_chunks(fileobj, chunk_size=CHUNK_SIZE):
+    """Yield byte chunks from a binary file object"""
+    return iter(lambda: fileobj.read(chunk_size), b'')
+
+
+def batched(iterable, size):
+    """Group an iterable into lists of at most ``size`` items"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
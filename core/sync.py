@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from apod.services import ARCHIVE_START, APODService, archive_today
+from asteroids.services import FEED_WINDOW_DAYS, AsteroidService
+from solarflares.services import LEDGER_WINDOW_DAYS, SolarFlareService
+from .breaker import CircuitOpenError
+from .dates import split_windows
+from .ingest import IngestRecorder
+from .ledger import plan_windows, record_fetch
+from .models import FetchLedger
+from .singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+
+class SyncSource:
+    """
+    One NASA source as seen by ``sync_all``.
+
+    ``plan()`` returns the (start, end) windows to fetch, ``download(start,
+    end)`` only talks to NASA and returns the decoded payload, and
+    ``store(start, end, payload)`` writes it to the database and returns the
+    number of new records. At most ``concurrency`` downloads of the source
+    run at once.
+    """
+
+    def __init__(self, source, plan, download, store, concurrency):
+        self.source = source
+        self.plan = plan
+        self.download = download
+        self.store = store
+        self.concurrency = concurrency
+
+
+def nasa_sources(apod_days=7, flare_days=30, asteroid_days=7, force=False, concurrency=None):
+    """
+    SyncSources for the APOD, DONKI and NeoWs refreshes done by the fetch
+    commands: the last ``apod_days`` and ``flare_days`` and the next
+    ``asteroid_days``, split into the windows the ledger reports as missing
+    or stale (all of them with ``force``)
+    """
+    concurrency = {**settings.SYNC_CONCURRENCY, **(concurrency or {})}
+    today = timezone.now().date()
+
+    def planner(source, start_date, end_date, max_days):
+        if force:
+            return lambda: split_windows(start_date, end_date, max_days)
+        return lambda: plan_windows(source, start_date, end_date, max_days)
+
+    apods, flares, asteroids = APODService(), SolarFlareService(), AsteroidService()
+    return [
+        SyncSource(
+            FetchLedger.SOURCE_APOD,
+            lambda: apods.missing_spans(
+                max(today - timedelta(days=apod_days - 1), ARCHIVE_START), min(today, archive_today()), force
+            ),
+            apods.request_range,
+            apods.store_range,
+            concurrency[FetchLedger.SOURCE_APOD],
+        ),
+        SyncSource(
+            FetchLedger.SOURCE_DONKI_FLR,
+            planner(FetchLedger.SOURCE_DONKI_FLR, today - timedelta(days=flare_days), today, LEDGER_WINDOW_DAYS),
+            flares.request_flares,
+            flares.store_window,
+            concurrency[FetchLedger.SOURCE_DONKI_FLR],
+        ),
+        SyncSource(
+            FetchLedger.SOURCE_NEOWS,
+            planner(FetchLedger.SOURCE_NEOWS, today, today + timedelta(days=asteroid_days - 1), FEED_WINDOW_DAYS),
+            asteroids.request_feed,
+            lambda start, end, data: asteroids.store_feed(start, end, data)['approaches_inserted'],
+            concurrency[FetchLedger.SOURCE_NEOWS],
+        ),
+    ]
+
+
+def _store(source, window, run, payload, error):
+    """
+    Runs on the writer thread: store one downloaded window or its failure
+    and save the window's IngestRun
+    """
+    try:
+        with run:
+            if error is not None:
+                # Recorded as the run's outcome, like a failed store
+                raise error
+            return source.store(*window, payload), None
+    except Exception as e:
+        error = e
+    logger.error(f"Error syncing {source.source} {window[0]} to {window[1]}: {error}")
+    if not isinstance(error, CircuitOpenError):
+        record_fetch(source.source, *window, error=error)
+    return 0, error
+
+
+async def _sync(sources, on_window_done):
+    loop = asyncio.get_running_loop()
+    # Every database read and write happens on this one thread, in arrival
+    # order, while downloads run on the pool
+    writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sync-writer')
+    downloads = ThreadPoolExecutor(max_workers=sum(source.concurrency for source in sources),
+                                   thread_name_prefix='sync-download')
+    queue = asyncio.Queue(maxsize=sum(source.concurrency for source in sources))
+    started = time.monotonic()
+    results = {
+        source.source: {'windows': 0, 'failed': 0, 'records': 0, 'seconds': 0.0} for source in sources
+    }
+
+    async def fetch(source, window, limit):
+        async with limit:
+            # One IngestRun per window, timed on the download thread and the writer
+            run = IngestRecorder(source.source, *window)
+            try:
+                payload, error = await loop.run_in_executor(downloads, run.call, source.download, *window), None
+            except Exception as e:
+                payload, error = None, e
+        # Waits while the writer is behind, so finished payloads never pile up
+        await queue.put((source, window, run, payload, error))
+
+    async def write():
+        while (item := await queue.get()) is not None:
+            source, window, run, payload, error = item
+            try:
+                records, error = await loop.run_in_executor(writer, _store, source, window, run, payload, error)
+            except Exception as e:
+                # Even the failure could not be recorded; keep draining the
+                # queue so the downloads waiting on it can finish
+                logger.error(f"Error recording {source.source} {window[0]} to {window[1]}: {e}")
+                records, error = 0, e
+            result = results[source.source]
+            result['failed' if error else 'windows'] += 1
+            result['records'] += records
+            result['seconds'] = time.monotonic() - started
+            if on_window_done:
+                on_window_done(source.source, window, records, error)
+
+    try:
+        writing = asyncio.create_task(write())
+        fetches = []
+        for source in sources:
+            windows = await loop.run_in_executor(writer, source.plan)
+            limit = asyncio.Semaphore(source.concurrency)
+            fetches += [fetch(source, window, limit) for window in windows]
+        await asyncio.gather(*fetches)
+        await queue.put(None)
+        await writing
+        await loop.run_in_executor(writer, connections.close_all)
+    finally:
+        writer.shutdown()
+        downloads.shutdown()
+
+    return {'sources': results, 'seconds': time.monotonic() - started}
+
+
+def sync_all(sources=None, on_window_done=None):
+    """
+    Fetch every window of every source concurrently and store them through
+    a single writer.
+
+    Downloads of all sources overlap, each source limited to its own
+    concurrency, so the wall time is about that of the slowest source rather
+    than the sum of all of them. Payloads are handed to one writer thread
+    through a bounded queue, which keeps SQLite free of competing writers
+    and memory bounded. ``on_window_done(source, window, records, error)``
+    is called after each window is stored. Returns per-source window,
+    failure and record counts with the elapsed seconds.
+    """
+    sources = nasa_sources() if sources is None else sources
+    return single_flight('sync_all', lambda: asyncio.run(_sync(sources, on_window_done)))
@@ -0,0 +1,99 @@
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from django.db import connection
+
+INDEX_STEP = re.compile(r'^(SEARCH|SCAN) (\S+) USING (?:COVERING )?INDEX (\S+)')
+
+
+class QueryPlanAssertions:
+    """
+    TestCase mixin asserting on SQLite's EXPLAIN QUERY PLAN output
+    """
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def partial_indexes(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA index_list("{table}")')
+            return {row[1] for row in cursor.fetchall() if row[4]}
+
+    def assertIndexSearch(self, queryset):
+        """
+        Assert the queryset's main table is only read through an index
+        search, or a scan of a partial index holding just the matching rows
+        """
+        table = queryset.model._meta.db_table
+        partial = self.partial_indexes(table)
+        plan = self.query_plan(queryset)
+        steps = [step for step in plan if step.split(' ')[1:2] == [table]]
+        self.assertTrue(steps, f'{table} missing from plan: {plan}')
+        for step in steps:
+            match = INDEX_STEP.match(step)
+            self.assertTrue(
+                match and (match.group(1) == 'SEARCH' or match.group(3) in partial),
+                f'Full scan of {table}: {plan}'
+            )
+
+
+class StandInNasaHandler(BaseHTTPRequestHandler):
+    """
+    Plays back the server's queued (status, headers) responses with the body
+    registered for the request path: bytes, or a callable taking the parsed
+    query string. Bodies are JSON unless ``server.content_types`` has
+    another type for the path.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.seen.append(self.client_address)
+        if self.server.quota is not None:
+            status, headers = self.spend_quota()
+        else:
+            status, headers = self.server.responses.pop(0) if self.server.responses else (200, {})
+        url = urlsplit(self.path)
+        body = self.server.bodies.get(url.path, b'{"ok": true}')
+        if callable(body):
+            body = body({name: values[0] for name, values in parse_qs(url.query).items()})
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', self.server.content_types.get(url.path, 'application/json'))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def spend_quota(self):
+        """Enforce an hourly quota of ``server.quota`` requests per API key"""
+        key = parse_qs(urlsplit(self.path).query)['api_key'][0]
+        self.server.used[key] = self.server.used.get(key, 0) + 1
+        remaining = self.server.quota - self.server.used[key]
+        if remaining < 0:
+            return 429, {'Retry-After': '3600'}
+        return 200, {'X-RateLimit-Limit': str(self.server.quota), 'X-RateLimit-Remaining': str(remaining)}
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stand_in_nasa(test):
+    """
+    Start a local HTTP/1.1 stand-in for api.nasa.gov that is shut down when
+    ``test`` finishes, and return the server
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInNasaHandler)
+    server.seen = []
+    server.responses = []
+    server.quota = None
+    server.used = {}
+    server.bodies = {}
+    server.content_types = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    test.addCleanup(server.server_close)
+    test.addCleanup(server.shutdown)
+    return server
@@ -0,0 +1,1190 @@
+import io
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock, skipIf
+import requests
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count, QuerySet
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from apod.models import APOD
+from apod.services import APODService, archive_today
+from asteroids.services import AsteroidService
+from solarflares.services import SolarFlareService
+from . import background
+from .background import refresh_in_background
+from .breaker import CircuitOpenError, allow_request, circuit_breaker
+from .cache import cache_stats, cached, drop_source
+from .charts import ChartCache, cached_chart, chart_cache
+from .conditional import source_validators
+from .downsampling import density_bin, lttb
+from .http_client import NasaClient, QuotaExhausted
+from .ingest import IngestRecorder, record_error
+from .jobs import claim_job, enqueue, job, requeue_abandoned, run_job, work
+from .ledger import plan_windows, recent_failure, record_fetch
+from .metrics import view_metrics
+from .models import CircuitBreaker, DataVersion, FetchLedger, IngestRun, Job
+from .singleflight import SingleFlightTimeout, fcntl, single_flight
+from .streaming import iter_json_items
+from .sync import SyncSource, nasa_sources, sync_all
+from .sample_payloads import make_donki_flares
+from .testing import start_stand_in_nasa
+from .versions import bump_data_version
+
+
+def _append_once(path, key):
+    """Fetch function for the cross-process test: write a line unless present"""
+    def fetch():
+        if os.path.exists(path):
+            with open(path) as f:
+                return f.read()
+        time.sleep(0.2)
+        with open(path, 'a') as f:
+            f.write(f'{os.getpid()}\n')
+        with open(path) as f:
+            return f.read()
+    return single_flight(key, fetch)
+
+
+# Strings with escapes and multi-byte characters, and numbers of every form
+_STREAMED_FEED = json.dumps({
+    'element_count': 2,
+    'links': {'next': 'https://api.nasa.gov/neo/rest/v1/feed?start_date=2024-01-08'},
+    'near_earth_objects': {
+        '2024-01-01': [
+            {'name': 'Say \\"hi\\" \\\\ \u00e9t\u00e9 \u2604 \U0001f680', 'h': -12.5e-3, 'ids': [1234567, 0, -7]},
+            {'name': '', 'nested': {'empty': [], 'none': None, 'flag': True}, 'value': 1.0},
+        ],
+        '2024-01-02': [{'name': 'tail', 'value': 98765.4321}],
+    },
+}, ensure_ascii=False).encode()
+_STREAMED_PATH = ('near_earth_objects', '*')
+
+
+class StreamingParserTests(SimpleTestCase):
+    """
+    iter_json_items yields the same records however the body is chunked
+    """
+
+    def setUp(self):
+        self.expected = [item for day in json.loads(_STREAMED_FEED)['near_earth_objects'].values() for item in day]
+
+    def parse(self, chunks):
+        return list(iter_json_items(chunks, _STREAMED_PATH))
+
+    def test_every_split_point(self):
+        # Inside strings, escapes, multi-byte characters, numbers and keys
+        for split in range(len(_STREAMED_FEED) + 1):
+            with self.subTest(split=split):
+                self.assertEqual(self.parse([_STREAMED_FEED[:split], _STREAMED_FEED[split:]]), self.expected)
+
+    def test_fixed_chunk_sizes(self):
+        for size in (1, 2, 3, 5, 7, 64):
+            with self.subTest(size=size):
+                chunks = [_STREAMED_FEED[i:i + size] for i in range(0, len(_STREAMED_FEED), size)]
+                self.assertEqual(self.parse(chunks), self.expected)
+
+    def test_split_after_path_prefix(self):
+        prefix_end = _STREAMED_FEED.index(b'[') + 1
+        self.assertEqual(self.parse([_STREAMED_FEED[:prefix_end], b'', _STREAMED_FEED[prefix_end:]]), self.expected)
+
+    def test_top_level_array(self):
+        flares = [{'flrID': 'a', 'classType': 'M1.2'}, {'flrID': 'b\\"c', 'classType': 'X9'}]
+        body = json.dumps(flares).encode()
+        self.assertEqual(list(iter_json_items(body[i:i + 3] for i in range(0, len(body), 3))), flares)
+        self.assertEqual(list(iter_json_items([b' [ ] '])), [])
+
+    def test_truncated_input_raises(self):
+        for end in range(len(_STREAMED_FEED)):
+            with self.subTest(end=end), self.assertRaises(ValueError):
+                self.parse([_STREAMED_FEED[:end]])
+
+
+class SingleFlightTests(SimpleTestCase):
+    """
+    Concurrent callers with the same key share one fetch
+    """
+
+    def setUp(self):
+        self.lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.lock_dir.cleanup)
+        override = override_settings(SINGLE_FLIGHT_LOCK_DIR=self.lock_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def run_threads(self, count, target):
+        results = [None] * count
+        barrier = threading.Barrier(count)
+
+        def run(index):
+            barrier.wait()
+            try:
+                results[index] = target()
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_threads_share_one_call(self):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'fetched': len(calls)}
+
+        results = self.run_threads(10, lambda: single_flight('apod:2024-01-01', fetch))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_errors_reach_every_waiter(self):
+        def fetch():
+            time.sleep(0.2)
+            raise ValueError('NASA is down')
+
+        results = self.run_threads(5, lambda: single_flight('neows:broken', fetch))
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        # The failed call is forgotten, so the next caller tries again
+        self.assertEqual(single_flight('neows:broken', lambda: 'ok'), 'ok')
+
+    def test_waiter_timeout(self):
+        results = self.run_threads(2, lambda: single_flight('slow', lambda: time.sleep(0.5), timeout=0.1))
+        self.assertEqual(sum(isinstance(result, SingleFlightTimeout) for result in results), 1)
+
+    @skipIf(fcntl is None, 'cross-process locking needs fcntl')
+    def test_processes_wait_and_see_stored_result(self):
+        path = os.path.join(self.lock_dir.name, 'fetched.txt')
+        context = multiprocessing.get_context('fork')
+        with context.Pool(4) as pool:
+            results = pool.starmap(_append_once, [(path, 'apod:2024-01-02')] * 4)
+        with open(path) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(len(set(results)), 1)
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f'{status} error', response=response)
+
+
+@override_settings(CIRCUIT_BREAKER_FAILURE_THRESHOLD=2, CIRCUIT_BREAKER_COOLDOWN_SECONDS=60)
+class CircuitBreakerTests(TestCase):
+    """
+    Repeated source failures open the breaker; after the cooldown a single
+    probe decides whether it closes again
+    """
+    source = FetchLedger.SOURCE_DONKI_FLR
+
+    def fail(self, error=None):
+        with self.assertRaises(requests.RequestException):
+            with circuit_breaker(self.source):
+                raise error or requests.ConnectionError('connection refused')
+
+    def breaker(self):
+        return CircuitBreaker.objects.get(source=self.source)
+
+    def expire_cooldown(self):
+        CircuitBreaker.objects.filter(source=self.source).update(
+            state_changed_at=timezone.now() - timedelta(seconds=61)
+        )
+
+    def test_opens_after_threshold_and_refuses_requests(self):
+        self.fail()
+        self.assertEqual(self.breaker().state, CircuitBreaker.STATE_CLOSED)
+        self.fail(_http_error(503))
+        self.assertEqual(self.breaker().state, CircuitBreaker.STATE_OPEN)
+
+        ran = []
+        with self.assertRaises(CircuitOpenError):
+            with circuit_breaker(self.source):
+                ran.append(True)
+        self.assertEqual(ran, [])
+
+    def test_client_errors_do_not_count_as_failures(self):
+        self.fail()
+        self.fail(_http_error(404))
+        self.fail()
+        self.assertEqual(self.breaker().state, CircuitBreaker.STATE_CLOSED)
+        self.assertEqual(self.breaker().consecutive_failures, 1)
+
+    def test_local_quota_exhaustion_does_not_count(self):
+        self.fail()
+        # Our own key pool running dry says nothing about NASA's health
+        for _ in range(5):
+            self.fail(QuotaExhausted('All 1 NASA API keys are exhausted for another 3600s'))
+        self.assertEqual(self.breaker().state, CircuitBreaker.STATE_CLOSED)
+        self.assertEqual(self.breaker().consecutive_failures, 1)
+        self.assertEqual(self.client.get(reverse('core:health')).json()['status'], 'ok')
+
+    def test_single_probe_after_cooldown(self):
+        self.fail()
+        self.fail()
+        self.expire_cooldown()
+
+        allow_request(self.source)
+        self.assertEqual(self.breaker().state, CircuitBreaker.STATE_HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            allow_request(self.source)
+
+    def test_probe_outcome_closes_or_reopens(self):
+        self.fail()
+        self.fail()
+        self.expire_cooldown()
+        self.fail()
+        self.assertEqual(self.breaker().state, CircuitBreaker.STATE_OPEN)
+
+        self.expire_cooldown()
+        with circuit_breaker(self.source):
+            pass
+        breaker = self.breaker()
+        self.assertEqual(breaker.state, CircuitBreaker.STATE_CLOSED)
+        self.assertEqual(breaker.consecutive_failures, 0)
+
+    def test_health_reports_open_breakers(self):
+        response = self.client.get(reverse('core:health'))
+        self.assertEqual(response.json()['status'], 'ok')
+
+        self.fail()
+        self.fail()
+        data = self.client.get(reverse('core:health')).json()
+        self.assertEqual(data['status'], 'degraded')
+        self.assertEqual(data['sources'][self.source]['state'], CircuitBreaker.STATE_OPEN)
+        self.assertEqual(data['sources'][FetchLedger.SOURCE_APOD]['state'], CircuitBreaker.STATE_CLOSED)
+
+
+@override_settings(FETCH_LEDGER_POLICY={
+    'default': {'recent_days': 3, 'ttl_hours': 6},
+    'donki_flr': {'recent_days': 7, 'ttl_hours': 3},
+})
+class FetchLedgerTests(TestCase):
+    """
+    Repeat syncs only plan the windows the ledger has no fresh entry for
+    """
+
+    def test_fresh_windows_are_skipped_and_gaps_split(self):
+        record_fetch(FetchLedger.SOURCE_NEOWS, date(2024, 1, 1), date(2024, 1, 7), records=10)
+        record_fetch(FetchLedger.SOURCE_NEOWS, date(2024, 1, 12), date(2024, 1, 12), records=1)
+
+        self.assertEqual(plan_windows(FetchLedger.SOURCE_NEOWS, date(2024, 1, 1), date(2024, 1, 7), 7), [])
+        # Missing days are merged and split into windows of at most max_days
+        self.assertEqual(plan_windows(FetchLedger.SOURCE_NEOWS, date(2024, 1, 3), date(2024, 1, 20), 3), [
+            (date(2024, 1, 8), date(2024, 1, 10)),
+            (date(2024, 1, 11), date(2024, 1, 11)),
+            (date(2024, 1, 13), date(2024, 1, 15)),
+            (date(2024, 1, 16), date(2024, 1, 18)),
+            (date(2024, 1, 19), date(2024, 1, 20)),
+        ])
+
+    def test_recent_days_are_planned_again_per_source_policy(self):
+        today = timezone.now().date()
+        start = today - timedelta(days=10)
+        for source in (FetchLedger.SOURCE_NEOWS, FetchLedger.SOURCE_DONKI_FLR):
+            record_fetch(source, start, today)
+
+        soon = timezone.now() + timedelta(hours=1)
+        later = timezone.now() + timedelta(hours=4)
+        much_later = timezone.now() + timedelta(hours=7)
+        for source in (FetchLedger.SOURCE_NEOWS, FetchLedger.SOURCE_DONKI_FLR):
+            self.assertEqual(plan_windows(source, start, today, 31, now=soon), [])
+        # donki_flr entries go stale after 3 hours, the default after 6
+        self.assertEqual(plan_windows(FetchLedger.SOURCE_NEOWS, start, today, 31, now=later), [])
+        self.assertEqual(
+            plan_windows(FetchLedger.SOURCE_DONKI_FLR, start, today, 31, now=later),
+            [(today - timedelta(days=7), today)],
+        )
+        # Only days fetched within recent_days of happening are revisited
+        self.assertEqual(
+            plan_windows(FetchLedger.SOURCE_NEOWS, start, today, 31, now=much_later),
+            [(today - timedelta(days=3), today)],
+        )
+
+    def test_failed_windows_are_retried(self):
+        day = date(2024, 1, 10)
+        record_fetch(FetchLedger.SOURCE_NEOWS, day, day, error='500 Server Error')
+        later = timezone.now() + timedelta(minutes=16)
+        self.assertEqual(plan_windows(FetchLedger.SOURCE_NEOWS, day, day, 7, now=later), [(day, day)])
+
+    def test_record_fetch_replaces_the_window_entry(self):
+        day = date(2024, 1, 10)
+        record_fetch(FetchLedger.SOURCE_APOD, day, day, error='500 Server Error')
+        failed = FetchLedger.objects.get()
+        self.assertEqual((failed.status, failed.error), (FetchLedger.STATUS_ERROR, '500 Server Error'))
+
+        record_fetch(FetchLedger.SOURCE_APOD, day, day, records=1)
+        entry = FetchLedger.objects.get()
+        self.assertEqual(entry.pk, failed.pk)
+        self.assertEqual((entry.status, entry.error, entry.records), (FetchLedger.STATUS_SUCCESS, '', 1))
+        self.assertGreaterEqual(entry.fetched_at, failed.fetched_at)
+
+        # Other windows and sources get entries of their own
+        record_fetch(FetchLedger.SOURCE_APOD, day, day + timedelta(days=1))
+        record_fetch(FetchLedger.SOURCE_NEOWS, day, day)
+        self.assertEqual(FetchLedger.objects.count(), 3)
+
+    def test_force_bypasses_the_ledger(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        end = timezone.now().date()
+        start = end - timedelta(days=10)
+        record_fetch(FetchLedger.SOURCE_DONKI_FLR, start, end)
+
+        with override_settings(SINGLE_FLIGHT_LOCK_DIR=lock_dir.name), \
+                mock.patch.object(SolarFlareService, '_fetch_window', return_value=0) as fetch_window:
+            call_command('fetch_solar_flares', days=10, stdout=io.StringIO())
+            fetch_window.assert_not_called()
+
+            call_command('fetch_solar_flares', days=10, force=True, stdout=io.StringIO())
+            fetch_window.assert_called_once_with(start, end, stream=False)
+
+            # Long forced ranges use the planned 30-day window boundaries
+            fetch_window.reset_mock()
+            call_command('fetch_solar_flares', days=69, force=True, stdout=io.StringIO())
+            start = end - timedelta(days=69)
+            self.assertEqual([call.args for call in fetch_window.call_args_list], [
+                (start, start + timedelta(days=29)),
+                (start + timedelta(days=30), start + timedelta(days=59)),
+                (start + timedelta(days=60), end),
+            ])
+
+
+class NegativeCacheTests(TestCase):
+    """
+    Failed fetches are not retried until the negative-cache TTL expires
+    """
+
+    def test_recent_failures_are_not_planned(self):
+        day = date(2024, 1, 10)
+        record_fetch(FetchLedger.SOURCE_APOD, day, day, error='404 Client Error')
+        self.assertEqual(plan_windows(FetchLedger.SOURCE_APOD, day, day, 1), [])
+
+        later = timezone.now() + timedelta(minutes=16)
+        self.assertEqual(plan_windows(FetchLedger.SOURCE_APOD, day, day, 1, now=later), [(day, day)])
+        self.assertIsNone(recent_failure(FetchLedger.SOURCE_APOD, day, day, now=later))
+
+    def test_latest_apod_falls_back_to_stored_entry(self):
+        today = archive_today()
+        stored = APOD.objects.create(
+            date=today - timedelta(days=1), title='Yesterday', explanation='', url='https://example.com/a.jpg'
+        )
+        record_fetch(FetchLedger.SOURCE_APOD, today, today, error='404 Client Error')
+
+        with mock.patch('core.http_client.NasaClient.get') as get:
+            latest = APODService().get_latest_apod()
+        get.assert_not_called()
+        self.assertEqual(latest, stored)
+
+        with mock.patch('apod.views.refresh_in_background'):
+            response = self.client.get(reverse('apod:home'))
+        self.assertTrue(response.context['is_stale'])
+        self.assertContains(response, 'Stale')
+
+
+@override_settings(BACKGROUND_REFRESH_INTERVAL=60)
+class BackgroundRefreshTests(SimpleTestCase):
+    """
+    Refreshes started by page views run off the request thread, once per key
+    """
+
+    def setUp(self):
+        patcher = mock.patch.multiple('core.background', _running=set(), _last_started={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wait_until_idle(self, key):
+        deadline = time.monotonic() + 5
+        while key in background._running and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_refresh_runs_without_blocking_the_caller(self):
+        release, finished = threading.Event(), threading.Event()
+
+        def refresh():
+            release.wait(5)
+            finished.set()
+
+        self.assertTrue(refresh_in_background('apod:latest', refresh))
+        # Returned while the refresh is still waiting
+        self.assertFalse(finished.is_set())
+        release.set()
+        self.assertTrue(finished.wait(5))
+
+    def test_concurrent_and_repeated_requests_start_one_refresh(self):
+        release = threading.Event()
+        calls = []
+
+        def refresh():
+            calls.append(1)
+            release.wait(5)
+
+        started = [refresh_in_background('apod:latest', refresh) for _ in range(5)]
+        release.set()
+        self.assertEqual(started, [True, False, False, False, False])
+
+        # Still throttled once the first refresh has finished
+        self.wait_until_idle('apod:latest')
+        self.assertFalse(refresh_in_background('apod:latest', refresh))
+        self.assertEqual(len(calls), 1)
+
+        # Other keys are independent
+        self.assertTrue(refresh_in_background('other', lambda: None))
+
+    def test_failed_refresh_is_logged_not_raised(self):
+        def refresh():
+            raise requests.ConnectionError('down')
+
+        with self.assertLogs('core.background', level='ERROR'):
+            self.assertTrue(refresh_in_background('apod:latest', refresh))
+            self.wait_until_idle('apod:latest')
+
+
+@override_settings(
+    NASA_HTTP_BACKOFF_BASE=0.01, NASA_HTTP_BACKOFF_MAX=0.05, NASA_HTTP_MAX_RETRIES=3,
+    NASA_RATE_LIMIT_PER_SECOND=100, NASA_RATE_LIMIT_BURST=10, NASA_RATE_LIMIT_WINDOW_SECONDS=1,
+)
+class NasaClientTests(SimpleTestCase):
+    """
+    The shared client against a local stand-in for api.nasa.gov
+    """
+
+    def setUp(self):
+        self.server = start_stand_in_nasa(self)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/planetary/apod'
+        self.client = NasaClient()
+        self.addCleanup(self.client.close)
+
+    def quota(self, remaining, limit=100):
+        return 200, {'X-RateLimit-Limit': str(limit), 'X-RateLimit-Remaining': str(remaining)}
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get(self.url, params={'api_key': 'k'}).json(), {'ok': True})
+        self.assertEqual(len(self.server.seen), 5)
+        self.assertEqual(len(set(self.server.seen)), 1)
+
+    def test_retries_rate_limits_and_server_errors(self):
+        self.server.responses = [(503, {}), (429, {'Retry-After': '0'}), (200, {})]
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.seen), 3)
+        timing = self.client.stats()['/planetary/apod']
+        self.assertEqual((timing['calls'], timing['retries'], timing['errors']), (3, 2, 2))
+
+    def test_returns_last_response_once_retries_are_used_up(self):
+        self.server.responses = [(502, {})] * 5
+        self.assertEqual(self.client.get(self.url).status_code, 502)
+        self.assertEqual(len(self.server.seen), 4)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.responses = [(404, {})]
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(len(self.server.seen), 1)
+
+    def test_slows_down_when_quota_runs_low(self):
+        self.server.responses = [self.quota(90)] * 5
+        started = time.monotonic()
+        for _ in range(5):
+            self.client.get(self.url, params={'api_key': 'plenty'})
+        self.assertLess(time.monotonic() - started, 0.3)
+
+        # 4 left in a 1 second window: one request every 0.25 seconds
+        self.server.responses = [self.quota(4)] * 5
+        started = time.monotonic()
+        for _ in range(5):
+            self.client.get(self.url, params={'api_key': 'scarce'})
+        self.assertGreater(time.monotonic() - started, 0.7)
+
+    @override_settings(NASA_RATE_LIMIT_MAX_WAIT=0.1, NASA_RATE_LIMIT_WINDOW_SECONDS=3600)
+    def test_refuses_requests_it_would_have_to_wait_too_long_for(self):
+        client = NasaClient()
+        self.addCleanup(client.close)
+        self.server.responses = [self.quota(0, limit=1000)]
+        client.get(self.url, params={'api_key': 'spent'})
+        with self.assertRaises(QuotaExhausted):
+            client.get(self.url, params={'api_key': 'spent'})
+        self.assertEqual(len(self.server.seen), 1)
+
+    @override_settings(NASA_API_KEYS=['first', 'second', 'third'], NASA_RATE_LIMIT_WINDOW_SECONDS=3600)
+    def test_key_pool_multiplies_quota(self):
+        client = NasaClient()
+        self.addCleanup(client.close)
+        self.server.quota = 4
+        for _ in range(12):
+            self.assertEqual(client.get(self.url, params={'api_key': None}).status_code, 200)
+        self.assertEqual(self.server.used, {'first': 4, 'second': 4, 'third': 4})
+        self.assertEqual({stats['remaining'] for stats in client.key_stats().values()}, {0})
+
+        # Every key is spent: refused locally instead of asking NASA
+        with self.assertRaises(QuotaExhausted):
+            client.get(self.url, params={'api_key': None})
+        self.assertEqual(len(self.server.seen), 12)
+
+    @override_settings(NASA_API_KEYS=['spent', 'fresh'])
+    def test_rate_limited_key_is_rotated_out(self):
+        client = NasaClient()
+        self.addCleanup(client.close)
+        self.server.quota = 3
+        self.server.used = {'spent': 3}
+        for _ in range(3):
+            self.assertEqual(client.get(self.url, params={'api_key': None}).status_code, 200)
+        self.assertEqual(self.server.used, {'spent': 4, 'fresh': 3})
+        self.assertEqual(client.key_stats()['...pent']['rate_limited'], 1)
+
+
+class SyncAllTests(TransactionTestCase):
+    """
+    Sources download concurrently and are stored by a single writer
+    """
+
+    def setUp(self):
+        self.lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.lock_dir.cleanup)
+        override = override_settings(SINGLE_FLIGHT_LOCK_DIR=self.lock_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def slow_source(self, name, windows, concurrency, writers, delay=0.2):
+        def download(start, end):
+            time.sleep(delay)
+            return end - start
+
+        def store(start, end, payload):
+            writers.add(threading.get_ident())
+            return 1
+
+        plan = [(date(2024, 1, day), date(2024, 1, day)) for day in range(1, windows + 1)]
+        return SyncSource(name, lambda: plan, download, store, concurrency)
+
+    def test_wall_time_is_that_of_the_slowest_source(self):
+        writers = set()
+        sources = [
+            self.slow_source(FetchLedger.SOURCE_APOD, 6, 3, writers),
+            self.slow_source(FetchLedger.SOURCE_DONKI_FLR, 2, 2, writers),
+            self.slow_source(FetchLedger.SOURCE_NEOWS, 4, 2, writers),
+        ]
+        stats = sync_all(sources)
+
+        # Run one after another this would take 12 x 0.2s; each source
+        # needs two rounds of 0.2s at its concurrency
+        self.assertLess(stats['seconds'], 0.8)
+        self.assertEqual(
+            {source: result['windows'] for source, result in stats['sources'].items()},
+            {FetchLedger.SOURCE_APOD: 6, FetchLedger.SOURCE_DONKI_FLR: 2, FetchLedger.SOURCE_NEOWS: 4},
+        )
+        self.assertEqual(len(writers), 1)
+        self.assertNotIn(threading.get_ident(), writers)
+
+    def test_failed_downloads_are_reported_per_window(self):
+        def download(start, end):
+            raise requests.ConnectionError('connection refused')
+
+        failures = []
+        source = SyncSource(
+            FetchLedger.SOURCE_APOD, lambda: [(date(2024, 1, 1), date(2024, 1, 1))], download,
+            lambda start, end, payload: 1, 1,
+        )
+        with mock.patch('core.sync.record_fetch') as record, self.assertLogs('core.sync', 'ERROR'):
+            stats = sync_all([source], on_window_done=lambda *args: failures.append(args[3]))
+        self.assertEqual(stats['sources'][FetchLedger.SOURCE_APOD]['failed'], 1)
+        self.assertIsInstance(failures[0], requests.ConnectionError)
+        record.assert_called_once()
+        run = IngestRun.objects.get()
+        self.assertEqual((run.source, run.status), (FetchLedger.SOURCE_APOD, IngestRun.STATUS_ERROR))
+        self.assertEqual(run.error, 'connection refused')
+
+
+def _apod_range(query):
+    start, end = date.fromisoformat(query['start_date']), date.fromisoformat(query['end_date'])
+    return json.dumps([
+        {'date': str(start + timedelta(days=i)), 'title': 'Stand-in', 'url': 'https://example.com/a.jpg'}
+        for i in range((end - start).days + 1)
+    ]).encode()
+
+
+@override_settings(NASA_API_KEYS=['key'])
+class SyncAllIngestTests(TransactionTestCase):
+    """
+    sync_all stores every source from a stand-in for api.nasa.gov
+    """
+
+    def setUp(self):
+        self.lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.lock_dir.cleanup)
+        override = override_settings(SINGLE_FLIGHT_LOCK_DIR=self.lock_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        server = start_stand_in_nasa(self)
+        base = f'http://127.0.0.1:{server.server_port}'
+        server.bodies = {
+            '/planetary/apod': _apod_range,
+            '/DONKI/FLR': b'[]',
+            '/neo/rest/v1/feed': b'{"element_count": 0, "near_earth_objects": {}}',
+        }
+        for service, url in ((APODService, '/planetary/apod'), (SolarFlareService, '/DONKI/FLR'),
+                             (AsteroidService, '/neo/rest/v1')):
+            patcher = mock.patch.object(service, 'BASE_URL', base + url)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_sync_all_stores_and_records_every_window(self):
+        stats = sync_all(nasa_sources(apod_days=3, flare_days=40, asteroid_days=10))
+
+        # The last three days in one date-range request, up to NASA's current date
+        today = timezone.now().date()
+        self.assertEqual(APOD.objects.count(), (min(today, archive_today()) - today).days + 3)
+        self.assertEqual(
+            {source: (result['windows'], result['failed']) for source, result in stats['sources'].items()},
+            {FetchLedger.SOURCE_APOD: (1, 0), FetchLedger.SOURCE_DONKI_FLR: (2, 0), FetchLedger.SOURCE_NEOWS: (2, 0)},
+        )
+        self.assertEqual(FetchLedger.objects.filter(status=FetchLedger.STATUS_SUCCESS).count(), 5)
+
+        # One IngestRun per window, with the download and store of each
+        runs = IngestRun.objects.all()
+        self.assertEqual(
+            {source: count for source, count in runs.values_list('source').annotate(count=Count('id'))},
+            {FetchLedger.SOURCE_APOD: 1, FetchLedger.SOURCE_DONKI_FLR: 2, FetchLedger.SOURCE_NEOWS: 2},
+        )
+        self.assertEqual({run.status for run in runs}, {IngestRun.STATUS_SUCCESS})
+        self.assertTrue(all(run.bytes_received > 0 and run.http_seconds > 0 for run in runs))
+        self.assertEqual(runs.get(source=FetchLedger.SOURCE_APOD).inserted, APOD.objects.count())
+
+        # Everything is in the ledger now, so a second run has nothing to do
+        stats = sync_all(nasa_sources(apod_days=3, flare_days=40, asteroid_days=10))
+        self.assertEqual(sum(result['windows'] for result in stats['sources'].values()), 0)
+
+
+_flaky_calls = []
+
+
+@job('tests.flaky', max_attempts=2)
+def _flaky(progress, fail_times=0):
+    """Test job failing its first ``fail_times`` attempts"""
+    _flaky_calls.append(1)
+    progress(f'Attempt {len(_flaky_calls)}')
+    if len(_flaky_calls) <= fail_times:
+        raise RuntimeError('NASA is down')
+    return {'attempts': len(_flaky_calls)}
+
+
+@job('tests.unstorable')
+def _unstorable(progress):
+    """Test job returning a result JSON cannot represent"""
+    return {'value': object()}
+
+
+@override_settings(JOB_EMBEDDED_WORKER=False, JOB_RETRY_DELAY_SECONDS=0, JOB_LEASE_SECONDS=60)
+class JobQueueTests(TestCase):
+    """
+    Refresh endpoints queue jobs that workers claim and run outside the request
+    """
+
+    def setUp(self):
+        _flaky_calls.clear()
+
+    def test_refresh_endpoint_queues_job_and_reports_its_result(self):
+        with mock.patch('solarflares.services.SolarFlareService.fetch_solar_flares', return_value=3) as fetch:
+            response = self.client.post(reverse('solarflares:refresh'))
+            self.assertEqual(response.status_code, 202)
+            data = response.json()
+            fetch.assert_not_called()
+
+            status = self.client.get(data['status_url']).json()
+            self.assertEqual(status['job']['status'], Job.STATUS_QUEUED)
+            self.assertFalse(status['job']['finished'])
+
+            # A second click shares the queued job
+            self.assertEqual(self.client.post(reverse('solarflares:refresh')).json()['job_id'], data['job_id'])
+
+            self.assertEqual(work(burst=True), 1)
+        fetch.assert_called_once()
+
+        status = self.client.get(data['status_url']).json()['job']
+        self.assertEqual(status['status'], Job.STATUS_SUCCEEDED)
+        self.assertTrue(status['finished'])
+        self.assertEqual(status['result']['flares_created'], 3)
+        self.assertEqual(status['progress'], 'Fetching solar flares from NASA DONKI')
+
+    def test_asteroid_refresh_result_keeps_failed_windows(self):
+        stats = {**AsteroidService._empty_stats(), 'windows': 1, 'skipped_days': 0,
+                 'failed_windows': [(date(2024, 1, 1), date(2024, 1, 7))]}
+        with mock.patch.object(AsteroidService, 'fetch_asteroids', return_value=stats):
+            queued = enqueue('asteroids.refresh')
+            self.assertEqual(work(burst=True), 1)
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual(queued.result['stats']['failed_windows'], [['2024-01-01', '2024-01-07']])
+
+    def test_result_that_cannot_be_stored_fails_the_job(self):
+        queued = enqueue('tests.unstorable')
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(work(burst=True), 1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.STATUS_FAILED)
+        self.assertIn('Result could not be stored', queued.error)
+        self.assertIsNotNone(queued.finished_at)
+
+    def test_unknown_job_is_404(self):
+        response = self.client.get(reverse('core:job_status', args=[999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.json()['success'])
+
+    def test_job_is_claimed_by_one_worker(self):
+        queued = enqueue('tests.flaky')
+        claimed = claim_job('host-a:1')
+        self.assertEqual(claimed.pk, queued.pk)
+        self.assertEqual((claimed.status, claimed.worker, claimed.attempts), (Job.STATUS_RUNNING, 'host-a:1', 1))
+        self.assertIsNone(claim_job('host-b:2'))
+
+    def test_lost_claim_moves_on_to_next_job(self):
+        first, second = enqueue('tests.flaky'), enqueue('tests.flaky')
+        update = QuerySet.update
+        raced = []
+
+        def update_after_rival(queryset, **fields):
+            if not raced:
+                # Another worker claims the first job between read and update
+                raced.append(update(Job.objects.filter(pk=first.pk), status=Job.STATUS_RUNNING, worker='host-b:2'))
+            return update(queryset, **fields)
+
+        with mock.patch.object(QuerySet, 'update', update_after_rival):
+            claimed = claim_job('host-a:1')
+        self.assertEqual(claimed.pk, second.pk)
+        self.assertEqual(Job.objects.get(pk=first.pk).worker, 'host-b:2')
+
+    def test_failed_attempt_is_retried_then_succeeds(self):
+        queued = enqueue('tests.flaky', {'fail_times': 1})
+        self.assertEqual(work(burst=True), 2)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Job.STATUS_SUCCEEDED, 2))
+        self.assertEqual(queued.result, {'attempts': 2})
+
+    def test_job_fails_once_out_of_attempts(self):
+        queued = enqueue('tests.flaky', {'fail_times': 5})
+        work(burst=True)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Job.STATUS_FAILED, 2))
+        self.assertEqual(queued.error, 'NASA is down')
+        self.assertIsNotNone(queued.finished_at)
+
+    def test_abandoned_job_is_requeued(self):
+        queued = enqueue('tests.flaky')
+        claim_job('crashed:1')
+        later = timezone.now() + timedelta(seconds=61)
+        self.assertEqual(requeue_abandoned(now=later), 1)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.worker), (Job.STATUS_QUEUED, ''))
+
+        # The crashed worker's late result does not overwrite the new run
+        stale = claim_job('host-a:1', now=later)
+        stale.worker = 'crashed:1'
+        run_job(stale)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.worker), (Job.STATUS_RUNNING, 'host-a:1'))
+
+    def test_run_worker_command_drains_queue(self):
+        enqueue('tests.flaky')
+        enqueue('tests.flaky')
+        out = io.StringIO()
+        call_command('run_worker', '--burst', stdout=out)
+        self.assertIn('stopped after 2 jobs', out.getvalue())
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_SUCCEEDED).count(), 2)
+
+
+class ChartCacheTests(TestCase):
+    """
+    Serialized charts are kept in a bounded LRU per source data version
+    """
+
+    def setUp(self):
+        chart_cache.clear()
+        self.addCleanup(chart_cache.clear)
+
+    def test_eviction_keeps_most_recently_used(self):
+        charts = ChartCache(max_entries=3)
+        for key in 'abc':
+            charts.set(key, key.upper())
+        # Reading "a" makes "b" the least recently used entry
+        self.assertEqual(charts.get('a'), ('A', True))
+        charts.set('d', 'D')
+        self.assertEqual(len(charts), 3)
+        self.assertEqual(charts.get('b'), (None, False))
+        self.assertEqual([charts.get(key) for key in 'acd'], [('A', True), ('C', True), ('D', True)])
+
+        charts.set('e', 'E')
+        self.assertEqual(len(charts), 3)
+        self.assertEqual(charts.get('a'), (None, False))
+        self.assertEqual((charts.hits, charts.misses), (4, 2))
+
+    def test_hit_skips_build_until_data_version_changes(self):
+        build = mock.Mock(side_effect=['v1', 'v2'])
+        source = FetchLedger.SOURCE_DONKI_FLR
+
+        self.assertEqual(cached_chart('timeline', source, ('2024-01-01',), build), 'v1')
+        self.assertEqual(cached_chart('timeline', source, ('2024-01-01',), build), 'v1')
+        self.assertEqual(build.call_count, 1)
+
+        # Another source's ingest leaves the chart alone
+        bump_data_version(FetchLedger.SOURCE_NEOWS)
+        self.assertEqual(cached_chart('timeline', source, ('2024-01-01',), build), 'v1')
+        self.assertEqual(build.call_count, 1)
+
+        bump_data_version(source)
+        self.assertEqual(cached_chart('timeline', source, ('2024-01-01',), build), 'v2')
+        self.assertEqual(cached_chart('timeline', source, ('2024-01-01',), build), 'v2')
+        self.assertEqual(build.call_count, 2)
+
+
+class DownsamplingTests(SimpleTestCase):
+    """
+    Chart series are thinned to the point budget without losing their shape
+    """
+
+    def setUp(self):
+        self.x = list(range(1000))
+        self.y = [math.sin(i / 20) * (i % 37) for i in self.x]
+
+    def test_lttb_keeps_ends_and_orders_indices(self):
+        for threshold in (3, 4, 10, 99, 500, 999):
+            with self.subTest(threshold=threshold):
+                indices = lttb(self.x, self.y, threshold)
+                self.assertLessEqual(len(indices), threshold)
+                self.assertEqual((indices[0], indices[-1]), (0, 999))
+                self.assertTrue(all(a < b for a, b in zip(indices, indices[1:])))
+
+    def test_lttb_small_thresholds(self):
+        self.assertEqual(lttb(self.x[:5], self.y[:5], 5), [0, 1, 2, 3, 4])
+        self.assertEqual(lttb(self.x[:5], self.y[:5], 50), [0, 1, 2, 3, 4])
+        self.assertEqual(lttb(self.x, self.y, 2), [0, 999])
+        self.assertEqual(lttb(self.x, self.y, 1), [0])
+        self.assertEqual(lttb(self.x, self.y, 0), [])
+
+    def test_lttb_keeps_spike(self):
+        y = [0.0] * 1000
+        y[500] = 100.0
+        self.assertIn(500, lttb(self.x, y, 20))
+
+    def test_density_bin_keeps_groups_and_counts(self):
+        groups = [i % 50 == 0 for i in self.x]
+        indices, counts = density_bin(self.x, self.y, 200, groups=groups)
+        self.assertEqual(sum(counts), 1000)
+        self.assertEqual(len(indices), len(counts))
+        self.assertEqual({groups[i] for i in indices}, {True, False})
+        self.assertLessEqual(len(indices), 200)
+        self.assertGreater(len(indices), 50)
+        self.assertEqual(indices, sorted(indices))
+
+    def test_density_bin_under_budget_keeps_everything(self):
+        self.assertEqual(density_bin(self.x[:10], self.y[:10], 10), (list(range(10)), [1] * 10))
+
+    def test_density_bin_log_x_puts_non_positive_values_leftmost(self):
+        x = [0.0, -5.0] + [10 ** (i / 100) for i in range(1, 999)]
+        y = [0.0] * 1000
+        indices, counts = density_bin(x, y, 10, log_x=True)
+        self.assertEqual(sum(counts), 1000)
+        # Three columns evenly spaced in log10(x); the non-positive values
+        # land in the first one instead of stretching the axis to -5
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(len(counts), 3)
+        self.assertLessEqual(max(counts) - min(counts), 3)
+
+
+class DataCacheTests(TestCase):
+    """
+    Cached contexts and responses follow the data version of their source
+    """
+
+    def setUp(self):
+        cache.clear()
+        cache_stats.clear()
+
+    def test_value_is_built_once_per_data_version(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            return {'count': len(builds)}
+
+        source = FetchLedger.SOURCE_DONKI_FLR
+        self.assertEqual(cached('test', [source], ('a',), build), {'count': 1})
+        self.assertEqual(cached('test', [source], ('a',), build), {'count': 1})
+        self.assertEqual(cached('test', [source], ('b',), build), {'count': 2})
+        self.assertEqual(cache_stats.snapshot()['test'], {'hits': 1, 'misses': 2})
+
+        # An ingest of another source leaves the entry alone
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_data_version(FetchLedger.SOURCE_NEOWS)
+        self.assertEqual(cached('test', [source], ('a',), build), {'count': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_data_version(source)
+        self.assertEqual(cached('test', [source], ('a',), build), {'count': 3})
+
+    def test_ingest_drops_entries_of_the_source(self):
+        source = FetchLedger.SOURCE_APOD
+        cached('test', [source], ('a',), lambda: 'old')
+        self.assertEqual(len(cache.get(f'data-cache-index:{source}')), 1)
+        self.assertEqual(drop_source(source), 1)
+        self.assertIsNone(cache.get(f'data-cache-index:{source}'))
+
+    def test_json_api_responses_are_cached_until_ingest(self):
+        APOD.objects.create(date=date(2024, 1, 1), title='Aurora', explanation='', url='https://example.com/a.jpg')
+        url = reverse('apod:search_api')
+        first = self.client.get(url, {'q': 'aurora'}).json()
+        self.assertEqual(first['count'], 1)
+
+        # Served from the cache: only the data version is read, for the
+        # response's validators and for the cache key
+        APOD.objects.create(date=date(2024, 1, 2), title='Aurora Again', explanation='', url='https://example.com/b.jpg')
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url, {'q': 'aurora'}).json(), first)
+
+        DataVersion.objects.create(source=FetchLedger.SOURCE_APOD, version=1)
+        self.assertEqual(self.client.get(url, {'q': 'aurora'}).json()['count'], 2)
+        self.assertEqual(
+            cache_stats.snapshot()['response:apod.views.apod_search_api'], {'hits': 1, 'misses': 2}
+        )
+
+    def test_error_responses_are_not_cached(self):
+        url = reverse('asteroids:search_api')
+        with mock.patch('asteroids.views.search_asteroids', side_effect=RuntimeError('boom')):
+            self.assertFalse(self.client.get(url, {'q': 'eros'}).json()['success'])
+        self.assertTrue(self.client.get(url, {'q': 'eros'}).json()['success'])
+
+    def test_dashboard_context_is_cached(self):
+        url = reverse('solarflares:home')
+        self.client.get(url)
+        with self.assertNumQueries(5):
+            # The data versions of the response validators, the cached
+            # context and the two charts, and the breaker state
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(cache_stats.snapshot()['solarflares:home'], {'hits': 1, 'misses': 1})
+
+        data = self.client.get(reverse('core:health')).json()
+        self.assertEqual(data['cache']['namespaces']['solarflares:home'], {'hits': 1, 'misses': 1})
+
+
+@override_settings(JOB_EMBEDDED_WORKER=False)
+class ConditionalGetTests(TestCase):
+    """
+    Pages and JSON endpoints answer revalidations with 304 until their data changes
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_dashboard_is_not_modified_until_ingest(self):
+        url = reverse('solarflares:home')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+        # Answered from the data version alone, before charts or lists are built
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_data_version(FetchLedger.SOURCE_DONKI_FLR)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_daily_validators_change_at_midnight(self):
+        source = FetchLedger.SOURCE_NEOWS
+        self.assertEqual(source_validators([source]), source_validators([source]))
+        today = source_validators([source], daily=True)
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(days=1)):
+            tomorrow = source_validators([source], daily=True)
+        self.assertNotEqual(today[0], tomorrow[0])
+        self.assertGreater(tomorrow[1], today[1])
+
+        with override_settings(APP_RELEASE='next-deploy'):
+            self.assertNotEqual(source_validators([source], daily=True)[0], today[0])
+
+    def test_error_pages_are_not_validated(self):
+        with mock.patch('solarflares.views.SolarFlareService', side_effect=RuntimeError('boom')):
+            response = self.client.get(reverse('solarflares:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertIn('no-store', response['Cache-Control'])
+
+    def test_json_search_and_export_are_not_modified(self):
+        APOD.objects.create(date=date(2024, 1, 1), title='Aurora', explanation='', url='https://example.com/a.jpg')
+        for url in (reverse('apod:search_api') + '?q=aurora', reverse('apod:export') + '?format=csv'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+        # A bad export request is not validated
+        response = self.client.get(reverse('apod:export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response)
+
+    def test_job_status_is_not_modified_until_it_changes(self):
+        queued = enqueue('tests.flaky')
+        url = reverse('core:job_status', args=[queued.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        work(burst=True)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['job']['status'], Job.STATUS_SUCCEEDED)
+
+
+class RequestMetricsTests(TestCase):
+    """
+    Requests are timed per view and exposed in the Prometheus text format
+    """
+
+    def setUp(self):
+        cache.clear()
+        chart_cache.clear()
+        view_metrics.clear()
+
+    def test_request_breakdown_is_recorded_per_view(self):
+        with override_settings(SERVER_TIMING=True):
+            response = self.client.get(reverse('solarflares:home'))
+        timing = response['Server-Timing']
+        for part in ('db;dur=', 'template;dur=', 'chart;dur=', 'http;dur=', 'total;dur='):
+            self.assertIn(part, timing)
+
+        stats = view_metrics.snapshot()[('solarflares:home', 'GET')]
+        self.assertEqual((stats['count'], stats['statuses']), (1, {200: 1}))
+        self.assertGreater(stats['db_queries'], 0)
+        self.assertGreater(stats['seconds']['template'], 0)
+        self.assertGreater(stats['seconds']['chart'], 0)
+        self.assertEqual(stats['seconds']['http'], 0)
+
+        self.assertNotIn('Server-Timing', self.client.get(reverse('solarflares:home')))
+        self.client.get('/no-such-page/')
+        self.assertIn(('unresolved', 'GET'), view_metrics.snapshot())
+
+    def test_metrics_endpoint_uses_prometheus_text_format(self):
+        self.client.get(reverse('solarflares:home'))
+        response = self.client.get(reverse('core:metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE django_http_request_duration_seconds histogram', body)
+        self.assertIn('django_http_request_duration_seconds_bucket{view="solarflares:home",method="GET",le="+Inf"} 1', body)
+        self.assertIn('django_http_request_duration_seconds_count{view="solarflares:home",method="GET"} 1', body)
+        self.assertIn('django_http_requests_total{view="solarflares:home",method="GET",status="200"} 1', body)
+        self.assertIn('nasa_source_up{source="donki_flr"} 1', body)
+        self.assertIn('jobs{status="queued"} 0', body)
+
+        buckets = [
+            int(line.rsplit(' ', 1)[1]) for line in body.splitlines()
+            if line.startswith('django_http_request_duration_seconds_bucket{view="solarflares:home"')
+        ]
+        self.assertEqual(buckets, sorted(buckets))
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_token_is_required_when_set(self):
+        url = reverse('core:metrics')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 200)
+
+
+@override_settings(NASA_API_KEYS=['key'])
+class IngestRunTests(TestCase):
+    """
+    Every fetch of a source window is recorded as an IngestRun
+    """
+
+    def setUp(self):
+        self.server = start_stand_in_nasa(self)
+        patcher = mock.patch.object(
+            SolarFlareService, 'BASE_URL', f'http://127.0.0.1:{self.server.server_port}/DONKI/FLR'
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.start = date(2024, 1, 1)
+        self.end = date(2024, 1, 2)
+
+    def test_fetch_records_timings_counts_and_dropped_records(self):
+        flares = make_donki_flares(5, start_date=self.start)
+        flares.append({'beginTime': '2024-01-01T00:00Z'})
+        self.server.bodies = {'/DONKI/FLR': json.dumps(flares).encode()}
+
+        for stream in (False, True):
+            SolarFlareService()._fetch_window(self.start, self.end, stream=stream)
+
+        first, second = IngestRun.objects.order_by('started_at')
+        self.assertEqual((first.status, first.inserted, first.skipped), (IngestRun.STATUS_SUCCESS, 5, 1))
+        # Flares stored by the first run are skipped by the second
+        self.assertEqual((second.inserted, second.skipped), (0, 6))
+        for run in (first, second):
+            self.assertEqual(run.source, FetchLedger.SOURCE_DONKI_FLR)
+            self.assertEqual(run.bytes_received, len(self.server.bodies['/DONKI/FLR']))
+            self.assertGreater(run.http_seconds, 0)
+            self.assertGreater(run.db_seconds, 0)
+            self.assertEqual(run.record_error_count, 1)
+            self.assertEqual(run.record_errors, ['Flare without flrID'])
+
+    def test_failed_fetch_is_recorded_as_error(self):
+        self.server.responses = [(404, {})]
+        SolarFlareService()._fetch_window(self.start, self.end)
+
+        run = IngestRun.objects.get()
+        self.assertEqual(run.status, IngestRun.STATUS_ERROR)
+        self.assertIn('404', run.error)
+        self.assertEqual(run.records, 0)
+
+    def test_open_circuit_is_recorded_as_skipped(self):
+        with self.assertRaises(CircuitOpenError):
+            with IngestRecorder(FetchLedger.SOURCE_NEOWS, self.start, self.end):
+                raise CircuitOpenError(FetchLedger.SOURCE_NEOWS, timezone.now())
+        self.assertEqual(IngestRun.objects.get().status, IngestRun.STATUS_SKIPPED)
+
+    def test_record_error_sample_is_capped(self):
+        with IngestRecorder(FetchLedger.SOURCE_APOD, self.start, self.end):
+            for i in range(30):
+                record_error(f'bad record {i}' + 'x' * 400)
+        # Outside a recorder reports are ignored
+        record_error('not recorded')
+
+        run = IngestRun.objects.get()
+        self.assertEqual(run.record_error_count, 30)
+        self.assertEqual(len(run.record_errors), 20)
+        self.assertEqual(len(run.record_errors[0]), 300)
+
+    def test_admin_changelist_and_trends_render(self):
+        self.server.bodies = {'/DONKI/FLR': json.dumps(make_donki_flares(3, start_date=self.start)).encode()}
+        SolarFlareService()._fetch_window(self.start, self.end)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+        response = self.client.get(reverse('admin:core_ingestrun_changelist'))
+        self.assertContains(response, reverse('admin:core_ingestrun_trends'))
+
+        response = self.client.get(reverse('admin:core_ingestrun_trends'), {'days': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['days'], 7)
+        self.assertContains(response, 'DONKI Solar Flares')
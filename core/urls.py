@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('health/', views.health, name='health'),
+    path('jobs/<int:job_id>/', views.job_detail, name='job_status'),
+    path('metrics', views.metrics, name='metrics'),
+]
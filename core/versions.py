@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .cache import drop_source
+from .models import DataVersion
+
+
+def get_data_version(source):
+    """
+    Current data version of a source (0 before its first ingest)
+    """
+    return DataVersion.objects.filter(source=source).values_list('version', flat=True).first() or 0
+
+
+def bump_data_version(source):
+    """
+    Increment the data version of a source after ingest changed its data
+    """
+    with transaction.atomic():
+        updated = DataVersion.objects.filter(source=source).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            DataVersion.objects.get_or_create(source=source, defaults={'version': 1})
+    # Entries of the old version can no longer be read; free their space
+    transaction.on_commit(lambda: drop_source(source))
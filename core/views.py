@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.urls import reverse
+from .breaker import breaker_states
+from .cache import cache_stats
+from .charts import chart_cache
+from .conditional import make_etag, not_modified, set_validators
+from .http_client import nasa_client
+from .jobs import job_status
+from .metrics import metric_lines, request_metric_lines
+from .models import CircuitBreaker, Job
+
+
+def health(request):
+    """
+    JSON health report for monitoring: the circuit breaker of every NASA
+    source, plus this process's NASA calls per endpoint and per API key and
+    its cache hits and misses per namespace.
+    "degraded" means at least one source is being served from stored data;
+    the dashboard itself still answers, so the status code stays 200.
+    """
+    sources = breaker_states()
+    client = nasa_client()
+    degraded = any(state['state'] != CircuitBreaker.STATE_CLOSED for state in sources.values())
+    return JsonResponse({
+        'status': 'degraded' if degraded else 'ok',
+        'sources': sources,
+        'nasa_api': {
+            'endpoints': client.stats(),
+            'keys': client.key_stats(),
+        },
+        'cache': {
+            'backend': settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1],
+            'namespaces': cache_stats.snapshot(),
+            'charts': {'hits': chart_cache.hits, 'misses': chart_cache.misses, 'entries': len(chart_cache)},
+        },
+    })
+
+
+def job_accepted(job):
+    """
+    202 response for a queued job, pointing the caller at its status URL
+    """
+    return JsonResponse({
+        'success': True,
+        'job_id': job.pk,
+        'status': job.status,
+        'status_url': reverse('core:job_status', args=[job.pk]),
+    }, status=202)
+
+
+def job_detail(request, job_id):
+    """
+    JSON status of a background job: progress while it runs, then its
+    result or error. Front-ends poll it until ``job.finished`` is true;
+    polls made while nothing changed are answered with 304.
+    """
+    try:
+        job = Job.objects.get(pk=job_id)
+    except Job.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': f'Job {job_id} not found'
+        }, status=404)
+    
+    # Progress reports also move the heartbeat; results come with a new status
+    etag = make_etag(job.pk, job.status, job.attempts, job.progress, job.heartbeat_at, job.finished_at)
+    response = not_modified(request, etag)
+    if response is None:
+        response = set_validators(JsonResponse({
+            'success': True,
+            'job': job_status(job),
+        }), etag)
+    return response
+
+
+def metrics(request):
+    """
+    Prometheus metrics of this process: latency, queries and time spent per
+    view (core.metrics), NASA calls, cache hits, plus circuit breakers and
+    queued jobs from the database. Each worker process reports its own
+    counters.
+    """
+    if settings.METRICS_TOKEN and not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'
+    ):
+        return HttpResponse('Invalid metrics token', status=401, content_type='text/plain')
+
+    client = nasa_client()
+    endpoints = client.stats()
+    cache_counts = cache_stats.snapshot()
+    jobs = dict(Job.objects.order_by().values_list('status').annotate(count=Count('id')))
+    lines = request_metric_lines()
+    lines += metric_lines('nasa_api_calls_total', 'counter', 'NASA API calls per endpoint', [
+        ('', {'endpoint': path}, timing['calls']) for path, timing in endpoints.items()
+    ])
+    lines += metric_lines('nasa_api_errors_total', 'counter', 'Failed NASA API calls per endpoint', [
+        ('', {'endpoint': path}, timing['errors']) for path, timing in endpoints.items()
+    ])
+    lines += metric_lines('nasa_api_seconds_total', 'counter', 'Seconds waited on NASA per endpoint', [
+        ('', {'endpoint': path}, timing['total_seconds']) for path, timing in endpoints.items()
+    ])
+    lines += metric_lines('nasa_api_key_requests_total', 'counter', 'NASA API requests per masked key', [
+        ('', {'key': key}, state['requests']) for key, state in client.key_stats().items()
+    ])
+    lines += metric_lines('cache_requests_total', 'counter', 'Data cache lookups per namespace', [
+        ('', {'namespace': namespace, 'result': result}, counts[count])
+        for namespace, counts in cache_counts.items() for result, count in (('hit', 'hits'), ('miss', 'misses'))
+    ])
+    lines += metric_lines('chart_cache_requests_total', 'counter', 'Chart cache lookups', [
+        ('', {'result': 'hit'}, chart_cache.hits), ('', {'result': 'miss'}, chart_cache.misses),
+    ])
+    lines += metric_lines('nasa_source_up', 'gauge', '1 while the circuit breaker of a source is closed', [
+        ('', {'source': source}, int(state['state'] == CircuitBreaker.STATE_CLOSED))
+        for source, state in breaker_states().items()
+    ])
+    lines += metric_lines('jobs', 'gauge', 'Background jobs per status', [
+        ('', {'status': status}, jobs.get(status, 0)) for status, _ in Job.STATUS_CHOICES
+    ])
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,20 @@
+from core.breaker import source_unavailable
+from core.jobs import job
+from core.models import FetchLedger
+from .services import SolarFlareService
+
+
+@job('solarflares.refresh')
+def refresh(progress):
+    """
+    Fetch the last 30 days of solar flares for the refresh button on the
+    solar flare page
+    """
+    progress('Fetching solar flares from NASA DONKI')
+    flares_created = SolarFlareService().fetch_solar_flares()
+    
+    return {
+        'flares_created': flares_created,
+        'stale': source_unavailable(FetchLedger.SOURCE_DONKI_FLR),
+        'message': f'Successfully fetched {flares_created} new solar flares',
+    }
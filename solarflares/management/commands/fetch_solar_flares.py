@@ -1,4 +1,7 @@
+from datetime import timedelta
+
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from solarflares.services import SolarFlareService
 
 
@@ -12,6 +15,16 @@ class Command(BaseCommand):
             default=30,
             help='Number of days to fetch (default: 30)'
         )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Fetch the whole range again, even if the fetch ledger has it'
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='Parse responses incrementally to keep memory flat on large ranges'
+        )
 
     def handle(self, *args, **options):
         days = options['days']
@@ -21,7 +34,9 @@ class Command(BaseCommand):
         )
         
         service = SolarFlareService()
-        flares_created = service.fetch_solar_flares()
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=days)
+        flares_created = service.fetch_solar_flares(start_date, end_date, force=options['force'], stream=options['stream'])
         
         self.stdout.write(
             self.style.SUCCESS(f'Successfully fetched {flares_created} solar flares')
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solarflares', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlareDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('flare_class', models.CharField(choices=[('A', 'A-Class'), ('B', 'B-Class'), ('C', 'C-Class'), ('M', 'M-Class'), ('X', 'X-Class')], max_length=1)),
+                ('flare_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Daily Flare Rollup',
+                'verbose_name_plural': 'Daily Flare Rollups',
+                'ordering': ['day', 'flare_class'],
+                'unique_together': {('day', 'flare_class')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solarflares', '0002_flaredailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='solarflare',
+            index=models.Index(fields=['peak_time'], name='flare_peak_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solarflare',
+            index=models.Index(fields=['flare_class', 'peak_time'], name='flare_class_peak_idx'),
+        ),
+    ]
@@ -31,6 +31,10 @@ class SolarFlare(models.Model):
         ordering = ['-peak_time']
         verbose_name = "Solar Flare"
         verbose_name_plural = "Solar Flares"
+        indexes = [
+            models.Index(fields=['peak_time'], name='flare_peak_idx'),
+            models.Index(fields=['flare_class', 'peak_time'], name='flare_class_peak_idx'),
+        ]
 
     def __str__(self):
         return f"{self.flare_class}-Class Flare on {self.peak_time.strftime('%Y-%m-%d %H:%M')}"
@@ -46,3 +50,23 @@ class SolarFlare(models.Model):
         utc = pytz.timezone('UTC')
         local_tz = pytz.timezone(timezone_name)
         return self.peak_time.replace(tzinfo=utc).astimezone(local_tz)
+
+
+class FlareDailyRollup(models.Model):
+    """
+    Per-day, per-class flare counts, kept up to date by ingest so the
+    dashboard does not have to scan the SolarFlare table
+    """
+    day = models.DateField()
+    flare_class = models.CharField(max_length=1, choices=SolarFlare.FLARE_CLASS_CHOICES)
+    flare_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['day', 'flare_class']
+        verbose_name = "Daily Flare Rollup"
+        verbose_name_plural = "Daily Flare Rollups"
+        unique_together = ['day', 'flare_class']
+
+    def __str__(self):
+        return f"{self.day}: {self.flare_count} {self.flare_class}-Class"
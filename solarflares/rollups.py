@@ -0,0 +1,79 @@
+import logging
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+import pytz
+from core.dates import day_start
+from .models import FlareDailyRollup, SolarFlare
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_flare_rollups(days):
+    """
+    Recompute per-day, per-class flare counts for the span covering ``days``.
+
+    (day, class) pairs in the span that no longer have flares lose their
+    rollup row.
+    """
+    days = set(days)
+    if not days:
+        return 0
+    first_day, last_day = min(days), max(days)
+    
+    aggregates = SolarFlare.objects.filter(
+        peak_time__gte=day_start(first_day),
+        peak_time__lt=day_start(last_day + timedelta(days=1)),
+    ).annotate(
+        day=TruncDate('peak_time', tzinfo=pytz.UTC)
+    ).values('day', 'flare_class').annotate(
+        flare_count=Count('id')
+    ).order_by()
+    
+    rollups = [FlareDailyRollup(**row) for row in aggregates]
+    
+    with transaction.atomic():
+        FlareDailyRollup.objects.filter(day__gte=first_day, day__lte=last_day).delete()
+        FlareDailyRollup.objects.bulk_create(rollups)
+    
+    return len(rollups)
+
+
+def rebuild_rollups():
+    """
+    Rebuild every flare rollup from the raw table
+    """
+    with transaction.atomic():
+        FlareDailyRollup.objects.all().delete()
+        bounds = SolarFlare.objects.aggregate(first=Min('peak_time'), last=Max('peak_time'))
+        rows = 0
+        if bounds['first']:
+            rows = refresh_flare_rollups({
+                bounds['first'].astimezone(pytz.UTC).date(),
+                bounds['last'].astimezone(pytz.UTC).date(),
+            })
+    logger.info(f"Rebuilt solar flare rollups ({rows} day/class rows)")
+    return rows
+
+
+def daily_class_counts(start_day, end_day=None):
+    """
+    Return [(day, flare_class, count), ...] from the rollups for a day range
+    """
+    rollups = FlareDailyRollup.objects.filter(day__gte=start_day)
+    if end_day:
+        rollups = rollups.filter(day__lte=end_day)
+    return list(rollups.values_list('day', 'flare_class', 'flare_count'))
+
+
+def class_totals(start_day, end_day=None):
+    """
+    Return {flare_class: count} from the rollups for a day range
+    """
+    rollups = FlareDailyRollup.objects.filter(day__gte=start_day)
+    if end_day:
+        rollups = rollups.filter(day__lte=end_day)
+    return dict(
+        rollups.values('flare_class').annotate(total=Sum('flare_count')).order_by().values_list('flare_class', 'total')
+    )
@@ -1,13 +1,32 @@
 import requests
 import logging
+import tempfile
 from datetime import datetime, timedelta
-from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 import pytz
+from core.breaker import CircuitOpenError, circuit_breaker
+from core.dates import day_start, split_windows
+from core.http_client import nasa_client
+from core.ingest import IngestRecorder, count, counting_chunks, phase, received, record_error, storing
+from core.ledger import plan_windows, record_fetch
+from core.models import FetchLedger
+from core.singleflight import single_flight
+from core.streaming import CHUNK_SIZE, batched, iter_file_chunks, iter_json_items
+from core.versions import bump_data_version
 from .models import SolarFlare
+from .rollups import refresh_flare_rollups
 
 logger = logging.getLogger(__name__)
 
+# Granularity of fetch ledger entries; DONKI itself accepts longer ranges
+LEDGER_WINDOW_DAYS = 30
+
+BULK_BATCH_SIZE = 500
+
+# Streamed DONKI bodies larger than this are spooled to disk
+SPOOL_MAX_SIZE = 1024 * 1024
+
 
 class SolarFlareService:
     """
@@ -16,56 +35,182 @@ class SolarFlareService:
     BASE_URL = "https://api.nasa.gov/DONKI/FLR"
     
     def __init__(self, api_key=None):
-        self.api_key = api_key or getattr(settings, 'NASA_API_KEY', 'DEMO_KEY')
+        # None lets the shared client pick a key from the NASA_API_KEYS pool
+        self.api_key = api_key
     
-    def fetch_solar_flares(self, start_date=None, end_date=None):
+    def fetch_solar_flares(self, start_date=None, end_date=None, force=False, stream=False):
         """
-        Fetch solar flare data for a date range
+        Fetch solar flare data for a date range.
+
+        Only windows the fetch ledger reports as missing or stale are
+        requested unless ``force`` is set. ``stream=True`` spools the
+        response body to a temporary file and parses it incrementally from
+        there instead of decoding it in one piece.
         """
         if start_date is None:
             start_date = timezone.now().date() - timedelta(days=30)
         if end_date is None:
             end_date = timezone.now().date()
         
-        params = {
-            'api_key': self.api_key,
-            'startDate': start_date.strftime('%Y-%m-%d'),
-            'endDate': end_date.strftime('%Y-%m-%d')
-        }
+        # Concurrent calls for the same range share one run; a caller from
+        # another process waits for it and then finds the windows in the ledger
+        return single_flight(
+            f"{FetchLedger.SOURCE_DONKI_FLR}:{start_date}:{end_date}:{'force' if force else 'plan'}",
+            lambda: self._fetch_range(start_date, end_date, force, stream),
+        )
+    
+    def _fetch_range(self, start_date, end_date, force, stream):
+        if force:
+            # Same boundaries as planned windows, so the ledger entries line up
+            windows = split_windows(start_date, end_date, LEDGER_WINDOW_DAYS)
+        else:
+            windows = plan_windows(FetchLedger.SOURCE_DONKI_FLR, start_date, end_date, LEDGER_WINDOW_DAYS)
         
+        flares_created = 0
+        for window_start, window_end in windows:
+            flares_created += self._fetch_window(window_start, window_end, stream=stream)
+        
+        return flares_created
+    
+    def _fetch_window(self, start_date, end_date, stream=False):
+        """
+        Fetch one DONKI window, store new flares and record it in the ledger
+        """
         try:
-            response = requests.get(self.BASE_URL, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            flares_created = 0
-            for flare_data in data:
-                try:
-                    flare = self._create_flare_from_data(flare_data)
-                    if flare:
-                        flares_created += 1
-                except Exception as e:
-                    logger.error(f"Error processing flare data: {e}")
-                    continue
+            # Timings, counts and dropped records go to an IngestRun
+            with IngestRecorder(FetchLedger.SOURCE_DONKI_FLR, start_date, end_date):
+                if stream:
+                    # The body is read to the end before storing starts, so the
+                    # write transaction never waits on NASA's transfer
+                    with self._download_flares(start_date, end_date) as body:
+                        flares_created = self.store_window(
+                            start_date, end_date, iter_json_items(iter_file_chunks(body))
+                        )
+                else:
+                    flares_created = self.store_window(
+                        start_date, end_date, self.request_flares(start_date, end_date)
+                    )
             
             logger.info(f"Successfully fetched and saved {flares_created} solar flares")
             return flares_created
             
+        except CircuitOpenError as e:
+            logger.warning(f"Skipping solar flares {start_date} to {end_date}: {e}")
+            return 0
         except requests.RequestException as e:
             logger.error(f"Error fetching solar flares: {e}")
+            record_fetch(FetchLedger.SOURCE_DONKI_FLR, start_date, end_date, error=e)
             return 0
         except Exception as e:
             logger.error(f"Unexpected error processing solar flares: {e}")
+            record_fetch(FetchLedger.SOURCE_DONKI_FLR, start_date, end_date, error=e)
             return 0
     
-    def _create_flare_from_data(self, flare_data):
+    def _params(self, start_date, end_date):
+        return {
+            'api_key': self.api_key,
+            'startDate': start_date.strftime('%Y-%m-%d'),
+            'endDate': end_date.strftime('%Y-%m-%d')
+        }
+    
+    def request_flares(self, start_date, end_date):
         """
-        Create a SolarFlare object from API data
+        Request one DONKI window and return the decoded list of flares
         """
-        flare_id = flare_data.get('flrID')
+        with circuit_breaker(FetchLedger.SOURCE_DONKI_FLR):
+            response = nasa_client().get(self.BASE_URL, params=self._params(start_date, end_date), timeout=15)
+            response.raise_for_status()
+        received(len(response.content))
+        with phase('parse'):
+            return response.json()
+    
+    def _download_flares(self, start_date, end_date):
+        """
+        Stream one DONKI window into a temporary file and return it rewound;
+        small bodies stay in memory, large ones spill to disk
+        """
+        body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        try:
+            with circuit_breaker(FetchLedger.SOURCE_DONKI_FLR), \
+                    nasa_client().get(
+                        self.BASE_URL, params=self._params(start_date, end_date), timeout=15, stream=True
+                    ) as response:
+                response.raise_for_status()
+                for chunk in counting_chunks(response.iter_content(CHUNK_SIZE)):
+                    body.write(chunk)
+        except Exception:
+            body.close()
+            raise
+        body.seek(0)
+        return body
+    
+    def store_window(self, start_date, end_date, flares):
+        """
+        Store the flares of one DONKI window, record the window in the fetch
+        ledger and return the number of new flares
+        """
+        with storing():
+            flares_created, records = self.ingest_flares(flares)
+            record_fetch(FetchLedger.SOURCE_DONKI_FLR, start_date, end_date, records=records)
+        count(inserted=flares_created, skipped=records - flares_created)
+        return flares_created
+    
+    def ingest_flares(self, flares, batch_size=BULK_BATCH_SIZE):
+        """
+        Normalize DONKI flare records one at a time and insert new ones in
+        fixed-size batches inside one transaction.
+
+        Returns (flares_created, records_seen). Flares already stored are
+        left untouched.
+        """
+        seen = 0
+        flares_created = 0
+        
+        def rows():
+            nonlocal seen
+            for flare_data in flares:
+                seen += 1
+                try:
+                    row = self._flare_row(flare_data)
+                except Exception as e:
+                    logger.error(f"Error processing flare data: {e}")
+                    record_error(f"Error processing flare data: {e}")
+                    continue
+                if row:
+                    yield row
+        
+        affected_days = set()
         
-        # Check if flare already exists
-        if SolarFlare.objects.filter(flare_id=flare_id).exists():
+        with transaction.atomic():
+            for batch in batched(rows(), batch_size):
+                flares_created += self._insert_new_flares(batch, affected_days)
+            if flares_created:
+                refresh_flare_rollups(affected_days)
+                bump_data_version(FetchLedger.SOURCE_DONKI_FLR)
+        
+        return flares_created, seen
+    
+    def _insert_new_flares(self, rows, affected_days):
+        """
+        Insert the rows whose flare_id is not stored yet and return how
+        many; their peak days are added to ``affected_days``
+        """
+        by_id = {row['flare_id']: row for row in rows}
+        existing = set(
+            SolarFlare.objects.filter(flare_id__in=list(by_id)).values_list('flare_id', flat=True)
+        )
+        new_flares = [SolarFlare(**row) for flare_id, row in by_id.items() if flare_id not in existing]
+        SolarFlare.objects.bulk_create(new_flares, ignore_conflicts=True)
+        affected_days.update(flare.peak_time.astimezone(pytz.UTC).date() for flare in new_flares)
+        return len(new_flares)
+    
+    def _flare_row(self, flare_data):
+        """
+        Normalize one DONKI flare record into SolarFlare field values
+        """
+        flare_id = flare_data.get('flrID')
+        if not flare_id:
+            record_error("Flare without flrID")
             return None
         
         # Parse dates
@@ -75,26 +220,24 @@ class SolarFlareService:
         
         if not all([begin_time, peak_time, end_time]):
             logger.warning(f"Missing time data for flare {flare_id}")
+            record_error(f"Missing time data for flare {flare_id}")
             return None
         
         # Extract flare class from classType
-        class_type = flare_data.get('classType', '')
+        class_type = flare_data.get('classType') or ''
         flare_class = class_type[0] if class_type else 'A'
         
-        # Create the flare
-        flare = SolarFlare.objects.create(
-            flare_id=flare_id,
-            flare_class=flare_class,
-            begin_time=begin_time,
-            peak_time=peak_time,
-            end_time=end_time,
-            source_location=flare_data.get('sourceLocation', ''),
-            active_region_num=flare_data.get('activeRegionNum', ''),
-            linked_events=flare_data.get('linkedEvents', []),
-            instruments=flare_data.get('instruments', [])
-        )
-        
-        return flare
+        return {
+            'flare_id': flare_id,
+            'flare_class': flare_class,
+            'begin_time': begin_time,
+            'peak_time': peak_time,
+            'end_time': end_time,
+            'source_location': flare_data.get('sourceLocation') or '',
+            'active_region_num': str(flare_data.get('activeRegionNum') or ''),
+            'linked_events': flare_data.get('linkedEvents') or [],
+            'instruments': flare_data.get('instruments') or [],
+        }
     
     def _parse_datetime(self, date_string):
         """
@@ -124,9 +267,22 @@ class SolarFlareService:
         """
         start_date = timezone.now().date() - timedelta(days=days)
         return SolarFlare.objects.filter(
-            peak_time__date__gte=start_date
+            peak_time__gte=day_start(start_date)
         ).order_by('-peak_time')
     
+    def get_flares(self, flare_class=None, start_date=None, end_date=None):
+        """
+        Get flares filtered by class and an inclusive peak date range
+        """
+        flares = SolarFlare.objects.all()
+        if flare_class:
+            flares = flares.filter(flare_class=flare_class)
+        if start_date:
+            flares = flares.filter(peak_time__gte=day_start(start_date))
+        if end_date:
+            flares = flares.filter(peak_time__lt=day_start(end_date + timedelta(days=1)))
+        return flares.order_by('-peak_time')
+    
     def get_flares_by_class(self, flare_class):
         """
         Get flares filtered by class
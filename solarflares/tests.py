@@ -1,3 +1,221 @@
+import csv
+import gzip
+import io
+import json
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlencode
+from unittest import skipUnless
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.utils.html import escape
+from core.pagination import paginate_keyset, seek
+from core.sample_payloads import make_donki_flares
+from core.testing import QueryPlanAssertions
+from .models import FlareDailyRollup, SolarFlare
+from .rollups import rebuild_rollups, refresh_flare_rollups
+from .services import SolarFlareService
 
-# Create your tests here.
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class DashboardQueryPlanTests(QueryPlanAssertions, TestCase):
+    """
+    Dashboard and list queries must use an index search, not a full table scan
+    """
+
+    def setUp(self):
+        self.service = SolarFlareService(api_key='TEST')
+
+    def test_recent_flares(self):
+        self.assertIndexSearch(self.service.get_recent_flares(days=30))
+
+    def test_flares_by_class(self):
+        self.assertIndexSearch(self.service.get_flares_by_class('M'))
+
+    def test_list_date_range(self):
+        self.assertIndexSearch(
+            self.service.get_flares(start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+        )
+
+    def test_list_class_and_date_range(self):
+        self.assertIndexSearch(
+            self.service.get_flares(flare_class='X', start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+        )
+
+
+class KeysetPaginationTests(QueryPlanAssertions, TestCase):
+    """
+    Cursor pagination must visit every row exactly once in both directions,
+    including rows that share a sort key
+    """
+
+    ordering = ('-peak_time', '-id')
+
+    @classmethod
+    def setUpTestData(cls):
+        base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        SolarFlare.objects.bulk_create(
+            SolarFlare(
+                flare_id=f'FLR-{n}',
+                flare_class='MX'[n % 2],
+                begin_time=base,
+                # Groups of three flares share a peak time
+                peak_time=base + timedelta(hours=n // 3),
+                end_time=base + timedelta(days=1),
+            )
+            for n in range(25)
+        )
+
+    def setUp(self):
+        # Views cache their data per data version, which tests change directly
+        cache.clear()
+
+    def walk(self, queryset, per_page=4):
+        pages = [paginate_keyset(queryset, ordering=self.ordering, per_page=per_page)]
+        while pages[-1].has_next:
+            pages.append(
+                paginate_keyset(queryset, pages[-1].next_cursor, ordering=self.ordering, per_page=per_page)
+            )
+        return pages
+
+    def test_forward_visits_every_row_in_order(self):
+        queryset = SolarFlare.objects.all()
+        pages = self.walk(queryset)
+        ids = [flare.id for page in pages for flare in page]
+        self.assertEqual(ids, list(queryset.order_by(*self.ordering).values_list('id', flat=True)))
+        self.assertFalse(pages[0].has_previous)
+        self.assertEqual([len(page) for page in pages], [4] * 6 + [1])
+
+    def test_previous_returns_the_same_pages(self):
+        queryset = SolarFlare.objects.filter(flare_class='M')
+        pages = self.walk(queryset)
+        for page, previous in zip(pages[1:], pages):
+            back = paginate_keyset(queryset, page.previous_cursor, ordering=self.ordering, per_page=4)
+            self.assertEqual([f.id for f in back], [f.id for f in previous])
+            self.assertEqual(back.has_previous, previous.has_previous)
+            self.assertTrue(back.has_next)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        first = paginate_keyset(SolarFlare.objects.all(), ordering=self.ordering, per_page=4)
+        page = paginate_keyset(SolarFlare.objects.all(), 'not-a-cursor', ordering=self.ordering, per_page=4)
+        self.assertEqual([f.id for f in page], [f.id for f in first])
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+    def test_deep_page_seeks_through_index(self):
+        flare = SolarFlare.objects.order_by(*self.ordering)[20]
+        values = [flare.peak_time, flare.id]
+        self.assertIndexSearch(seek(SolarFlare.objects.all(), self.ordering, values))
+        self.assertIndexSearch(seek(SolarFlare.objects.filter(flare_class='X'), self.ordering, values, True))
+
+    def test_list_view_keeps_filters_in_cursor_links(self):
+        base = datetime(2023, 1, 1, tzinfo=timezone.utc)
+        SolarFlare.objects.bulk_create(
+            SolarFlare(flare_id=f'OLD-{n}', flare_class='M', begin_time=base, peak_time=base, end_time=base)
+            for n in range(50)
+        )
+        url = reverse('solarflares:list')
+        first = self.client.get(url, {'class': 'M'}).context['page']
+        self.assertEqual(len(first), 50)
+        response = self.client.get(url, {'class': 'M', 'cursor': first.next_cursor})
+        self.assertEqual(len(response.context['page']), 13)
+        self.assertTrue(all(flare.flare_class == 'M' for flare in response.context['page']))
+        previous = urlencode({'class': 'M', 'cursor': response.context['page'].previous_cursor})
+        self.assertContains(response, escape(f'?{previous}'))
+
+
+class ExportTests(TestCase):
+    """
+    The export endpoint streams every matching row in the requested format
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        base = datetime(2024, 3, 1, tzinfo=timezone.utc)
+        SolarFlare.objects.bulk_create(
+            SolarFlare(
+                flare_id=f'FLR-{n}',
+                flare_class='CMX'[n % 3],
+                begin_time=base,
+                peak_time=base + timedelta(days=n),
+                end_time=base + timedelta(days=n, hours=1),
+                instruments=[{'displayName': 'GOES-P: EXIS 1.0-8.0'}],
+            )
+            for n in range(30)
+        )
+
+    def export(self, **params):
+        response = self.client.get(reverse('solarflares:export'), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson_applies_list_filters(self):
+        response, body = self.export(**{'class': 'M', 'start_date': '2024-03-10'})
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual([row['flare_id'] for row in rows], [f'FLR-{n}' for n in (28, 25, 22, 19, 16, 13, 10)])
+        self.assertEqual(rows[0]['peak_time'], '2024-03-29T00:00:00+00:00')
+
+    def test_csv_with_gzip(self):
+        response, body = self.export(format='csv', gzip='true')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('solar_flares.csv.gz', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(body).decode())))
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(json.loads(rows[0]['instruments']), [{'displayName': 'GOES-P: EXIS 1.0-8.0'}])
+
+    def test_csv_without_rows_has_header(self):
+        _, body = self.export(format='csv', start_date='2030-01-01')
+        self.assertTrue(body.decode().startswith('flare_id,flare_class,begin_time'))
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse('solarflares:export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FlareRollupTests(TestCase):
+    """
+    Per-day, per-class rollups match a GROUP BY over the raw flares
+    """
+
+    def setUp(self):
+        SolarFlareService(api_key='TEST').ingest_flares(make_donki_flares(200, start_date=date(2024, 1, 1)))
+
+    def raw_counts(self):
+        return dict(Counter(
+            (flare.peak_time.astimezone(timezone.utc).date(), flare.flare_class) for flare in SolarFlare.objects.all()
+        ))
+
+    def rollup_counts(self):
+        return {
+            (day, flare_class): count
+            for day, flare_class, count in FlareDailyRollup.objects.values_list('day', 'flare_class', 'flare_count')
+        }
+
+    def test_ingest_keeps_rollups_in_sync(self):
+        self.assertEqual(self.rollup_counts(), self.raw_counts())
+
+    def test_refresh_drops_pairs_without_flares(self):
+        day = date(2024, 1, 3)
+        gone = SolarFlare.objects.filter(peak_time__date=day).values_list('flare_class', flat=True).first()
+        SolarFlare.objects.filter(peak_time__date=day, flare_class=gone).delete()
+        untouched = {key: count for key, count in self.rollup_counts().items() if key[0] != day}
+
+        refresh_flare_rollups({day})
+        counts = self.rollup_counts()
+        self.assertNotIn((day, gone), counts)
+        self.assertEqual(counts, self.raw_counts())
+        self.assertEqual({key: count for key, count in counts.items() if key[0] != day}, untouched)
+
+    def test_rebuild_matches_raw_table(self):
+        FlareDailyRollup.objects.filter(day=date(2024, 1, 2)).update(flare_count=99)
+        FlareDailyRollup.objects.create(day=date(2030, 1, 1), flare_class='X', flare_count=5)
+        SolarFlare.objects.filter(peak_time__date=date(2024, 1, 5)).delete()
+
+        rebuild_rollups()
+        self.assertEqual(self.rollup_counts(), self.raw_counts())
+
+        SolarFlare.objects.all().delete()
+        self.assertEqual(rebuild_rollups(), 0)
+        self.assertFalse(FlareDailyRollup.objects.exists())
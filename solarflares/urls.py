@@ -6,5 +6,6 @@ app_name = 'solarflares'
 urlpatterns = [
     path('', views.solar_flares_home, name='home'),
     path('list/', views.solar_flares_list, name='list'),
+    path('export/', views.export_solar_flares, name='export'),
     path('refresh/', views.refresh_solar_flares, name='refresh'),
 ] 
\ No newline at end of file
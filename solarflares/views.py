@@ -2,14 +2,36 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.utils import PlotlyJSONEncoder
 import json
+from datetime import timedelta
 from django.shortcuts import render
 from django.http import JsonResponse
+from django.utils.cache import add_never_cache_headers
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from core.breaker import source_unavailable
+from core.cache import cached
+from core.charts import cached_chart
+from core.conditional import conditional_on
+from core.exports import export_response
+from core.jobs import enqueue
+from core.models import FetchLedger
+from core.pagination import paginate_keyset
+from core.views import job_accepted
 from .models import SolarFlare
+from .rollups import class_totals, daily_class_counts
 from .services import SolarFlareService
 
+FLARE_EXPORT_FIELDS = [
+    (name, name) for name in (
+        'flare_id', 'flare_class', 'begin_time', 'peak_time', 'end_time', 'source_location',
+        'active_region_num', 'linked_events', 'instruments',
+    )
+]
+
 
+@conditional_on(FetchLedger.SOURCE_DONKI_FLR, daily=True)
 def solar_flares_home(request):
     """
     Display solar flares dashboard with visualizations
@@ -17,18 +39,35 @@ def solar_flares_home(request):
     try:
         service = SolarFlareService()
         
-        # Get recent flares
-        recent_flares = service.get_recent_flares(days=30)
+        # Recent flares and the totals from the daily rollups are cached
+        # until the next DONKI ingest
+        start_day = timezone.now().date() - timedelta(days=30)
+        dashboard = cached(
+            'solarflares:home', [FetchLedger.SOURCE_DONKI_FLR], (start_day,),
+            lambda: {
+                'recent_flares': list(service.get_recent_flares(days=30)[:10]),
+                'class_counts': class_totals(start_day),
+            }
+        )
+        class_counts = dashboard['class_counts']
         
-        # Create visualizations
-        timeline_chart = create_flare_timeline(recent_flares)
-        class_distribution = create_flare_class_distribution(recent_flares)
+        # Create visualizations; cached until the next ingest
+        timeline_chart = cached_chart(
+            'flare_timeline', FetchLedger.SOURCE_DONKI_FLR, (start_day,),
+            lambda: create_flare_timeline(daily_class_counts(start_day))
+        )
+        class_distribution = cached_chart(
+            'flare_class_distribution', FetchLedger.SOURCE_DONKI_FLR, (start_day,),
+            lambda: create_flare_class_distribution(class_counts)
+        )
         
         context = {
-            'recent_flares': recent_flares[:10],  # Show last 10 flares
+            'recent_flares': dashboard['recent_flares'],  # Show last 10 flares
             'timeline_chart': timeline_chart,
             'class_distribution': class_distribution,
-            'total_flares': recent_flares.count(),
+            'total_flares': sum(class_counts.values()),
+            'stale': source_unavailable(FetchLedger.SOURCE_DONKI_FLR),
+            'stale_source': 'DONKI',
         }
         
     except Exception as e:
@@ -41,31 +80,33 @@ def solar_flares_home(request):
         }
         messages.error(request, f'Error: {str(e)}')
     
-    return render(request, 'solarflares/home.html', context)
+    response = render(request, 'solarflares/home.html', context)
+    if 'error_message' in context:
+        # Not validated, so the next visit loads the data again
+        add_never_cache_headers(response)
+    return response
 
 
+@conditional_on(FetchLedger.SOURCE_DONKI_FLR)
 def solar_flares_list(request):
     """
     Display a list of all solar flares with filtering options
     """
     try:
-        flares = SolarFlare.objects.all()
-        
-        # Filter by class if specified
+        # Filter by class and date range if specified
         flare_class = request.GET.get('class')
-        if flare_class:
-            flares = flares.filter(flare_class=flare_class)
-        
-        # Filter by date range if specified
         start_date = request.GET.get('start_date')
         end_date = request.GET.get('end_date')
-        if start_date:
-            flares = flares.filter(peak_time__date__gte=start_date)
-        if end_date:
-            flares = flares.filter(peak_time__date__lte=end_date)
+        flares = filter_flares(request.GET)
+        
+        page = cached(
+            'solarflares:list', [FetchLedger.SOURCE_DONKI_FLR], (request.GET.urlencode(),),
+            lambda: paginate_keyset(flares, request.GET.get('cursor'), ordering=('-peak_time', '-id'), per_page=50)
+        )
         
         context = {
-            'flares': flares[:50],  # Limit to 50 results
+            'flares': page,
+            'page': page,
             'flare_classes': SolarFlare.FLARE_CLASS_CHOICES,
             'selected_class': flare_class,
             'start_date': start_date,
@@ -80,23 +121,42 @@ def solar_flares_list(request):
         }
         messages.error(request, f'Error: {str(e)}')
     
-    return render(request, 'solarflares/list.html', context)
+    response = render(request, 'solarflares/list.html', context)
+    if 'error_message' in context:
+        # Not validated, so the next visit loads the data again
+        add_never_cache_headers(response)
+    return response
+
+
+@conditional_on(FetchLedger.SOURCE_DONKI_FLR)
+def export_solar_flares(request):
+    """
+    Stream solar flares as NDJSON or CSV, using the solar flare list filters
+    """
+    return export_response(
+        request, filter_flares(request.GET).order_by('-peak_time', '-id'), FLARE_EXPORT_FIELDS, 'solar_flares'
+    )
+
+
+def filter_flares(params):
+    """
+    Return the flares matching the class and date range filters in ``params``
+    """
+    return SolarFlareService().get_flares(
+        flare_class=params.get('class'),
+        start_date=parse_date(params.get('start_date') or ''),
+        end_date=parse_date(params.get('end_date') or ''),
+    )
 
 
 @require_http_methods(["POST"])
 def refresh_solar_flares(request):
     """
-    AJAX endpoint to refresh solar flare data
+    AJAX endpoint queueing a refresh of the solar flare data. Answers at once with
+    the job; poll its status URL for progress and the result.
     """
     try:
-        service = SolarFlareService()
-        flares_created = service.fetch_solar_flares()
-        
-        return JsonResponse({
-            'success': True,
-            'flares_created': flares_created,
-            'message': f'Successfully fetched {flares_created} new solar flares'
-        })
+        return job_accepted(enqueue('solarflares.refresh', unique=True))
         
     except Exception as e:
         return JsonResponse({
@@ -105,17 +165,18 @@ def refresh_solar_flares(request):
         })
 
 
-def create_flare_timeline(flares):
+def create_flare_timeline(daily_counts):
     """
-    Create a timeline chart of solar flares using Plotly
+    Create a timeline chart of daily solar flare counts per class using Plotly
     """
-    if not flares:
+    if not daily_counts:
         return None
     
-    # Prepare data for timeline
-    dates = [flare.peak_time for flare in flares]
-    classes = [flare.flare_class for flare in flares]
-    titles = [f"{flare.flare_class}-Class Flare" for flare in flares]
+    # Prepare data for timeline from (day, class, count) rollup rows
+    dates = [day for day, _, _ in daily_counts]
+    classes = [flare_class for _, flare_class, _ in daily_counts]
+    counts = [count for _, _, count in daily_counts]
+    titles = [f"{count} {flare_class}-Class Flare{'s' if count != 1 else ''}" for _, flare_class, count in daily_counts]
     
     # Color mapping for flare classes
     color_map = {
@@ -136,13 +197,13 @@ def create_flare_timeline(flares):
         y=classes,
         mode='markers',
         marker=dict(
-            size=15,
+            size=[min(10 + 3 * count, 30) for count in counts],
             color=colors,
             line=dict(width=2, color='black')
         ),
         text=titles,
         hovertemplate='<b>%{text}</b><br>' +
-                     'Peak Time: %{x}<br>' +
+                     'Date: %{x}<br>' +
                      'Class: %{y}<extra></extra>',
         name='Solar Flares'
     ))
@@ -162,18 +223,11 @@ def create_flare_timeline(flares):
     return json.dumps(fig, cls=PlotlyJSONEncoder)
 
 
-def create_flare_class_distribution(flares):
+def create_flare_class_distribution(class_counts):
     """
-    Create a pie chart showing distribution of flare classes
+    Create a pie chart showing distribution of flare classes from a
+    {flare_class: count} mapping
     """
-    if not flares:
-        return None
-    
-    # Count flares by class
-    class_counts = {}
-    for flare in flares:
-        class_counts[flare.flare_class] = class_counts.get(flare.flare_class, 0) + 1
-    
     if not class_counts:
         return None
     
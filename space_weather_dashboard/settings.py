@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -42,13 +43,15 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     # Custom apps
+    'core',
     'apod',
     'solarflares',
     'asteroids',
 ]
 
 MIDDLEWARE = [
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.MediaWhiteNoiseMiddleware',
+    'core.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,7 +65,9 @@ ROOT_URLCONF = 'space_weather_dashboard.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates, timed per request for /metrics
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -130,6 +135,131 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Mirrored NASA images (apod.images), served by WhiteNoise with far-future
+# cache headers since every file name is a content hash
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', BASE_DIR / 'media')
+
+# Fetch ledger re-fetch policy per source ('apod', 'donki_flr', 'neows').
+# Days fetched less than `recent_days` after they happened may still be revised
+# by NASA and are fetched again once the ledger entry is older than `ttl_hours`.
+# Failed windows are not requested again for `negative_ttl_minutes` (default 15).
+FETCH_LEDGER_POLICY = {
+    'default': {'recent_days': 3, 'ttl_hours': 6},
+    'donki_flr': {'recent_days': 7, 'ttl_hours': 3},
+}
+
+# Site-wide cache (core.cache) of view contexts and JSON responses. Entries are
+# keyed on the data version of the sources they were built from and dropped
+# when a source is ingested. The default local-memory cache is per process and
+# bounded to CACHE_MAX_ENTRIES; CACHE_BACKEND=file shares one cache in
+# CACHE_DIR between all worker processes of a host.
+CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', str(24 * 60 * 60)))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1000'))
+if os.getenv('CACHE_BACKEND', 'locmem') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv(
+                'CACHE_DIR', os.path.join(tempfile.gettempdir(), 'space_weather_dashboard_cache')
+            ),
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'space-weather-dashboard',
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+
+# Identifier of the deployed code, part of every ETag so pages are sent in
+# full again after a deploy changed their templates (Render sets the commit)
+APP_RELEASE = os.getenv('APP_RELEASE', os.getenv('RENDER_GIT_COMMIT', ''))
+
+# Maximum number of serialized Plotly charts kept per worker process.
+# Entries are keyed on the data version, so an ingest invalidates them.
+CHART_CACHE_MAX_ENTRIES = int(os.getenv('CHART_CACHE_MAX_ENTRIES', '128'))
+
+# Upper bound on points sent to the browser per chart trace; larger series
+# are downsampled (LTTB for timelines, density binning for scatter plots).
+CHART_POINT_BUDGET = int(os.getenv('CHART_POINT_BUDGET', '2000'))
+
+# Rows fetched per database round trip by the streaming export endpoints
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Concurrent fetches of the same NASA data are coalesced (core.singleflight);
+# the lock files must live on a filesystem shared by all worker processes.
+SINGLE_FLIGHT_LOCK_DIR = os.getenv(
+    'SINGLE_FLIGHT_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'space_weather_dashboard_locks')
+)
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv('SINGLE_FLIGHT_TIMEOUT', '60'))
+
+# Per-source circuit breakers: after this many consecutive failed NASA
+# requests the source is skipped (and pages serve stored data marked stale)
+# until the cooldown has passed and a single probe request succeeds
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '3'))
+CIRCUIT_BREAKER_COOLDOWN_SECONDS = int(os.getenv('CIRCUIT_BREAKER_COOLDOWN_SECONDS', '120'))
+
+# NASA API keys. NASA_API_KEYS takes a comma-separated pool; each request uses
+# the key with the most hourly quota left, so backfills scale with the pool.
+NASA_API_KEY = os.getenv('NASA_API_KEY', 'DEMO_KEY')
+NASA_API_KEYS = [key.strip() for key in os.getenv('NASA_API_KEYS', NASA_API_KEY).split(',') if key.strip()]
+
+# Shared NASA HTTP client (core.http_client): keep-alive pool size, retries of
+# 429/5xx responses with exponential backoff and jitter, and per-key request
+# pacing. Below NASA_RATE_LIMIT_SLOWDOWN_FRACTION of the hourly quota the
+# remaining requests are spread over NASA_RATE_LIMIT_WINDOW_SECONDS; a request
+# that would have to wait longer than NASA_RATE_LIMIT_MAX_WAIT seconds fails.
+NASA_HTTP_POOL_SIZE = int(os.getenv('NASA_HTTP_POOL_SIZE', '10'))
+NASA_HTTP_MAX_RETRIES = int(os.getenv('NASA_HTTP_MAX_RETRIES', '3'))
+NASA_HTTP_BACKOFF_BASE = float(os.getenv('NASA_HTTP_BACKOFF_BASE', '0.5'))
+NASA_HTTP_BACKOFF_MAX = float(os.getenv('NASA_HTTP_BACKOFF_MAX', '30'))
+NASA_RATE_LIMIT_PER_SECOND = float(os.getenv('NASA_RATE_LIMIT_PER_SECOND', '5'))
+NASA_RATE_LIMIT_BURST = int(os.getenv('NASA_RATE_LIMIT_BURST', '10'))
+NASA_RATE_LIMIT_SLOWDOWN_FRACTION = float(os.getenv('NASA_RATE_LIMIT_SLOWDOWN_FRACTION', '0.2'))
+NASA_RATE_LIMIT_WINDOW_SECONDS = int(os.getenv('NASA_RATE_LIMIT_WINDOW_SECONDS', '3600'))
+NASA_RATE_LIMIT_MAX_WAIT = float(os.getenv('NASA_RATE_LIMIT_MAX_WAIT', '30'))
+
+# Minimum seconds between background refreshes of the same data started by
+# page views in one process (e.g. the APOD landing page fetching today's entry)
+BACKGROUND_REFRESH_INTERVAL = int(os.getenv('BACKGROUND_REFRESH_INTERVAL', '300'))
+
+# Widths in pixels of the JPEG and WebP variants made of every mirrored APOD
+# image, and the largest image that is downloaded
+APOD_IMAGE_WIDTHS = [int(width) for width in os.getenv('APOD_IMAGE_WIDTHS', '320,640,1280').split(',')]
+APOD_IMAGE_MAX_BYTES = int(os.getenv('APOD_IMAGE_MAX_BYTES', str(50 * 1024 * 1024)))
+
+# Database-backed job queue (core.jobs) used by the refresh buttons. Workers
+# started with `manage.py run_worker` poll every JOB_POLL_INTERVAL seconds. A
+# running job that reports no progress for JOB_LEASE_SECONDS is taken as
+# abandoned and queued again; failed attempts are retried after
+# JOB_RETRY_DELAY_SECONDS, doubling each time. With JOB_EMBEDDED_WORKER the
+# web process also runs queued jobs on a background thread, for deployments
+# without a separate worker process; set it to False when run_worker runs.
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '900'))
+JOB_RETRY_DELAY_SECONDS = int(os.getenv('JOB_RETRY_DELAY_SECONDS', '30'))
+JOB_RETENTION_DAYS = int(os.getenv('JOB_RETENTION_DAYS', '7'))
+JOB_EMBEDDED_WORKER = os.getenv('JOB_EMBEDDED_WORKER', 'True') == 'True'
+
+# Concurrent NASA downloads per source during `manage.py sync_all`
+SYNC_CONCURRENCY = {
+    'apod': int(os.getenv('SYNC_APOD_CONCURRENCY', '4')),
+    'donki_flr': int(os.getenv('SYNC_DONKI_CONCURRENCY', '2')),
+    'neows': int(os.getenv('SYNC_NEOWS_CONCURRENCY', '4')),
+}
+
+# Request instrumentation (core.metrics). With SERVER_TIMING every response
+# carries its database, template, chart and NASA time in a Server-Timing
+# header. When METRICS_TOKEN is set, /metrics requires it as a bearer token.
+SERVER_TIMING = os.getenv('SERVER_TIMING', str(DEBUG)) == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -24,4 +24,5 @@ urlpatterns = [
     path('apod/', include('apod.urls')),
     path('solar-flares/', include('solarflares.urls')),
     path('asteroids/', include('asteroids.urls')),
+    path('', include('core.urls')),
 ]